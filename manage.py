@@ -6,6 +6,10 @@ import sys
 
 def main():
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    if sys.argv[1:2] == ['test']:
+        # Тесты идут в одном процессе, а кэш в базе попадал бы в счетчики
+        # запросов.
+        os.environ.setdefault('CACHE_URL', 'locmem://')
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
@@ -3,3 +3,10 @@ from django.apps import AppConfig
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        from . import signals  # noqa
+        from . import thumbnails
+        from yatube.metrics import registry
+        registry.gauge('yatube_thumbnail_backlog',
+                       'Миниатюры, ожидающие генерации', thumbnails.backlog)
@@ -0,0 +1,91 @@
+"""Кэш HTML-карточек постов.
+
+Общая для всех часть карточки (картинка, текст, автор, группа, счетчик
+комментариев) кэшируется по id поста и версиям поста, автора и группы.
+Версии увеличиваются сигналами, поэтому устаревшие фрагменты просто
+перестают читаться. Зависящая от зрителя часть (кнопка лайка, ссылки
+редактирования) рендерится на каждый запрос и вставляется на место
+ACTIONS_MARKER.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+ACTIONS_MARKER = '<!--post-actions-->'
+
+
+def _version_key(kind, pk):
+    return f'post_card_version:{kind}:{pk}'
+
+
+def _new_version():
+    return int(time.time() * 1000)
+
+
+def bump(kind, pk):
+    key = _version_key(kind, pk)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), None)
+
+
+def invalidate_post(post_id):
+    bump('post', post_id)
+
+
+def invalidate_author(author_id):
+    bump('author', author_id)
+
+
+def invalidate_group(group_id):
+    bump('group', group_id)
+
+
+def _version_keys(post):
+    keys = [_version_key('post', post.id),
+            _version_key('author', post.author_id)]
+    if post.group_id:
+        keys.append(_version_key('group', post.group_id))
+    return keys
+
+
+def _card_key(post, versions):
+    parts = [str(versions[key]) for key in _version_keys(post)]
+    return f'post_card:{post.id}:' + ':'.join(parts)
+
+
+def prefetch(posts):
+    """Читает версии и фрагменты для всех постов страницы двумя
+    обращениями к кэшу."""
+    posts = list(posts)
+    version_keys = {key for post in posts for key in _version_keys(post)}
+    versions = cache.get_many(version_keys)
+    missing = {key: _new_version() for key in version_keys - set(versions)}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    for post in posts:
+        post.card_key = _card_key(post, versions)
+    fragments = cache.get_many([post.card_key for post in posts])
+    for post in posts:
+        post.card_html = fragments.get(post.card_key)
+    return posts
+
+
+def render_card(post, actions):
+    if not hasattr(post, 'card_key'):
+        prefetch([post])
+    html = post.card_html
+    if html is None:
+        html = render_to_string('include/post_card.html', {'post': post})
+        timeout = settings.POST_CARD_TIMEOUT
+        if post._state.db != DEFAULT_DB_ALIAS:
+            timeout = settings.POST_CARD_REPLICA_TIMEOUT
+        cache.set(post.card_key, html, timeout)
+        post.card_html = html
+    return mark_safe(html.replace(ACTIONS_MARKER, actions, 1))
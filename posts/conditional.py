@@ -0,0 +1,142 @@
+"""Условные GET для лент, профилей и страниц постов.
+
+Для каждой области — пост, автор, группа, общая лента и весь сайт — в
+кэше хранится время ее последнего изменения. Его проставляют сигналы и
+likes.apply: изменение поста, его комментариев или лайков трогает сам
+пост, его автора, группу и общую ленту; подписка — обоих пользователей;
+правка пользователя или группы — весь сайт, потому что их имена есть на
+любой странице. Представление, обернутое в conditional(scopes),
+получает ETag из версий своих областей, зрителя, cookie CSRF и адреса
+страницы, а Last-Modified — из самой свежей версии, и на совпадающий
+запрос отвечает 304 без выполнения своих запросов. Версия, пропавшая из
+кэша, считается только что измененной. Версии обновляются только после
+коммита транзакции: иначе параллельный GET успел бы запомнить новый ETag
+для старых данных.
+
+На кэше по умолчанию (db://, таблица django_cache) ответ 304 стоит, кроме
+сессии и пользователя, запроса области и одного SELECT из django_cache.
+Пропавшая версия (после clear или вытеснения сверх MAX_ENTRIES) обходится
+дороже: COUNT для вытеснения, затем SELECT и INSERT на каждый ключ в
+отдельной транзакции. redis:// и memcached:// читают и записывают версии
+одним обращением к серверу.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.views.decorators.http import condition
+
+from . import groups
+from .models import Post, User
+
+SITE = 'page_version:site'
+INDEX = 'page_version:index'
+
+
+def post_key(post_id):
+    return f'page_version:post:{post_id}'
+
+
+def author_key(author_id):
+    return f'page_version:author:{author_id}'
+
+
+def group_key(group_id):
+    return f'page_version:group:{group_id}'
+
+
+def touch(*keys):
+    transaction.on_commit(lambda: cache.set_many(
+        {key: time.time() for key in keys}, None
+    ))
+
+
+def touch_posts(posts):
+    """posts — тройки (id поста, id автора, id группы)."""
+    keys = set()
+    for post_id, author_id, group_id in posts:
+        keys.update((post_key(post_id), author_key(author_id)))
+        if group_id:
+            keys.add(group_key(group_id))
+    if keys:
+        touch(INDEX, *keys)
+
+
+def touch_post_ids(post_ids):
+    touch_posts(Post.objects.filter(pk__in=post_ids).values_list(
+        'pk', 'author_id', 'group_id'
+    ))
+
+
+def versions(keys):
+    found = cache.get_many(keys)
+    missing = {key: time.time() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return found
+
+
+def _page_versions(request, scopes, args, kwargs):
+    """Версии областей страницы, один раз на запрос; None — страницы нет,
+    и представление само ответит 404."""
+    if not hasattr(request, 'page_versions'):
+        keys = scopes(request, *args, **kwargs)
+        request.page_versions = None if keys is None else versions(
+            [SITE, *keys]
+        )
+    return request.page_versions
+
+
+def conditional(scopes):
+    """scopes(request, *args, **kwargs) возвращает ключи версий страницы
+    не дороже одного небольшого запроса по индексу."""
+    def etag(request, *args, **kwargs):
+        found = _page_versions(request, scopes, args, kwargs)
+        if found is None:
+            return None
+        parts = [f'{key}={found[key]!r}' for key in sorted(found)]
+        parts += [str(request.user.pk),
+                  request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+                  request.get_full_path()]
+        return hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        found = _page_versions(request, scopes, args, kwargs)
+        if found is None:
+            return None
+        return datetime.fromtimestamp(max(found.values()), timezone.utc)
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def index_scopes(request):
+    return [INDEX]
+
+
+def group_scopes(request, slug):
+    group = groups.get_by_slug(slug)
+    return None if group is None else [group_key(group.pk)]
+
+
+def profile_scopes(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True
+    ).first()
+    return None if author_id is None else [author_key(author_id)]
+
+
+def post_scopes(request, username, post_id):
+    post = Post.objects.filter(
+        pk=post_id, author__username=username
+    ).values_list('author_id', 'group_id').first()
+    if post is None:
+        return None
+    author_id, group_id = post
+    keys = [post_key(post_id), author_key(author_id)]
+    if group_id:
+        keys.append(group_key(group_id))
+    return keys
@@ -0,0 +1,17 @@
+"""Пересчет хранимых счетчиков по самим строкам.
+
+Общий для счетчиков постов (sync_counters), групп (groups.py) и
+пользователей (stats.py). Миграции держат свои копии: им нужны
+исторические модели.
+"""
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def real_count(model, field):
+    """Число строк model, у которых field ссылается на внешнюю строку;
+    подходит и для annotate, и для update."""
+    counts = model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+        field
+    ).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
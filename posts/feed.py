@@ -0,0 +1,193 @@
+"""Материализованная лента подписок (fan-out-on-write).
+
+Новый пост сразу раскладывается по лентам подписчиков автора, поэтому
+follow_index берет ключи страницы из FeedItem по индексу
+(user, -pub_date, -post), а сами посты — по первичному ключу. Посты
+авторов, у которых подписчиков больше FEED_FANOUT_LIMIT, не
+раскладываются: их подмешивают при чтении (fan-out-on-read).
+"""
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F
+
+from . import stats
+from .models import FeedItem, Follow, Post, UserStats
+
+PULL_AUTHORS_KEY = 'feed:pull_authors'
+PULL_AUTHORS_TIMEOUT = 60 * 10
+ORDERING = ('-pub_date', '-post_id')
+
+
+def is_pull_author(author_id):
+    limit = settings.FEED_FANOUT_LIMIT
+    followers = Follow.objects.filter(author_id=author_id)
+    return followers.order_by()[:limit + 1].count() > limit
+
+
+def pull_authors():
+    """Популярные авторы по сохраненным счетчикам подписчиков: диапазон
+    по индексу, а не агрегат по всем подпискам."""
+    authors = cache.get(PULL_AUTHORS_KEY)
+    if authors is None:
+        authors = list(UserStats.objects.filter(
+            followers_count__gt=settings.FEED_FANOUT_LIMIT
+        ).values_list('user_id', flat=True))
+        cache.set(PULL_AUTHORS_KEY, authors, PULL_AUTHORS_TIMEOUT)
+    return authors
+
+
+def _items(user_ids, posts):
+    return [
+        FeedItem(user_id=user_id, post_id=post.id, author_id=post.author_id,
+                 pub_date=post.pub_date)
+        for user_id in user_ids
+        for post in posts
+    ]
+
+
+def _insert(items):
+    # bulk_create не ограничивает явный batch_size лимитами бэкенда
+    # (в SQLite — не больше 999 параметров на запрос).
+    items = list(items)
+    fields = [field for field in FeedItem._meta.concrete_fields
+              if not field.primary_key]
+    batch_size = min(settings.FEED_BATCH_SIZE,
+                     connection.ops.bulk_batch_size(fields, items) or 1)
+    FeedItem.objects.bulk_create(items, batch_size=batch_size,
+                                 ignore_conflicts=True)
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_pull_author(post.author_id):
+        if post.author_id not in pull_authors():
+            # Счетчик подписчиков мог разойтись с настоящим.
+            stats.rebuild([post.author_id])
+            cache.delete(PULL_AUTHORS_KEY)
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True).iterator()
+    _insert(_items(followers, [post]))
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту нового подписчика последние посты автора."""
+    if is_pull_author(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).only(
+        'id', 'author_id', 'pub_date'
+    )[:settings.FEED_BACKFILL_LIMIT]
+    _insert(_items([user_id], posts))
+
+
+REBUILD_SQL = """
+    INSERT INTO {feed} (user_id, post_id, author_id, pub_date)
+    SELECT follow.user_id, post.id, post.author_id, post.pub_date
+    FROM {follow} follow
+    JOIN (
+        SELECT id, author_id, pub_date FROM {post}
+        WHERE author_id = %s ORDER BY pub_date DESC LIMIT %s
+    ) post ON post.author_id = follow.author_id
+    WHERE follow.author_id = %s
+"""
+
+
+def rebuild():
+    """Заполняет ленты заново по текущим подпискам, например после
+    массовой загрузки данных в обход сигналов. Строки вставляются
+    INSERT ... SELECT по одному запросу на автора, без объектов в памяти."""
+    FeedItem.objects.all().delete()
+    cache.delete(PULL_AUTHORS_KEY)
+    authors = Follow.objects.exclude(author__in=pull_authors()).order_by(
+        'author'
+    ).values_list('author', flat=True).distinct()
+    sql = REBUILD_SQL.format(feed=FeedItem._meta.db_table,
+                             follow=Follow._meta.db_table,
+                             post=Post._meta.db_table)
+    with connection.cursor() as cursor:
+        for author_id in list(authors):
+            cursor.execute(sql, [author_id, settings.FEED_BACKFILL_LIMIT,
+                                 author_id])
+
+
+def cleanup(user_id, author_id):
+    """Убирает посты автора из ленты отписавшегося пользователя."""
+    FeedItem.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+class FeedKeys:
+    """Ключи (pub_date, post_id) ленты подписок для paginate: строки
+    FeedItem и посты популярных авторов, на которых подписан
+    пользователь. Фильтр, сортировка и LIMIT применяются к каждой части в
+    базе по ее индексу, а сливаются уже короткие списки."""
+
+    model = FeedItem
+    ordered = True
+
+    def __init__(self, parts, ordering=ORDERING, start=0, stop=None):
+        self.parts = parts
+        self.ordering = ordering
+        self.start = start
+        self.stop = stop
+
+    def _chain(self, parts, ordering=None, start=0, stop=None):
+        return FeedKeys(parts, ordering or self.ordering, start, stop)
+
+    def filter(self, *args, **kwargs):
+        return self._chain([part.filter(*args, **kwargs)
+                            for part in self.parts])
+
+    def order_by(self, *ordering):
+        return self._chain([part.order_by(*ordering) for part in self.parts],
+                           ordering)
+
+    def values(self, *fields):
+        return self._chain([part.values(*fields) for part in self.parts])
+
+    def __getitem__(self, index):
+        # Каждая часть может целиком попасть в срез.
+        return self._chain([part[:index.stop] for part in self.parts],
+                           start=index.start or 0, stop=index.stop)
+
+    def count(self):
+        total = sum(part.count() for part in self.parts)
+        if self.stop is not None:
+            total = min(total, self.stop)
+        return max(total - self.start, 0)
+
+    def __iter__(self):
+        rows = [row for part in self.parts for row in part]
+        for name in reversed(self.ordering):
+            rows.sort(key=attrgetter(name.lstrip('-')),
+                      reverse=name.startswith('-'))
+        return iter(rows[self.start:self.stop])
+
+
+def feed_keys(user):
+    fields = ('pub_date', 'post_id')
+    items = FeedItem.objects.filter(user=user)
+    parts = []
+    pulled = pull_authors()
+    if pulled:
+        followed = list(Follow.objects.filter(
+            user=user, author__in=pulled
+        ).values_list('author', flat=True))
+        if followed:
+            # Разложенные до того, как автор стал популярным, посты уже
+            # есть в FeedItem.
+            items = items.exclude(author__in=followed)
+            parts.append(Post.objects.annotate(post_id=F('id')).filter(
+                author__in=followed
+            ).values_list(*fields, named=True))
+    parts.insert(0, items.values_list(*fields, named=True))
+    return FeedKeys([part.order_by(*ORDERING) for part in parts])
+
+
+def load_posts(rows, queryset):
+    """Посты страницы ленты в порядке ее ключей."""
+    posts = queryset.in_bulk([row.post_id for row in rows])
+    return [posts[row.post_id] for row in rows if row.post_id in posts]
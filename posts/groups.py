@@ -0,0 +1,63 @@
+"""Кэш групп по slug и счетчики их записей.
+
+Страница группы находит ее в кэше в два шага: slug -> id (ключ меняется
+только вместе со slug) и id -> группа вместе с posts_count. Второй ключ
+удаляется при правке группы и при каждом изменении числа ее записей.
+"""
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F
+
+from .counters import real_count
+from .models import Group, Post
+
+TIMEOUT = 60 * 60
+
+
+def _slug_key(slug):
+    return f'group:slug:{slug}'
+
+
+def _group_key(group_id):
+    return f'group:{group_id}'
+
+
+def get_by_slug(slug):
+    """Группа по slug или None."""
+    group_id = cache.get(_slug_key(slug))
+    if group_id is not None:
+        group = cache.get(_group_key(group_id))
+        if group is not None and group.slug == slug:
+            return group
+    # Кэш живет долго, поэтому заполняется только из основной базы.
+    group = Group.objects.using(DEFAULT_DB_ALIAS).filter(slug=slug).first()
+    if group is not None:
+        cache.set_many({_slug_key(slug): group.pk,
+                        _group_key(group.pk): group}, TIMEOUT)
+    return group
+
+
+def invalidate(group_id, *slugs):
+    cache.delete_many([_group_key(group_id)]
+                      + [_slug_key(slug) for slug in slugs if slug])
+
+
+def change_count(group_id, delta):
+    groups = Group.objects.filter(pk=group_id)
+    if delta < 0:
+        groups = groups.filter(posts_count__gte=-delta)
+    groups.update(posts_count=F('posts_count') + delta)
+    invalidate(group_id)
+
+
+def rebuild():
+    """Исправляет разошедшиеся счетчики; возвращает число групп."""
+    drifted = list(Group.objects.order_by().annotate(
+        real_posts=real_count(Post, 'group')
+    ).exclude(posts_count=F('real_posts')).values_list('pk', flat=True))
+    Group.objects.filter(pk__in=drifted).update(
+        posts_count=real_count(Post, 'group')
+    )
+    for group_id in drifted:
+        invalidate(group_id)
+    return len(drifted)
@@ -0,0 +1,118 @@
+"""Горячая лента: посты с недавними лайками и комментариями.
+
+Каждое событие прибавляет к HotScore.score поста свой вес из HOT_WEIGHTS,
+снятие лайка и удаление комментария вычитают его, уменьшенный так же, как
+он успел остыть с момента события (не ниже нуля). Команда age_hot_scores
+периодически умножает все оценки на 0.5 ** (прошло секунд / HOT_HALF_LIFE)
+и удаляет остывшие, поэтому таблица остается маленькой; время прошлого
+запуска хранится в HotAging, общей для всех процессов. Первые HOT_FEED_SIZE
+постов читаются по индексу (-score) и держатся в кэше HOT_CACHE_TIMEOUT
+секунд.
+"""
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Greatest
+
+from .models import HotAging, HotScore
+
+TOP_KEY = 'hot:top'
+
+
+UPSERT_SQL = """
+    INSERT INTO {table} (post_id, score) VALUES {rows}
+    ON CONFLICT (post_id) DO UPDATE SET score = {table}.score + excluded.score
+"""
+# Постов в одном INSERT (по два параметра на пост)
+UPSERT_BATCH = 400
+
+
+def _increase(post_ids, delta):
+    """Добавляет delta > 0 одним запросом на пачку, создавая недостающие
+    строки (ON CONFLICT есть и в PostgreSQL, и в SQLite 3.24+)."""
+    table = HotScore._meta.db_table
+    with connection.cursor() as cursor:
+        for start in range(0, len(post_ids), UPSERT_BATCH):
+            batch = post_ids[start:start + UPSERT_BATCH]
+            rows = ', '.join(['(%s, %s)'] * len(batch))
+            cursor.execute(UPSERT_SQL.format(table=table, rows=rows),
+                           [value for pk in batch for value in (pk, delta)])
+
+
+def add(kind, changes):
+    """Учитывает события: changes — {id поста: сколько добавлено}
+    событий вида kind ('like' или 'comment'). Посты с одинаковым
+    изменением обновляются одним запросом."""
+    weight = settings.HOT_WEIGHTS[kind]
+    groups = {}
+    for pk, count in changes.items():
+        if count > 0:
+            groups.setdefault(count * weight, []).append(pk)
+    for delta, post_ids in groups.items():
+        _increase(post_ids, delta)
+
+
+def remove(kind, events):
+    """Снимает события вида kind: events — пары (id поста, время
+    события). Вычитается вес, состаренный с момента события до
+    последнего запуска age(); все посты — одним запросом."""
+    events = list(events)
+    if not events:
+        return
+    weight = settings.HOT_WEIGHTS[kind]
+    aged = HotAging.objects.values_list('aged', flat=True).first()
+    deltas = {}
+    for pk, created in events:
+        elapsed = 0
+        if aged is not None and created < aged:
+            elapsed = (aged - created).total_seconds()
+        deltas[pk] = deltas.get(pk, 0) + (
+            weight * 0.5 ** (elapsed / settings.HOT_HALF_LIFE)
+        )
+    delta = Case(*[When(pk=pk, then=Value(value))
+                   for pk, value in deltas.items()],
+                 output_field=FloatField())
+    HotScore.objects.filter(pk__in=deltas).update(score=Greatest(
+        F('score') - delta, Value(0.0), output_field=FloatField()
+    ))
+
+
+def top_ids():
+    """id самых горячих постов по убыванию оценки."""
+    ids = cache.get(TOP_KEY)
+    if ids is None:
+        ids = list(HotScore.objects.filter(score__gt=0).order_by(
+            '-score', '-post_id'
+        ).values_list('post_id', flat=True)[:settings.HOT_FEED_SIZE])
+        cache.set(TOP_KEY, ids, settings.HOT_CACHE_TIMEOUT)
+    return ids
+
+
+def age(now=None):
+    """Состаривает оценки на время, прошедшее с прошлого запуска;
+    возвращает (множитель, сколько оценок удалено)."""
+    now = datetime.fromtimestamp(
+        time.time() if now is None else now, timezone.utc
+    )
+    with transaction.atomic():
+        # Блокировка строки не дает двум запускам состарить дважды.
+        clock, created = HotAging.objects.select_for_update().get_or_create(
+            pk=1, defaults={'aged': now}
+        )
+        if created or now <= clock.aged:
+            # Первый запуск или время не сдвинулось: оценки не трогаем.
+            return 1.0, 0
+        factor = 0.5 ** ((now - clock.aged).total_seconds()
+                         / settings.HOT_HALF_LIFE)
+        clock.aged = now
+        clock.save(update_fields=['aged'])
+        HotScore.objects.update(score=F('score') * factor)
+        removed, _ = HotScore.objects.filter(
+            score__lt=settings.HOT_MIN_SCORE
+        ).delete()
+    cache.delete(TOP_KEY)
+    return factor, removed
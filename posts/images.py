@@ -0,0 +1,108 @@
+"""Адаптивные варианты изображений постов.
+
+Из Post.image строится несколько ширин с тем же кадрированием, что и у
+миниатюры карточки, в JPEG и, если их умеет Pillow, в WebP и AVIF.
+Метаданные (EXIF, ICC, комментарии) не сохраняются, а качество
+понижается, пока файл не уложится в IMAGE_VARIANT_MAX_BYTES.
+
+Файлы лежат в posts/variants/<id поста>/ под именами из хэша содержимого
+картинки, поэтому повторная сборка перезаписывает их, а не плодит копии.
+Варианты прежней картинки удаляются после замены, все — вместе с постом.
+"""
+import hashlib
+import io
+import json
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+ASPECT = 960 / 339
+QUALITY_STEPS = (82, 72, 62, 50, 40)
+FORMATS = (
+    # (формат Pillow, расширение, MIME-тип)
+    ('AVIF', 'avif', 'image/avif'),
+    ('WEBP', 'webp', 'image/webp'),
+    ('JPEG', 'jpg', 'image/jpeg'),
+)
+
+
+def supported_formats():
+    Image.init()
+    return [fmt for fmt in FORMATS if fmt[0] in Image.SAVE]
+
+
+def _encode(image, fmt):
+    for quality in QUALITY_STEPS:
+        buffer = io.BytesIO()
+        options = {'quality': quality}
+        if fmt == 'JPEG':
+            options.update(optimize=True, progressive=True)
+        elif fmt == 'WEBP':
+            options['method'] = 6
+        image.save(buffer, fmt, **options)
+        data = buffer.getvalue()
+        if len(data) <= settings.IMAGE_VARIANT_MAX_BYTES:
+            break
+    return data
+
+
+def _crop(source, width):
+    height = round(width / ASPECT)
+    image = ImageOps.fit(source, (width, height), Image.LANCZOS)
+    # fit/resize копируют info исходника, а в нем EXIF и ICC-профиль.
+    image.info = {}
+    return image
+
+
+def _directory(post_id):
+    return f'posts/variants/{post_id}'
+
+
+def build_variants(post):
+    """Строит и сохраняет варианты картинки поста, возвращает хэш
+    картинки и словарь {MIME-тип: [[ширина, url], ...]}."""
+    with post.image.open('rb') as file:
+        data = file.read()
+    digest = hashlib.sha1(data).hexdigest()[:16]
+    source = Image.open(io.BytesIO(data))
+    source = ImageOps.exif_transpose(source)
+    source = source.convert('RGB')
+    widths = [width for width in settings.IMAGE_VARIANT_WIDTHS
+              if width <= source.width]
+    if not widths:
+        widths = [min(settings.IMAGE_VARIANT_WIDTHS)]
+    variants = {}
+    for width in widths:
+        image = _crop(source, width)
+        for fmt, extension, mime in supported_formats():
+            name = f'{_directory(post.pk)}/{digest}-{width}.{extension}'
+            # Иначе хранилище добавило бы к имени случайный суффикс.
+            default_storage.delete(name)
+            name = default_storage.save(name, ContentFile(_encode(image, fmt)))
+            variants.setdefault(mime, []).append(
+                [width, default_storage.url(name)]
+            )
+    return digest, variants
+
+
+def delete_variants(post_id, keep=None):
+    """Удаляет файлы вариантов поста, кроме построенных из картинки с
+    хэшем keep."""
+    directory = _directory(post_id)
+    try:
+        _, files = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in files:
+        if keep is None or not name.startswith(f'{keep}-'):
+            default_storage.delete(f'{directory}/{name}')
+
+
+def dumps(variants):
+    return json.dumps(variants, separators=(',', ':'))
+
+
+def loads(raw):
+    return json.loads(raw) if raw else {}
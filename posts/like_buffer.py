@@ -0,0 +1,221 @@
+"""Отложенная запись лайков (write-behind) для вирусных постов.
+
+При LIKES_WRITE_BEHIND лайк не пишется в posts_like сразу. В кэше
+сохраняются:
+
+* операция likes:op:<n> = (user, post, liked, delta, время) под номером
+  из счетчика likes:seq;
+* последнее намерение пользователя likes:pending:<user>:<post> =
+  (liked, n);
+* накопленное изменение счетчика поста likes:delta:<post>.
+
+flush() по порядку номеров применяет операции пачками через
+likes.write (вставка и одно удаление на пользователя, likes_count
+сдвигается на число измененных строк) и вычитает примененное из
+likes:delta. Чтение состояния и счетчиков накладывает
+буфер на данные из базы, поэтому пользователь сразу видит свой лайк.
+Сбрасывает буфер фоновый поток каждого процесса раз в
+LIKES_FLUSH_INTERVAL секунд или команда flush_likes.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+
+from . import likes
+from .models import Like
+
+SEQ_KEY = 'likes:seq'
+FLUSHED_KEY = 'likes:flushed'
+LOCK_KEY = 'likes:flush:lock'
+# Буфер должен пережить несколько пропущенных сбросов.
+BUFFER_TIMEOUT = 60 * 60 * 24
+LOCK_TIMEOUT = 60
+# Номер выдается за миллисекунды до записи операции: пропуск в номерах
+# перед операцией старше этого срока — потерянная операция, а не
+# записываемая.
+GAP_TIMEOUT = 60
+CHUNK = 1000
+
+logger = logging.getLogger(__name__)
+
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def _op_key(number):
+    return f'likes:op:{number}'
+
+
+def _pending_key(user_id, post_id):
+    return f'likes:pending:{user_id}:{post_id}'
+
+
+def _delta_key(post_id):
+    return f'likes:delta:{post_id}'
+
+
+def _next_number():
+    cache.add(SEQ_KEY, 0, None)
+    return cache.incr(SEQ_KEY)
+
+
+def _add_delta(post_id, delta):
+    key = _delta_key(post_id)
+    cache.add(key, 0, BUFFER_TIMEOUT)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        cache.set(key, delta, BUFFER_TIMEOUT)
+
+
+def pending(user_id, post_ids):
+    """{id поста: liked} для операций пользователя, еще не записанных в
+    базу."""
+    keys = {_pending_key(user_id, pk): pk for pk in post_ids}
+    return {keys[key]: liked
+            for key, (liked, _) in cache.get_many(keys).items()}
+
+
+def deltas(post_ids):
+    keys = {_delta_key(pk): pk for pk in post_ids}
+    return {keys[key]: delta for key, delta in cache.get_many(keys).items()}
+
+
+def merge(user_id, states):
+    """Накладывает буфер на {id: (liked, likes_count)} из базы."""
+    own = pending(user_id, states) if user_id else {}
+    changes = deltas(states)
+    return {
+        pk: (own.get(pk, liked), max(0, count + changes.get(pk, 0)))
+        for pk, (liked, count) in states.items()
+    }
+
+
+def record(user, changes, states):
+    """Буферизует {id поста: liked}; states — текущие состояния из
+    базы (без буфера) для постов, которые существуют."""
+    current = merge(user.pk, states)
+    for post_id, (was_liked, _) in current.items():
+        liked = changes[post_id]
+        delta = int(liked) - int(was_liked)
+        number = _next_number()
+        cache.set(_op_key(number),
+                  (user.pk, post_id, liked, delta, time.time()),
+                  BUFFER_TIMEOUT)
+        cache.set(_pending_key(user.pk, post_id), (liked, number),
+                  BUFFER_TIMEOUT)
+        if delta:
+            _add_delta(post_id, delta)
+    start_flusher()
+    return merge(user.pk, states)
+
+
+def _read_ops(first, last):
+    """Операции с номерами first..last по порядку. Чтение обрывается на
+    пропуске, если операцию могут еще записывать; пропуски перед
+    операцией старше GAP_TIMEOUT — операции, вытесненные из кэша или
+    потерянные при падении процесса, — пропускаются."""
+    found = {}
+    for start in range(first, last + 1, CHUNK):
+        found.update(cache.get_many([
+            _op_key(number)
+            for number in range(start, min(start + CHUNK, last + 1))
+        ]))
+    deadline = time.time() - GAP_TIMEOUT
+    settled = max((number for number in range(first, last + 1)
+                   if _op_key(number) in found
+                   and found[_op_key(number)][4] <= deadline),
+                  default=first - 1)
+    ops = []
+    lost = 0
+    for number in range(first, last + 1):
+        op = found.get(_op_key(number))
+        if op is not None:
+            ops.append((number, op))
+        elif number < settled:
+            lost += 1
+        else:
+            break
+    if lost:
+        logger.warning('Потеряно операций буфера лайков: %s', lost)
+    return ops
+
+
+def _apply(ops):
+    final = {}
+    applied = {}
+    for _, (user_id, post_id, liked, delta, _) in ops:
+        final[user_id, post_id] = liked
+        applied[post_id] = applied.get(post_id, 0) + delta
+    with transaction.atomic():
+        post_ids = set(likes.lock_posts(applied))
+        final = {(user_id, post_id): liked
+                 for (user_id, post_id), liked in final.items()
+                 if post_id in post_ids}
+        existing = set(Like.objects.filter(
+            user_id__in={user_id for user_id, _ in final},
+            post_id__in=post_ids
+        ).values_list('user_id', 'post_id'))
+        likes.write(final, existing, batch_size=CHUNK)
+    return applied
+
+
+def _forget_pending(ops, flushed):
+    """Убирает намерения, которые уже в базе; более новые (записанные
+    после чтения операций) остаются до следующего сброса."""
+    keys = {_pending_key(user_id, post_id)
+            for _, (user_id, post_id, *_) in ops}
+    stale = [key for key, (_, number) in cache.get_many(keys).items()
+             if number <= flushed]
+    cache.delete_many(stale)
+
+
+def flush():
+    """Записывает накопленные операции в базу; возвращает их число."""
+    if not cache.add(LOCK_KEY, 1, LOCK_TIMEOUT):
+        return 0
+    try:
+        last = cache.get(SEQ_KEY, 0)
+        flushed = cache.get(FLUSHED_KEY, 0)
+        ops = _read_ops(flushed + 1, last)
+        if not ops:
+            return 0
+        applied = _apply(ops)
+        for post_id, delta in applied.items():
+            if delta:
+                _add_delta(post_id, -delta)
+        flushed = ops[-1][0]
+        cache.set(FLUSHED_KEY, flushed, None)
+        _forget_pending(ops, flushed)
+        cache.delete_many([_op_key(number) for number, _ in ops])
+        return len(ops)
+    finally:
+        cache.delete(LOCK_KEY)
+
+
+def _run_flusher(stop):
+    while not stop.wait(settings.LIKES_FLUSH_INTERVAL):
+        try:
+            flush()
+        except Exception:
+            logger.exception('Не удалось сбросить буфер лайков')
+        finally:
+            close_old_connections()
+
+
+def start_flusher():
+    """Запускает фоновый сброс буфера в этом процессе (один раз)."""
+    global _flusher
+    if not settings.LIKES_FLUSH_INTERVAL:
+        return
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(
+                target=_run_flusher, args=(threading.Event(),),
+                name='like-buffer', daemon=True
+            )
+            _flusher.start()
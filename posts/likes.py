@@ -0,0 +1,136 @@
+"""Лайки пачкой: одна вставка, одно удаление и сдвиг счетчиков.
+
+Посты переключаемых лайков блокируются до конца транзакции, поэтому
+прочитанное под блокировкой состояние точно: вставляются и удаляются
+только действительно меняющиеся строки, а likes_count сдвигается на их
+число (F('likes_count') + delta), не пересчитывая все лайки поста.
+Повтор запроса ничего не меняет. Полный пересчет остался в
+sync_counters. При LIKES_WRITE_BEHIND изменения копятся в буфере (см.
+like_buffer.py).
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+from . import conditional, hot, like_buffer
+from .models import Like, Post
+
+DELETE_SQL = 'DELETE FROM {table} WHERE user_id = %s AND post_id IN ({posts})'
+
+
+def _stored_rows(user, post_ids):
+    return Post.objects.annotate_liked(user).filter(
+        pk__in=post_ids
+    ).order_by().values_list('pk', 'liked', 'likes_count', 'author_id',
+                             'group_id')
+
+
+def lock_posts(post_ids):
+    """Блокирует посты в порядке id, чтобы встречные пачки не ждали
+    друг друга по кругу."""
+    return list(Post.objects.select_for_update().filter(
+        pk__in=post_ids
+    ).order_by('pk').values_list('pk', flat=True))
+
+
+def _delete(user_id, post_ids):
+    """Удаляет лайки пользователя одним запросом и без сигналов
+    post_delete: счетчики и горячую ленту сдвигает write."""
+    posts = ', '.join(['%s'] * len(post_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            DELETE_SQL.format(table=Like._meta.db_table, posts=posts),
+            [user_id, *post_ids]
+        )
+
+
+def write(final, existing, batch_size=None):
+    """Записывает {(id пользователя, id поста): liked}; existing —
+    лайки из final, которые уже есть в базе, прочитанные под
+    lock_posts. Сдвигает счетчики и горячую ленту, возвращает
+    {id поста: изменение likes_count}."""
+    created = [pair for pair, liked in final.items()
+               if liked and pair not in existing]
+    removed = {}
+    for (user_id, post_id), liked in final.items():
+        if not liked and (user_id, post_id) in existing:
+            removed.setdefault(user_id, []).append(post_id)
+    Like.objects.bulk_create(
+        [Like(user_id=user_id, post_id=post_id)
+         for user_id, post_id in created],
+        batch_size=batch_size, ignore_conflicts=True
+    )
+    events = []
+    for user_id, post_ids in removed.items():
+        stored = Like.objects.filter(user_id=user_id, post_id__in=post_ids)
+        # Время лайков нужно горячей ленте, чтобы снять их остывший вес.
+        events.extend(stored.values_list('post_id', 'created'))
+        _delete(user_id, post_ids)
+    deltas = {}
+    for _, post_id in created:
+        deltas[post_id] = deltas.get(post_id, 0) + 1
+    for post_ids in removed.values():
+        for post_id in post_ids:
+            deltas[post_id] = deltas.get(post_id, 0) - 1
+    by_delta = {}
+    for post_id, delta in deltas.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(post_id)
+    for delta, post_ids in by_delta.items():
+        posts = Post.objects.filter(pk__in=post_ids)
+        if delta < 0:
+            posts = posts.filter(likes_count__gte=-delta)
+        posts.update(likes_count=F('likes_count') + delta)
+    hot.add('like', deltas)
+    hot.remove('like', events)
+    return deltas
+
+
+def _stored_states(user, post_ids):
+    rows = _stored_rows(user, post_ids)
+    return {pk: (liked, count) for pk, liked, count, *_ in rows}
+
+
+def states(user, post_ids):
+    """{id поста: (лайкнул ли user, число лайков)}."""
+    states = _stored_states(user, post_ids)
+    if settings.LIKES_WRITE_BEHIND:
+        states = like_buffer.merge(user.pk, states)
+    return states
+
+
+def overlay(user, posts):
+    """Накладывает буфер лайков на liked и likes_count постов страницы."""
+    if not settings.LIKES_WRITE_BEHIND:
+        return posts
+    posts = list(posts)
+    merged = like_buffer.merge(user.pk, {
+        post.pk: (getattr(post, 'liked', False), post.likes_count)
+        for post in posts
+    })
+    for post in posts:
+        post.liked, post.likes_count = merged[post.pk]
+    return posts
+
+
+def apply(user, changes):
+    """Применяет {id поста: True — лайк, False — снять лайк} и
+    возвращает новые состояния этих постов."""
+    if settings.LIKES_WRITE_BEHIND:
+        rows = list(_stored_rows(user, changes))
+        before = {pk: (liked, count) for pk, liked, count, *_ in rows}
+        recorded = like_buffer.record(user, changes, before)
+        # Число лайков видно сразу, даже если запись в базу отложена.
+        conditional.touch_posts((pk, author_id, group_id)
+                                for pk, *_, author_id, group_id in rows)
+        return recorded
+    with transaction.atomic():
+        # Те же блокировки, что и в lock_posts, вместе с состоянием лайков.
+        rows = list(_stored_rows(user, changes).select_for_update().order_by(
+            'pk'
+        ))
+        write({(user.pk, pk): changes[pk] for pk, *_ in rows},
+              {(user.pk, pk) for pk, liked, *_ in rows if liked})
+        conditional.touch_posts((pk, author_id, group_id)
+                                for pk, *_, author_id, group_id in rows)
+    return states(user, [pk for pk, *_ in rows])
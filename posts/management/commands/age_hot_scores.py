@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import hot
+
+
+class Command(BaseCommand):
+    help = ('Состаривает оценки горячей ленты на время с прошлого запуска '
+            'и удаляет остывшие')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=None,
+            help='Повторять с этим интервалом в секундах'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            factor, removed = hot.age()
+            self.stdout.write(f'Множитель: {factor:.4f}, удалено: {removed}')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
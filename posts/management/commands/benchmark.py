@@ -0,0 +1,180 @@
+import datetime as dt
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Follow, Post, User
+
+# Доли запросов в смешанной нагрузке
+TRAFFIC_MIX = {
+    'index': 40,
+    'profile': 20,
+    'post_view': 20,
+    'follow_index': 15,
+    'add_like': 5,
+}
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, percent):
+    """Процентиль методом ближайшего ранга."""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[rank - 1]
+
+
+class Command(BaseCommand):
+    help = ('Прогоняет смешанную нагрузку по основным страницам и сохраняет '
+            'задержки p50/p95/p99 и число запросов к базе')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--warmup', type=int, default=50)
+        parser.add_argument('--sample', type=int, default=500,
+                            help='Сколько постов и читателей выбрать для '
+                                 'нагрузки')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--output', default='benchmarks',
+                            help='Каталог для файлов с результатами')
+        parser.add_argument('--compare', default=None,
+                            help='Файл прошлого прогона для сравнения')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        posts = list(Post.objects.order_by('?').values_list(
+            'pk', 'author__username'
+        )[:options['sample']])
+        readers = list(Follow.objects.order_by('?').values_list(
+            'user', flat=True
+        ).distinct()[:options['sample']])
+        if not posts or not readers:
+            raise CommandError('Нужны посты и подписки, выполните '
+                               'generate_dataset')
+        readers = list(User.objects.filter(pk__in=readers))
+        clients = {}
+
+        def client_for(user):
+            if user.pk not in clients:
+                clients[user.pk] = Client()
+                clients[user.pk].force_login(user)
+            return clients[user.pk]
+
+        names = list(TRAFFIC_MIX)
+        weights = list(TRAFFIC_MIX.values())
+
+        def next_request():
+            name = rng.choices(names, weights)[0]
+            post_id, username = rng.choice(posts)
+            client = client_for(rng.choice(readers))
+            url = {
+                'index': lambda: reverse('index'),
+                'profile': lambda: reverse('profile', args=(username,)),
+                'post_view': lambda: reverse('post', args=(username,
+                                                           post_id)),
+                'follow_index': lambda: reverse('follow_index'),
+                'add_like': lambda: reverse('add_like', args=(username,
+                                                              post_id)),
+            }[name]()
+            return name, client, url
+
+        for _ in range(options['warmup']):
+            _, client, url = next_request()
+            client.get(url)
+        latencies = defaultdict(list)
+        queries = defaultdict(list)
+        for _ in range(options['requests']):
+            name, client, url = next_request()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = client.get(url)
+                elapsed = time.perf_counter() - started
+            if response.status_code >= 400:
+                raise CommandError(f'{url}: {response.status_code}')
+            latencies[name].append(elapsed * 1000)
+            queries[name].append(len(captured))
+        result = self.summary(latencies, queries)
+        self.report(result)
+        path = self.save(result, options)
+        self.stdout.write(self.style.SUCCESS(f'Результаты: {path}'))
+        if options['compare']:
+            with open(options['compare']) as file:
+                self.compare(json.load(file), result)
+
+    def summary(self, latencies, queries):
+        views = {}
+        for name in TRAFFIC_MIX:
+            values = latencies.get(name)
+            if not values:
+                continue
+            stats = {'requests': len(values)}
+            for percent in PERCENTILES:
+                stats[f'p{percent}_ms'] = round(percentile(values, percent),
+                                                2)
+            stats['max_ms'] = round(max(values), 2)
+            stats['queries'] = round(sum(queries[name]) / len(values), 2)
+            views[name] = stats
+        return {
+            'started': dt.datetime.now().isoformat(timespec='seconds'),
+            'revision': self.revision(),
+            'environment': {
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'cache': settings.CACHES['default']['BACKEND'],
+                'posts': Post.objects.count(),
+                'users': User.objects.count(),
+            },
+            'views': views,
+        }
+
+    def revision(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=settings.BASE_DIR, capture_output=True, text=True,
+                check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def report(self, result):
+        self.stdout.write(f'{"страница":<14}{"запросов":>9}{"p50":>9}'
+                          f'{"p95":>9}{"p99":>9}{"SQL":>7}')
+        for name, stats in result['views'].items():
+            self.stdout.write(
+                f'{name:<14}{stats["requests"]:>9}{stats["p50_ms"]:>9.1f}'
+                f'{stats["p95_ms"]:>9.1f}{stats["p99_ms"]:>9.1f}'
+                f'{stats["queries"]:>7.1f}'
+            )
+
+    def save(self, result, options):
+        os.makedirs(options['output'], exist_ok=True)
+        stamp = result['started'].replace(':', '')
+        path = os.path.join(options['output'], f'benchmark-{stamp}.json')
+        with open(path, 'w') as file:
+            json.dump(result, file, ensure_ascii=False, indent=2)
+        return path
+
+    def compare(self, previous, current):
+        self.stdout.write(f'Сравнение с {previous.get("revision")} '
+                          f'от {previous.get("started")}:')
+        for name, stats in current['views'].items():
+            old = previous.get('views', {}).get(name)
+            if not old:
+                continue
+            changes = []
+            for key in ('p50_ms', 'p95_ms', 'p99_ms', 'queries'):
+                if old.get(key):
+                    delta = (stats[key] - old[key]) / old[key] * 100
+                    changes.append(f'{key} {delta:+.0f}%')
+            self.stdout.write(f'  {name}: {", ".join(changes)}')
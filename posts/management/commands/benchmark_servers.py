@@ -0,0 +1,204 @@
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+from .benchmark import PERCENTILES, percentile
+
+# Сколько секунд ждать, пока сервер начнет принимать соединения
+STARTUP_TIMEOUT = 30
+REQUEST_TIMEOUT = 60
+# Клиент читает ответ такими частями; маленький буфер приема не дает ядру
+# забрать весь ответ за него, и сервер ждет медленного клиента на записи.
+READ_CHUNK = 4096
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность gunicorn с синхронными '
+            'воркерами и yatube/asgi.py под uvicorn при одинаковом числе '
+            'одновременных медленных клиентов. Серверы запускаются '
+            'отдельными процессами на свободных портах; клиент шлет запрос '
+            'двумя частями с паузой между ними и читает ответ с '
+            'ограниченной скоростью')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=100,
+                            help='Одновременных клиентов')
+        parser.add_argument('--requests', type=int, default=5,
+                            help='Запросов от каждого клиента')
+        parser.add_argument('--workers', type=int, default=10,
+                            help='Процессов WSGI и потоков пула ASGI '
+                                 '(ASGI работает в одном процессе)')
+        parser.add_argument('--client-delay', type=float, default=50,
+                            help='Миллисекунд между частями запроса')
+        parser.add_argument('--client-speed', type=float, default=64,
+                            help='Скорость чтения ответа клиентом, КБ/с')
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        posts = list(Post.objects.order_by('?').values_list(
+            'pk', 'author__username'
+        )[:100])
+        if not posts:
+            raise CommandError('Нужны посты, выполните generate_dataset')
+        slugs = list(Group.objects.values_list('slug', flat=True)[:100])
+        urls = [reverse('index'), reverse('hot')]
+        for post_id, username in posts:
+            urls.append(reverse('post', args=(username, post_id)))
+            urls.append(reverse('profile', args=(username, )))
+        urls.extend(reverse('group', args=(slug, )) for slug in slugs)
+        total = options['connections'] * options['requests']
+        self.load = [rng.choice(urls) for _ in range(total)]
+        self.stdout.write(f'{"сервер":<8}{"запр/с":>9}{"p50":>9}'
+                          f'{"p95":>9}{"p99":>9}{"ошибок":>9}')
+        workers = str(options['workers'])
+        servers = (
+            ('wsgi', ['yatube.wsgi:application', '--workers', workers], {}),
+            ('asgi', ['yatube.asgi:application', '--workers', '1',
+                      '--worker-class', 'uvicorn.workers.UvicornH11Worker'],
+             {'ASGI_THREADS': workers}),
+        )
+        for name, arguments, environment in servers:
+            port = free_port()
+            log = tempfile.TemporaryFile()
+            server = start_server(port, arguments, environment, log)
+            try:
+                wait_ready(server, port, log)
+                # Прогрев кэша, чтобы первый сервер не был в худших
+                # условиях.
+                asyncio.run(self.warm_up(port))
+                started = time.perf_counter()
+                latencies, errors = asyncio.run(self.run(port, options))
+                elapsed = time.perf_counter() - started
+            finally:
+                server.terminate()
+                server.wait(timeout=STARTUP_TIMEOUT)
+                log.close()
+            self.report(name, len(latencies) / elapsed, latencies, errors)
+
+    def clients(self, options):
+        """Очереди адресов для каждого клиента."""
+        requests = options['requests']
+        return [self.load[number * requests:(number + 1) * requests]
+                for number in range(options['connections'])]
+
+    async def warm_up(self, port):
+        for url in set(self.load):
+            await fetch(port, url)
+
+    async def run(self, port, options):
+        delay = options['client_delay'] / 1000
+        speed = options['client_speed'] * 1024
+        latencies = []
+        errors = 0
+
+        async def client(urls):
+            nonlocal errors
+            for url in urls:
+                started = time.perf_counter()
+                try:
+                    status = await asyncio.wait_for(
+                        fetch(port, url, delay, speed), REQUEST_TIMEOUT
+                    )
+                except (OSError, asyncio.TimeoutError):
+                    status = None
+                if status == 200:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+
+        await asyncio.gather(*(client(urls)
+                               for urls in self.clients(options)))
+        return latencies, errors
+
+    def report(self, name, throughput, latencies, errors):
+        values = [latency * 1000 for latency in latencies] or [0]
+        self.stdout.write(
+            f'{name:<8}{throughput:>9.1f}'
+            + ''.join(f'{percentile(values, percent):>9.1f}'
+                      for percent in PERCENTILES)
+            + f'{errors:>9}'
+        )
+
+
+def free_port():
+    with socket.socket() as listener:
+        listener.bind(('127.0.0.1', 0))
+        return listener.getsockname()[1]
+
+
+def start_server(port, arguments, environment, log):
+    env = {**os.environ, **environment,
+           'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE}
+    return subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', *arguments,
+         '--bind', f'127.0.0.1:{port}', '--chdir', settings.BASE_DIR,
+         '--log-level', 'warning'],
+        env=env, stdout=subprocess.DEVNULL, stderr=log
+    )
+
+
+def wait_ready(server, port, log):
+    """Ждет первого ответа: порт gunicorn открывает раньше, чем воркер
+    готов (или упал при запуске)."""
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            break
+        try:
+            if asyncio.run(fetch(port, reverse('index'))):
+                return
+        except OSError:
+            pass
+        time.sleep(0.1)
+    log.seek(0)
+    raise CommandError('Сервер не запустился:\n'
+                       + log.read().decode(errors='replace'))
+
+
+async def fetch(port, url, delay=0, speed=None):
+    """Медленный клиент: запрос уходит двумя частями с паузой delay, ответ
+    читается со скоростью speed байт в секунду. Возвращает код ответа или
+    None, если сервер закрыл соединение без ответа."""
+    client = socket.socket()
+    client.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, READ_CHUNK)
+    client.setblocking(False)
+    try:
+        await asyncio.get_running_loop().sock_connect(client,
+                                                      ('127.0.0.1', port))
+    except OSError:
+        client.close()
+        raise
+    reader, writer = await asyncio.open_connection(sock=client,
+                                                   limit=READ_CHUNK)
+    try:
+        request = (f'GET {url} HTTP/1.1\r\nHost: 127.0.0.1\r\n'
+                   f'Connection: close\r\n\r\n').encode()
+        half = len(request) // 2
+        writer.write(request[:half])
+        await writer.drain()
+        await asyncio.sleep(delay)
+        writer.write(request[half:])
+        await writer.drain()
+        status = await reader.readline()
+        while True:
+            chunk = await reader.read(READ_CHUNK)
+            if not chunk:
+                break
+            if speed:
+                await asyncio.sleep(len(chunk) / speed)
+    finally:
+        writer.close()
+    parts = status.split()
+    return int(parts[1]) if len(parts) > 1 else None
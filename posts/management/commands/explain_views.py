@@ -0,0 +1,106 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post
+
+SEQ_SCAN_PATTERNS = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    # SQLite: полный проход по таблице без индекса
+    'sqlite': re.compile(r'SCAN (?:TABLE )?(\w+)(?! USING (?:COVERING )?INDEX)'
+                         r'(?:\s|$)'),
+}
+EXPLAIN_PREFIX = {
+    'postgresql': 'EXPLAIN ',
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+}
+# Крошечные служебные таблицы, полный проход по ним не страшен
+IGNORED_TABLES = {'django_site', 'django_content_type'}
+
+
+class Command(BaseCommand):
+    help = ('Запускает основные страницы, выполняет EXPLAIN для каждого их '
+            'запроса и сообщает о полных проходах по таблицам')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fail',
+            action='store_true',
+            help='Завершиться с ошибкой, если найдены полные проходы'
+        )
+
+    def sample_urls(self):
+        post = Post.objects.select_related('author').first()
+        group = Group.objects.first()
+        follow = Follow.objects.select_related('user').first()
+        if post is None:
+            raise CommandError('Нужен хотя бы один пост в базе')
+        viewer = follow.user if follow else post.author
+        urls = {
+            'index': reverse('index'),
+            'profile': reverse('profile', args=(post.author.username,)),
+            'post': reverse('post', args=(post.author.username, post.id)),
+            'follow_index': reverse('follow_index'),
+        }
+        if group is not None:
+            urls['group'] = reverse('group', args=(group.slug,))
+        return viewer, urls
+
+    def explain(self, sql):
+        vendor = connection.vendor
+        with connection.cursor() as cursor:
+            cursor.execute(EXPLAIN_PREFIX[vendor] + sql)
+            rows = cursor.fetchall()
+        return '\n'.join(str(row[-1]) for row in rows)
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        if vendor not in SEQ_SCAN_PATTERNS:
+            raise CommandError(f'EXPLAIN для {vendor} не поддерживается')
+        pattern = SEQ_SCAN_PATTERNS[vendor]
+        viewer, urls = self.sample_urls()
+        client = Client()
+        client.force_login(viewer)
+        known_tables = set(connection.introspection.table_names())
+        if vendor == 'postgresql':
+            # На маленькой базе планировщик предпочтет Seq Scan даже при
+            # наличии индекса; отключаем его, чтобы видеть, есть ли вообще
+            # индексный путь.
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+        try:
+            found = self.check_urls(client, urls, pattern, known_tables)
+        finally:
+            if vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('RESET enable_seqscan')
+        if found and options['fail']:
+            raise CommandError(f'Найдено полных проходов: {found}')
+
+    def check_urls(self, client, urls, pattern, known_tables):
+        found = 0
+        for name, url in urls.items():
+            with CaptureQueriesContext(connection) as queries:
+                client.get(url)
+            scans = []
+            for query in queries.captured_queries:
+                sql = query['sql']
+                if not sql.lstrip().upper().startswith('SELECT'):
+                    continue
+                tables = set(pattern.findall(self.explain(sql)))
+                tables = tables & known_tables - IGNORED_TABLES
+                if tables:
+                    scans.append((sorted(tables), sql))
+            found += len(scans)
+            style = self.style.WARNING if scans else self.style.SUCCESS
+            self.stdout.write(style(
+                f'{name}: запросов {len(queries)}, '
+                f'полных проходов {len(scans)}'
+            ))
+            for tables, sql in scans:
+                self.stdout.write(f'  {", ".join(tables)}: {sql}')
+        return found
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import like_buffer
+
+
+class Command(BaseCommand):
+    help = 'Записывает в базу лайки, накопленные в буфере'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=None,
+            help='Повторять сброс с этим интервалом в секундах'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            flushed = like_buffer.flush()
+            self.stdout.write(f'Записано операций: {flushed}')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
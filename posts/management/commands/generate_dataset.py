@@ -0,0 +1,227 @@
+import datetime as dt
+import itertools
+import random
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from posts import feed
+from posts.models import Comment, Follow, Group, Like, Post, User
+
+WORDS = (
+    'день утро вечер город море лес книга фильм музыка друзья работа '
+    'проект код кофе чай дорога поезд самолет горы река погода дождь '
+    'солнце снег осень весна лето зима кот собака семья праздник идея '
+    'новости спорт футбол бег велосипед фото картина концерт театр '
+    'интересный новый старый хороший долгий короткий яркий тихий '
+    'читать писать смотреть гулять думать делать ехать готовить'
+).split()
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Позволяет bulk_create записать заданные даты в поля auto_now_add."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class ZipfSampler:
+    """Выбор с вероятностью 1 / rank ** alpha: немногие популярные
+    элементы получают большую часть выборок."""
+
+    def __init__(self, population, alpha, rng):
+        self.population = list(population)
+        rng.shuffle(self.population)
+        self.cum_weights = list(itertools.accumulate(
+            1 / rank ** alpha for rank in range(1, len(self.population) + 1)
+        ))
+        self.rng = rng
+
+    def sample(self, k=1):
+        return self.rng.choices(self.population, cum_weights=self.cum_weights,
+                                k=k)
+
+    def top(self, count):
+        return self.population[:count]
+
+
+class Command(BaseCommand):
+    help = ('Массово заполняет базу синтетическими пользователями, группами, '
+            'постами, подписками, лайками и комментариями')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--follows', type=int, default=20,
+                            help='Среднее число подписок пользователя')
+        parser.add_argument('--heavy-follower', type=int, default=0,
+                            help='Создать пользователя bench_heavy, '
+                                 'подписанного на столько авторов')
+        parser.add_argument('--likes', type=int, default=50000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--alpha', type=float, default=1.1,
+                            help='Показатель степенного закона '
+                                 'популярности авторов и постов')
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней разбросать посты')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--prefix', default='bench_',
+                            help='Префикс имен созданных пользователей')
+
+    def insert(self, model, objects):
+        total = 0
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) == self.batch_size:
+                model.objects.bulk_create(batch, ignore_conflicts=True)
+                total += len(batch)
+                batch = []
+        if batch:
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+            total += len(batch)
+        return total
+
+    @contextmanager
+    def step(self, name):
+        started = time.monotonic()
+        yield
+        self.stdout.write(f'{name}: {time.monotonic() - started:.1f} с')
+
+    def new_ids(self, model, last_id, *fields):
+        rows = model.objects.filter(pk__gt=last_id).order_by('pk')
+        if fields:
+            return list(rows.values_list('pk', *fields))
+        return list(rows.values_list('pk', flat=True))
+
+    def last_id(self, model):
+        last = model.objects.order_by('-pk').values_list('pk', flat=True)
+        return last.first() or 0
+
+    def handle(self, *args, **options):
+        if options['users'] < 2 or options['posts'] < 1:
+            raise CommandError('Нужны хотя бы два пользователя и один пост')
+        self.batch_size = options['batch_size']
+        rng = random.Random(options['seed'])
+        prefix = options['prefix']
+        with transaction.atomic():
+            with self.step('Пользователи'):
+                users = self.create_users(options['users'], prefix)
+            with self.step('Группы'):
+                groups = self.create_groups(options['groups'], prefix)
+            authors = ZipfSampler(users, options['alpha'], rng)
+            with self.step('Посты'):
+                posts = self.create_posts(options, authors, groups, rng)
+            with self.step('Подписки'):
+                self.create_follows(options, users, authors, rng, prefix)
+            popular_posts = ZipfSampler(posts, options['alpha'], rng)
+            with self.step('Лайки'):
+                self.insert(Like, (
+                    Like(user_id=rng.choice(users), post_id=post_id)
+                    for post_id, _ in popular_posts.sample(options['likes'])
+                ))
+            with self.step('Комментарии'):
+                self.create_comments(options, users, popular_posts, rng)
+        with self.step('Счетчики'):
+            call_command('sync_counters', stdout=self.stdout)
+        with self.step('Ленты'):
+            feed.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: пользователей {len(users)}, постов {len(posts)}. '
+            'Для поиска выполните rebuild_search_index.'
+        ))
+
+    def create_users(self, count, prefix):
+        last_id = self.last_id(User)
+        start = User.objects.filter(username__startswith=prefix).count()
+        password = make_password('bench')
+        self.insert(User, (
+            User(username=f'{prefix}{number}', password=password,
+                 first_name='Пользователь', last_name=str(number))
+            for number in range(start, start + count)
+        ))
+        return self.new_ids(User, last_id)
+
+    def create_groups(self, count, prefix):
+        last_id = self.last_id(Group)
+        start = Group.objects.filter(slug__startswith=prefix).count()
+        self.insert(Group, (
+            Group(title=f'Группа {number}', slug=f'{prefix}{number}',
+                  description=f'Синтетическая группа {number}')
+            for number in range(start, start + count)
+        ))
+        return self.new_ids(Group, last_id)
+
+    def create_posts(self, options, authors, groups, rng):
+        last_id = self.last_id(Post)
+        now = timezone.now()
+        seconds = options['days'] * 24 * 60 * 60
+        pub_date = Post._meta.get_field('pub_date')
+        with explicit_dates(pub_date):
+            self.insert(Post, (
+                Post(
+                    text=' '.join(rng.choices(WORDS, k=rng.randint(5, 40))),
+                    author_id=author_id,
+                    group_id=(rng.choice(groups)
+                              if groups and rng.random() < 0.7 else None),
+                    pub_date=now - dt.timedelta(
+                        seconds=rng.uniform(0, seconds)
+                    ),
+                )
+                for author_id in authors.sample(options['posts'])
+            ))
+        return self.new_ids(Post, last_id, 'pub_date')
+
+    def create_follows(self, options, users, authors, rng, prefix):
+        def follows():
+            # Число подписок тоже распределено по степенному закону,
+            # среднее у Парето(1.5) равно 3.
+            for user_id in users:
+                degree = round(rng.paretovariate(1.5) * options['follows'] / 3)
+                targets = set(authors.sample(min(degree, len(users))))
+                targets.discard(user_id)
+                for author_id in targets:
+                    yield Follow(user_id=user_id, author_id=author_id)
+
+        self.insert(Follow, follows())
+        heavy = options['heavy_follower']
+        if heavy:
+            user, _ = User.objects.get_or_create(
+                username=f'{prefix}heavy',
+                defaults={'password': make_password('bench')}
+            )
+            self.insert(Follow, (
+                Follow(user_id=user.pk, author_id=author_id)
+                for author_id in authors.top(heavy)
+                if author_id != user.pk
+            ))
+
+    def create_comments(self, options, users, popular_posts, rng):
+        now = timezone.now()
+        created = Comment._meta.get_field('created')
+        with explicit_dates(created):
+            self.insert(Comment, (
+                Comment(
+                    post_id=post_id,
+                    author_id=rng.choice(users),
+                    text=' '.join(rng.choices(WORDS, k=rng.randint(3, 15))),
+                    created=min(now, pub_date + dt.timedelta(
+                        hours=rng.expovariate(1 / 12)
+                    )),
+                )
+                for post_id, pub_date in popular_posts.sample(
+                    options['comments']
+                )
+            ))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Строит недостающие миниатюры и варианты изображений постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Сколько постов обработать за запуск'
+        )
+
+    def handle(self, *args, **options):
+        pending = Post.objects.exclude(image='').exclude(
+            image__isnull=True
+        ).filter(
+            Q(thumbnail='') | Q(image_variants='')
+        ).values_list('pk', flat=True)
+        if options['limit']:
+            pending = pending[:options['limit']]
+        done = 0
+        for post_id in pending.iterator():
+            if thumbnails.generate(post_id):
+                done += 1
+        self.stdout.write(self.style.SUCCESS(f'Построено миниатюр: {done}'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает поисковый индекс постов'
+
+    def handle(self, *args, **options):
+        post_ids = Post.objects.order_by('pk').values_list('pk', flat=True)
+        total = 0
+        for post_id in post_ids.iterator():
+            search.index_post(post_id)
+            total += 1
+        self.stdout.write(
+            self.style.SUCCESS(f'Проиндексировано постов: {total}')
+        )
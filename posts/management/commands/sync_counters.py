@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from posts import cards, conditional, groups, stats
+from posts.counters import real_count
+from posts.models import Comment, Like, Post
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает сохраненные счетчики лайков и комментариев постов, '
+            'записей групп и статистику пользователей')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько постов обновлять одним запросом'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        drifted = Post.objects.order_by().annotate(
+            real_likes=real_count(Like, 'post'),
+            real_comments=real_count(Comment, 'post'),
+        ).exclude(
+            likes_count=F('real_likes'),
+            comments_count=F('real_comments'),
+        ).values_list('pk', flat=True)
+        post_ids = list(drifted)
+        for start in range(0, len(post_ids), batch_size):
+            Post.objects.filter(
+                pk__in=post_ids[start:start + batch_size]
+            ).update(
+                likes_count=real_count(Like, 'post'),
+                comments_count=real_count(Comment, 'post'),
+            )
+        # Счетчик комментариев входит в закэшированную карточку поста.
+        for post_id in post_ids:
+            cards.invalidate_post(post_id)
+        self.stdout.write(
+            self.style.SUCCESS(f'Исправлено постов: {len(post_ids)}')
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'Исправлено групп: {groups.rebuild()}')
+        )
+        users = stats.rebuild()
+        # Исправленные счетчики видны на страницах, сохраненных клиентами.
+        conditional.touch(conditional.SITE)
+        self.stdout.write(
+            self.style.SUCCESS(f'Исправлено пользователей: {users}')
+        )
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.6 on 2026-10-18 02:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='thumbnail',
+            field=models.CharField(blank=True, editable=False, help_text='Ссылка на готовую миниатюру изображения', max_length=255, verbose_name='Миниатюра'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.6 on 2026-10-18 02:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_post_thumbnail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_variants',
+            field=models.TextField(blank=True, editable=False, help_text='JSON: MIME-тип -> [[ширина, ссылка], ...]', verbose_name='Варианты изображения'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 2.2.6 on 2026-10-18 02:47
+
+import django.contrib.postgres.search
+from django.db import migrations, models
+import django.db.models.deletion
+
+GIN_INDEX = 'post_search_vector_gin_idx'
+
+
+def create_gin_index(apps, schema_editor):
+    # GIN-индекс есть только в PostgreSQL; на остальных базах поиск идет
+    # по таблице SearchTerm.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE INDEX {GIN_INDEX} ON posts_post USING gin (search_vector)'
+        )
+
+
+def drop_gin_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {GIN_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_post_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, help_text='Текст поста, группы и комментариев (PostgreSQL)', null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(help_text='Нормализованная основа слова', max_length=64, verbose_name='Основа слова')),
+                ('weight', models.FloatField(help_text='Сумма весов вхождений слова в пост', verbose_name='Вес')),
+                ('post', models.ForeignKey(help_text='Пост, в котором встречается слово', on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='posts.Post', verbose_name='Пост')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='searchterm',
+            constraint=models.UniqueConstraint(fields=('term', 'post'), name='unique_search_terms'),
+        ),
+        migrations.RunPython(create_gin_index, drop_gin_index),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 2.2.6 on 2026-10-18 03:12
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def fill_stats(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    UserStats = apps.get_model('posts', 'UserStats')
+
+    def real_count(model_name, field):
+        model = apps.get_model('posts', model_name)
+        counts = model.objects.filter(**{field: OuterRef('pk')}).order_by(
+        ).values(field).annotate(total=Count('pk')).values('total')
+        return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=pk)
+         for pk in User.objects.values_list('pk', flat=True).iterator()]
+    )
+    UserStats.objects.update(
+        followers_count=real_count('Follow', 'author'),
+        following_count=real_count('Follow', 'user'),
+        posts_count=real_count('Post', 'author'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0007_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('followers_count', models.PositiveIntegerField(default=0, help_text='Обновляется автоматически', verbose_name='Количество подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, help_text='Обновляется автоматически', verbose_name='Количество подписок')),
+                ('posts_count', models.PositiveIntegerField(default=0, help_text='Обновляется автоматически', verbose_name='Количество записей')),
+            ],
+            options={
+                'verbose_name': 'Статистика пользователя',
+                'verbose_name_plural': 'Статистика пользователей',
+            },
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 2.2.6 on 2026-10-18 03:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_group_posts_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HotScore',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='hot', serialize=False, to='posts.Post', verbose_name='Пост')),
+                ('score', models.FloatField(default=0, help_text='Затухающая сумма весов лайков и комментариев', verbose_name='Оценка')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='hotscore',
+            index=models.Index(fields=['-score'], name='hotscore_score_idx'),
+        ),
+    ]
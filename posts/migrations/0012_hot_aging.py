@@ -0,0 +1,27 @@
+# Generated by Django 2.2.6 on 2026-10-18 04:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_feed_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HotAging',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('aged', models.DateTimeField(verbose_name='Последнее состаривание')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='like',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Дата лайка'),
+            preserve_default=False,
+        ),
+    ]
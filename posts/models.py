@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.db.models.expressions import Exists, OuterRef
 
 
@@ -7,6 +8,10 @@ User = get_user_model()
 
 
 class PostQuerySet(models.Manager):
+    def get_queryset(self):
+        # tsvector нужен только поиску, а весит не меньше текста поста.
+        return super().get_queryset().defer('search_vector')
+
     def annotate_liked(self, user):
         return self.annotate(
             liked=Exists(
@@ -33,6 +38,12 @@ class Group(models.Model):
         verbose_name='Описание',
         help_text='Напишите описание группы'
     )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество записей',
+        help_text='Обновляется автоматически'
+    )
 
     def __str__(self):
         return self.title
@@ -54,7 +65,8 @@ class Post(models.Model):
         verbose_name='Автор',
         help_text='Кто автор',
         on_delete=models.CASCADE,
-        related_name="posts"
+        related_name="posts",
+        db_index=False
     )
     group = models.ForeignKey(
         Group,
@@ -63,7 +75,8 @@ class Post(models.Model):
         related_name='posts',
         blank=True,
         null=True,
-        help_text='Выберите группу'
+        help_text='Выберите группу',
+        db_index=False
     )
     image = models.ImageField(
         upload_to='posts/',
@@ -72,10 +85,51 @@ class Post(models.Model):
         verbose_name='Изображение',
         help_text='Выберите изображение'
     )
+    thumbnail = models.CharField(
+        max_length=255,
+        blank=True,
+        editable=False,
+        verbose_name='Миниатюра',
+        help_text='Ссылка на готовую миниатюру изображения'
+    )
+    image_variants = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name='Варианты изображения',
+        help_text='JSON: MIME-тип -> [[ширина, ссылка], ...]'
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор',
+        help_text='Текст поста, группы и комментариев (PostgreSQL)'
+    )
+    likes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество лайков',
+        help_text='Обновляется автоматически'
+    )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество комментариев',
+        help_text='Обновляется автоматически'
+    )
     objects = PostQuerySet()
 
     class Meta:
         ordering = ('-pub_date', )
+        # Индексы повторяют ленты: фильтр по автору или группе и сортировка
+        # по дате, а общая лента листается курсором по (pub_date, id).
+        indexes = [
+            models.Index(fields=['author', '-pub_date'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date'],
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_id_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -88,7 +142,8 @@ class Comment(models.Model):
         related_name='comments',
         verbose_name='Пост',
         help_text='Комментарии к какому посту',
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False
     )
     author = models.ForeignKey(
         User,
@@ -109,6 +164,10 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ('-created', )
+        indexes = [
+            models.Index(fields=['post', '-created'],
+                         name='comment_post_created_idx'),
+        ]
 
     def __str__(self):
         return self.text
@@ -140,6 +199,41 @@ class Follow(models.Model):
         ]
 
 
+class UserStats(models.Model):
+
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        verbose_name='Пользователь',
+        related_name='stats',
+        on_delete=models.CASCADE
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество подписчиков',
+        help_text='Обновляется автоматически'
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество подписок',
+        help_text='Обновляется автоматически'
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество записей',
+        help_text='Обновляется автоматически'
+    )
+
+    class Meta:
+        verbose_name = 'Статистика пользователя'
+        verbose_name_plural = 'Статистика пользователей'
+        # Популярные авторы для ленты подписок (feed.pull_authors)
+        indexes = [
+            models.Index(fields=['followers_count'],
+                         name='userstats_followers_idx'),
+        ]
+
+
 class Like(models.Model):
 
     user = models.ForeignKey(
@@ -152,6 +246,10 @@ class Like(models.Model):
         related_name='likes',
         on_delete=models.CASCADE
     )
+    created = models.DateTimeField(
+        verbose_name='Дата лайка',
+        auto_now_add=True
+    )
 
     class Meta:
         verbose_name = 'Лайк',
@@ -162,3 +260,103 @@ class Like(models.Model):
                 name='unique_likes'
             )
         ]
+
+
+class FeedItem(models.Model):
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='Подписчик',
+        help_text='Чья это лента',
+        related_name='feed_items',
+        on_delete=models.CASCADE
+    )
+    post = models.ForeignKey(
+        Post,
+        verbose_name='Пост',
+        help_text='Пост в ленте подписчика',
+        related_name='feed_items',
+        on_delete=models.CASCADE
+    )
+    author = models.ForeignKey(
+        User,
+        verbose_name='Автор поста',
+        help_text='Копия post.author для отписки',
+        related_name='+',
+        on_delete=models.CASCADE
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации',
+        help_text='Копия post.pub_date для сортировки ленты'
+    )
+
+    class Meta:
+        ordering = ('-pub_date', )
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_feed_items'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='feed_user_pub_date_post_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='feed_user_author_idx'),
+        ]
+
+
+class HotScore(models.Model):
+
+    post = models.OneToOneField(
+        Post,
+        primary_key=True,
+        verbose_name='Пост',
+        related_name='hot',
+        on_delete=models.CASCADE
+    )
+    score = models.FloatField(
+        default=0,
+        verbose_name='Оценка',
+        help_text='Затухающая сумма весов лайков и комментариев'
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-score'], name='hotscore_score_idx'),
+        ]
+
+
+class HotAging(models.Model):
+    """Единственная строка: когда оценки горячей ленты состарены в
+    последний раз."""
+
+    aged = models.DateTimeField(verbose_name='Последнее состаривание')
+
+
+class SearchTerm(models.Model):
+
+    term = models.CharField(
+        max_length=64,
+        verbose_name='Основа слова',
+        help_text='Нормализованная основа слова'
+    )
+    post = models.ForeignKey(
+        Post,
+        verbose_name='Пост',
+        help_text='Пост, в котором встречается слово',
+        related_name='search_terms',
+        on_delete=models.CASCADE
+    )
+    weight = models.FloatField(
+        verbose_name='Вес',
+        help_text='Сумма весов вхождений слова в пост'
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['term', 'post'],
+                name='unique_search_terms'
+            )
+        ]
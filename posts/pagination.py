@@ -0,0 +1,154 @@
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import Q
+
+
+class CursorPage(Sequence):
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        # Курсоры строятся по строкам выборки, даже если object_list потом
+        # заменен загруженными по ним объектами (paginate(load=...)).
+        self.keys = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def next_cursor(self):
+        return self.paginator.encode_cursor(self.keys[-1])
+
+    def previous_cursor(self):
+        return self.paginator.encode_cursor(self.keys[0])
+
+
+class CursorPaginator:
+    """Keyset-пагинация: страница выбирается условием по ключу сортировки,
+    поэтому нет ни COUNT(*), ни OFFSET, и цена запроса не зависит от
+    глубины страницы."""
+
+    is_cursor = True
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id')):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+
+    def encode_cursor(self, obj):
+        values = []
+        for name in self.fields:
+            value = getattr(obj, name)
+            values.append(value.isoformat() if hasattr(value, 'isoformat')
+                          else value)
+        raw = json.dumps(values).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            values = json.loads(raw.decode())
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            return None
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            return None
+        model = self.object_list.model
+        try:
+            return [model._meta.get_field(name).to_python(value)
+                    for name, value in zip(self.fields, values)]
+        except Exception:
+            return None
+
+    def _keyset_filter(self, values, forward):
+        """Условие «строго после курсора» в порядке self.ordering
+        (forward=False — в обратном порядке)."""
+        conditions = []
+        for position, name in enumerate(self.ordering):
+            field = name.lstrip('-')
+            descending = name.startswith('-') == forward
+            lookup = 'lt' if descending else 'gt'
+            equal = {self.fields[i]: values[i] for i in range(position)}
+            conditions.append(Q(**equal, **{f'{field}__{lookup}':
+                                            values[position]}))
+        return reduce(or_, conditions)
+
+    def _reversed_ordering(self):
+        return tuple(name[1:] if name.startswith('-') else f'-{name}'
+                     for name in self.ordering)
+
+    def get_page(self, after=None, before=None):
+        before_values = self.decode_cursor(before)
+        if before_values is not None:
+            rows = list(self.object_list.filter(
+                self._keyset_filter(before_values, forward=False)
+            ).order_by(*self._reversed_ordering())[:self.per_page + 1])
+            if len(rows) > self.per_page:
+                rows = rows[:self.per_page]
+                rows.reverse()
+                return CursorPage(rows, self, True, True)
+            # Дошли до самого нового поста: отдаем первую страницу целиком.
+            return self.get_page()
+        after_values = self.decode_cursor(after)
+        queryset = self.object_list
+        if after_values is not None:
+            queryset = queryset.filter(
+                self._keyset_filter(after_values, forward=True)
+            )
+        rows = list(queryset.order_by(*self.ordering)[:self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        return CursorPage(rows[:self.per_page], self, has_next,
+                          after_values is not None)
+
+
+def paginate(request, object_list, per_page=None, count=None,
+             ordering=('-pub_date', '-id'), load=None):
+    """Небольшие выборки листаются пронумерованными страницами, большие —
+    курсором (?after=/?before=). count — сохраненный размер выборки,
+    если он известен: тогда считать строки не нужно. load(rows) — объекты
+    для показа вместо строк страницы, если выборка дает только ключи."""
+    per_page = per_page or settings.POSTS_PER_PAGE
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    if not (after or before):
+        limit = settings.NUMBERED_PAGINATION_LIMIT
+        size = count
+        if size is None:
+            size = object_list.order_by().values('pk')[:limit + 1].count()
+        if size <= limit:
+            paginator = Paginator(object_list, per_page)
+            paginator.count = size
+            page = paginator.get_page(request.GET.get('page'))
+            if load is not None:
+                page.object_list = load(list(page.object_list))
+            return page
+    page = CursorPaginator(object_list, per_page, ordering).get_page(
+        after, before
+    )
+    if load is not None:
+        page.object_list = load(page.object_list)
+    return page
@@ -0,0 +1,204 @@
+"""Полнотекстовый поиск по постам, их комментариям и группам.
+
+В PostgreSQL у поста хранится tsvector (конфигурация russian) под
+GIN-индексом. На остальных базах (SQLite в тестах) используется
+инвертированный индекс SearchTerm с упрощенным стеммером. Индекс поста
+обновляется сигналами при сохранении поста, комментария или группы; новый
+комментарий дописывается к индексу, не перечитывая остальные.
+"""
+import re
+from collections import Counter
+
+from django.contrib.postgres.search import (CombinedSearchVector,
+                                            SearchQuery, SearchRank,
+                                            SearchVector, SearchVectorField)
+from django.db import connection
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Cast, Coalesce
+
+from .models import Comment, Group, Post, SearchTerm
+
+CONFIG = 'russian'
+# Веса частей документа; совпадают с весами A, B, C в ts_rank
+WEIGHTS = {'A': 1.0, 'B': 0.4, 'C': 0.2}
+WORD = re.compile(r'\w+', re.UNICODE)
+MIN_STEM = 3
+MAX_TERM = 64
+# Вес ниже этого — остаток округления после вычитания комментария
+MIN_WEIGHT = 0.01
+STOP_WORDS = frozenset(
+    'и в во не что он на я с со как а то все она так его но да ты к у же '
+    'вы за бы по только ее мне было вот от меня еще нет о из ему теперь '
+    'когда даже ну вдруг ли если уже или ни быть был него до вас нибудь '
+    'the a an and or of to in on is are was for with at by'.split()
+)
+RU_REFLEXIVE = ('ся', 'сь')
+RU_ENDINGS = sorted((
+    'ившись', 'ывшись', 'вшись', 'ивши', 'ывши', 'вши',
+    'иями', 'ями', 'ами', 'ией', 'ием', 'ях', 'ах', 'ям', 'ам',
+    'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ых', 'их', 'ый', 'ий', 'ой',
+    'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ую', 'юю', 'ом', 'ем', 'ов', 'ев',
+    'ей', 'ия', 'ья', 'ье', 'ью', 'ию', 'ии',
+    'ешь', 'ете', 'ейте', 'уйте', 'ила', 'ыла', 'ала', 'яла', 'или', 'ыли',
+    'али', 'ите', 'ует', 'уют', 'ить', 'ыть', 'ать', 'ять',
+    'еть', 'ишь', 'ть',
+    'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+), key=len, reverse=True)
+EN_ENDINGS = ('ingly', 'edly', 'ing', 'ies', 'ied', 'ed', 'es', 's')
+CYRILLIC = re.compile('[а-я]')
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    endings = RU_ENDINGS if CYRILLIC.search(word) else EN_ENDINGS
+    if endings is RU_ENDINGS:
+        for ending in RU_REFLEXIVE:
+            if word.endswith(ending) and len(word) - 2 >= MIN_STEM:
+                word = word[:-2]
+                break
+    for ending in endings:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def terms(text):
+    return [
+        stem(word)[:MAX_TERM] for word in WORD.findall(text or '')
+        if word.lower() not in STOP_WORDS and len(word) > 1
+    ]
+
+
+def uses_postgres():
+    return connection.vendor == 'postgresql'
+
+
+def _document(post):
+    """Части документа поста: (текст, вес)."""
+    comments = Comment.objects.filter(post_id=post.pk).values_list(
+        'text', flat=True
+    )
+    group = post.group.title if post.group_id else ''
+    return [
+        (post.text, 'A'),
+        (group, 'B'),
+        (' '.join(comments), 'C'),
+    ]
+
+
+def index_post(post_id):
+    post = Post.objects.select_related('group').filter(pk=post_id).first()
+    if post is None:
+        return
+    document = _document(post)
+    if uses_postgres():
+        vector = None
+        for text, weight in document:
+            part = SearchVector(Value(text), weight=weight, config=CONFIG)
+            vector = part if vector is None else vector + part
+        Post.objects.filter(pk=post_id).update(search_vector=vector)
+        return
+    weights = Counter()
+    for text, weight in document:
+        for term in terms(text):
+            weights[term] += WEIGHTS[weight]
+    SearchTerm.objects.filter(post_id=post_id).delete()
+    SearchTerm.objects.bulk_create([
+        SearchTerm(term=term, post_id=post_id, weight=weight)
+        for term, weight in weights.items()
+    ])
+
+
+def _shift_terms(post_id, text, sign):
+    """Прибавляет (sign=1) или вычитает (sign=-1) слова комментария
+    в SearchTerm поста."""
+    counts = Counter(terms(text))
+    if not counts:
+        return
+    stored = SearchTerm.objects.filter(post_id=post_id)
+    existing = set(stored.filter(term__in=counts).values_list(
+        'term', flat=True
+    ))
+    by_delta = {}
+    for term in existing:
+        delta = sign * counts[term] * WEIGHTS['C']
+        by_delta.setdefault(delta, []).append(term)
+    for delta, group in by_delta.items():
+        stored.filter(term__in=group).update(weight=F('weight') + delta)
+    if sign > 0:
+        SearchTerm.objects.bulk_create([
+            SearchTerm(term=term, post_id=post_id,
+                       weight=count * WEIGHTS['C'])
+            for term, count in counts.items() if term not in existing
+        ], ignore_conflicts=True)
+    else:
+        stored.filter(weight__lt=MIN_WEIGHT).delete()
+
+
+def index_comment(post_id, text):
+    """Дописывает новый комментарий к индексу поста."""
+    if not uses_postgres():
+        _shift_terms(post_id, text, 1)
+        return
+    # NULL у поста, который еще не индексировался.
+    stored = Coalesce(F('search_vector'),
+                      Cast(Value(''), output_field=SearchVectorField()))
+    vector = CombinedSearchVector(
+        stored, CombinedSearchVector.ADD,
+        SearchVector(Value(text), weight='C', config=CONFIG), CONFIG
+    )
+    Post.objects.filter(pk=post_id).update(search_vector=vector)
+
+
+def unindex_comment(post_id, text):
+    """Убирает удаленный комментарий из индекса поста."""
+    if uses_postgres():
+        # Из tsvector нельзя вычесть слова: они могут быть и в других
+        # частях поста. Удаление редкое, поэтому пересобираем.
+        index_post(post_id)
+        return
+    _shift_terms(post_id, text, -1)
+
+
+def index_group(group_id):
+    for post_id in Post.objects.filter(group_id=group_id).values_list(
+            'pk', flat=True).iterator():
+        index_post(post_id)
+
+
+def search_posts(query, queryset=None):
+    """Посты, подходящие под все слова запроса, по убыванию релевантности."""
+    if queryset is None:
+        queryset = Post.objects.all()
+    if uses_postgres():
+        search_query = SearchQuery(query, config=CONFIG)
+        return queryset.filter(search_vector=search_query).annotate(
+            rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-rank', '-pub_date')
+    query_terms = set(terms(query))
+    if not query_terms:
+        return queryset.none()
+    matched = SearchTerm.objects.filter(
+        term__in=query_terms
+    ).values('post').annotate(
+        matches=Count('term')
+    ).filter(matches=len(query_terms)).values('post')
+    return queryset.filter(pk__in=matched).annotate(
+        rank=Coalesce(Sum('search_terms__weight',
+                          filter=Q(search_terms__term__in=query_terms)), 0.0)
+    ).order_by('-rank', '-pub_date')
+
+
+def search_groups(query):
+    words = terms(query)
+    if not words:
+        return Group.objects.none()
+    condition = Q()
+    for word in words:
+        # LIKE в SQLite не различает регистр только у латиницы.
+        variants = Q()
+        for variant in {word, word.capitalize()}:
+            variants |= (Q(title__icontains=variant)
+                         | Q(description__icontains=variant))
+        condition &= variants
+    return Group.objects.filter(condition).order_by('title')
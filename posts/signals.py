@@ -0,0 +1,180 @@
+import threading
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from . import cards, conditional, feed, groups, hot, images, search, stats
+from .models import Comment, Follow, Group, Like, Post, User, UserStats
+
+# Посты, которые удаляются прямо сейчас: каскадно удаляемые лайки и
+# комментарии таких постов не должны обновлять их счетчики.
+_deleting = threading.local()
+
+
+def _deleting_posts():
+    if not hasattr(_deleting, 'ids'):
+        _deleting.ids = set()
+    return _deleting.ids
+
+
+def change_counter(post_id, field, delta):
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(**{f'{field}__gte': -delta})
+    posts.update(**{field: F(field) + delta})
+
+
+@receiver(post_init, sender=Post)
+def post_loaded(sender, instance, **kwargs):
+    # Группа, с которой пост был загружен: при смене группы счетчики
+    # записей переносятся со старой на новую.
+    instance._saved_group_id = instance.__dict__.get('group_id')
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        stats.change(instance.author_id, 'posts_count', 1)
+        if instance.group_id:
+            groups.change_count(instance.group_id, 1)
+        feed.fan_out(instance)
+    else:
+        cards.invalidate_post(instance.pk)
+        previous = getattr(instance, '_saved_group_id', None)
+        if previous != instance.group_id:
+            if previous:
+                groups.change_count(previous, -1)
+            if instance.group_id:
+                groups.change_count(instance.group_id, 1)
+    # При переносе пост пропадает и со страницы прежней группы.
+    conditional.touch_posts([
+        (instance.pk, instance.author_id, group_id)
+        for group_id in {instance.group_id,
+                         getattr(instance, '_saved_group_id', None)}
+    ])
+    instance._saved_group_id = instance.group_id
+    search.index_post(instance.pk)
+
+
+@receiver(pre_delete, sender=Post)
+def post_pre_delete(sender, instance, **kwargs):
+    _deleting_posts().add(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_post_delete(sender, instance, **kwargs):
+    _deleting_posts().discard(instance.pk)
+    stats.change(instance.author_id, 'posts_count', -1)
+    if instance.group_id:
+        groups.change_count(instance.group_id, -1)
+    cards.invalidate_post(instance.pk)
+    conditional.touch_posts([(instance.pk, instance.author_id,
+                              instance.group_id)])
+    # Файлы удаляем только после коммита: откат вернул бы пост без них.
+    post_id = instance.pk
+    transaction.on_commit(lambda: images.delete_variants(post_id))
+
+
+@receiver(post_save, sender=Like)
+def like_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(instance.post_id, 'likes_count', 1)
+        hot.add('like', {instance.post_id: 1})
+        conditional.touch_post_ids([instance.post_id])
+
+
+@receiver(post_delete, sender=Like)
+def like_deleted(sender, instance, **kwargs):
+    if instance.post_id not in _deleting_posts():
+        change_counter(instance.post_id, 'likes_count', -1)
+        hot.remove('like', [(instance.post_id, instance.created)])
+        conditional.touch_post_ids([instance.post_id])
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(instance.post_id, 'comments_count', 1)
+        hot.add('comment', {instance.post_id: 1})
+        cards.invalidate_post(instance.post_id)
+        conditional.touch_post_ids([instance.post_id])
+        search.index_comment(instance.post_id, instance.text)
+    else:
+        search.index_post(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if instance.post_id not in _deleting_posts():
+        change_counter(instance.post_id, 'comments_count', -1)
+        hot.remove('comment', [(instance.post_id, instance.created)])
+        cards.invalidate_post(instance.post_id)
+        conditional.touch_post_ids([instance.post_id])
+        search.unindex_comment(instance.post_id, instance.text)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        stats.change(instance.author_id, 'followers_count', 1)
+        stats.change(instance.user_id, 'following_count', 1)
+        feed.backfill(instance.user_id, instance.author_id)
+        conditional.touch(conditional.author_key(instance.author_id),
+                          conditional.author_key(instance.user_id))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    stats.change(instance.author_id, 'followers_count', -1)
+    stats.change(instance.user_id, 'following_count', -1)
+    feed.cleanup(instance.user_id, instance.author_id)
+    conditional.touch(conditional.author_key(instance.author_id),
+                      conditional.author_key(instance.user_id))
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, raw=False,
+               **kwargs):
+    if created:
+        if not raw:
+            UserStats.objects.create(user=instance)
+        return
+    if update_fields == frozenset({'last_login'}):
+        return
+    cards.invalidate_author(instance.pk)
+    conditional.touch(conditional.SITE)
+
+
+@receiver(post_init, sender=Group)
+def group_loaded(sender, instance, **kwargs):
+    instance._saved_slug = instance.__dict__.get('slug')
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, **kwargs):
+    cards.invalidate_group(instance.pk)
+    groups.invalidate(instance.pk, instance.slug, instance._saved_slug)
+    conditional.touch(conditional.SITE)
+    instance._saved_slug = instance.slug
+    if not created:
+        search.index_group(instance.pk)
+
+
+@receiver(pre_delete, sender=Group)
+def group_pre_delete(sender, instance, **kwargs):
+    # После удаления у постов group=NULL, и найти их по группе уже нельзя.
+    instance.search_post_ids = list(
+        instance.posts.values_list('pk', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    cards.invalidate_group(instance.pk)
+    groups.invalidate(instance.pk, instance.slug)
+    conditional.touch(conditional.SITE)
+    for post_id in getattr(instance, 'search_post_ids', ()):
+        search.index_post(post_id)
@@ -0,0 +1,105 @@
+// Лайки без перезагрузки страницы: клики копятся и уходят в
+// /api/likes/ одним запросом; без JavaScript работают обычные ссылки.
+(function () {
+    'use strict';
+
+    var script = document.currentScript;
+    var api = script && script.dataset.api;
+    // Адреса иконок с хэшем в имени приходят из шаблона.
+    var icons = script ? script.dataset : {};
+    var DELAY = 300;
+    var pending = {};
+    var timer = null;
+
+    function cookie(name) {
+        var match = document.cookie.match('(?:^|; )' + name + '=([^;]*)');
+        return match ? decodeURIComponent(match[1]) : null;
+    }
+
+    function buttons(postId) {
+        return document.querySelectorAll(
+            '.js-like[data-post="' + postId + '"]'
+        );
+    }
+
+    function render(postId, liked, count) {
+        buttons(postId).forEach(function (button) {
+            var icon = button.querySelector('img');
+            button.dataset.liked = liked ? '1' : '0';
+            button.href = liked ? button.dataset.unlikeUrl
+                                : button.dataset.likeUrl;
+            button.querySelector('.js-like-count').textContent = count;
+            icon.src = liked ? icons.dislikeIcon : icons.likeIcon;
+        });
+    }
+
+    function token() {
+        var value = cookie('csrftoken');
+        if (value) {
+            return Promise.resolve(value);
+        }
+        // GET выставляет CSRF-куку: страницы ленты могут быть из кэша.
+        return fetch(api, {credentials: 'same-origin'}).then(function () {
+            return cookie('csrftoken');
+        });
+    }
+
+    function flush() {
+        var toggles = Object.keys(pending).map(function (postId) {
+            return {post: Number(postId), like: pending[postId].liked};
+        });
+        var sent = pending;
+        pending = {};
+        timer = null;
+        token().then(function (csrf) {
+            return fetch(api, {
+                method: 'POST',
+                credentials: 'same-origin',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-CSRFToken': csrf
+                },
+                body: JSON.stringify({toggles: toggles})
+            });
+        }).then(function (response) {
+            if (!response.ok) {
+                throw new Error(response.status);
+            }
+            return response.json();
+        }).then(function (data) {
+            Object.keys(data.posts).forEach(function (postId) {
+                if (!pending[postId]) {
+                    var state = data.posts[postId];
+                    render(postId, state.liked, state.likes_count);
+                }
+            });
+        }).catch(function () {
+            Object.keys(sent).forEach(function (postId) {
+                if (!pending[postId]) {
+                    render(postId, sent[postId].wasLiked,
+                           sent[postId].count);
+                }
+            });
+        });
+    }
+
+    document.addEventListener('click', function (event) {
+        var button = event.target.closest('.js-like');
+        if (!button || !api) {
+            return;
+        }
+        event.preventDefault();
+        var postId = button.dataset.post;
+        var liked = button.dataset.liked === '1';
+        var count = Number(
+            button.querySelector('.js-like-count').textContent
+        );
+        if (!pending[postId]) {
+            pending[postId] = {wasLiked: liked, count: count};
+        }
+        pending[postId].liked = !liked;
+        render(postId, !liked, count + (liked ? -1 : 1));
+        clearTimeout(timer);
+        timer = setTimeout(flush, DELAY);
+    });
+}());
@@ -0,0 +1,64 @@
+"""Счетчики шапки профиля: подписчики, подписки и записи.
+
+Хранятся в UserStats и меняются сигналами подписки, отписки, создания и
+удаления поста, поэтому профиль читает их вместе с автором одним запросом.
+"""
+from django.db.models import F
+
+from .counters import real_count
+from .models import Follow, Post, User, UserStats
+
+BATCH_SIZE = 1000
+
+
+def real_counts():
+    """Выражения для пересчета; подходят и для User, и для UserStats:
+    у статистики первичный ключ совпадает с id пользователя."""
+    return {
+        'followers_count': real_count(Follow, 'author'),
+        'following_count': real_count(Follow, 'user'),
+        'posts_count': real_count(Post, 'author'),
+    }
+
+
+def change(user_id, field, delta):
+    stats = UserStats.objects.filter(pk=user_id)
+    if delta < 0:
+        stats = stats.filter(**{f'{field}__gte': -delta})
+    stats.update(**{field: F(field) + delta})
+
+
+def rebuild(user_ids=None):
+    """Создает недостающие записи и исправляет разошедшиеся счетчики;
+    возвращает число исправленных пользователей."""
+    users = User.objects.order_by()
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=pk) for pk in users.filter(
+            stats__isnull=True
+        ).values_list('pk', flat=True).iterator()],
+        ignore_conflicts=True
+    )
+    expressions = real_counts()
+    drifted = list(UserStats.objects.filter(user__in=users).annotate(
+        **{f'real_{name}': value for name, value in expressions.items()}
+    ).exclude(
+        **{name: F(f'real_{name}') for name in expressions}
+    ).values_list('pk', flat=True))
+    for start in range(0, len(drifted), BATCH_SIZE):
+        UserStats.objects.filter(
+            pk__in=drifted[start:start + BATCH_SIZE]
+        ).update(**real_counts())
+    return len(drifted)
+
+
+def for_user(user):
+    """Статистика пользователя, загруженного с select_related('stats');
+    если записи нет, она создается с настоящими значениями."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        rebuild([user.pk])
+        user.stats = UserStats.objects.get(pk=user.pk)
+        return user.stats
@@ -0,0 +1,15 @@
+from django import template
+from django.template.loader import render_to_string
+
+from posts import cards
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post):
+    actions = render_to_string(
+        'include/post_actions.html',
+        {'post': post, 'user': context.get('user')}
+    )
+    return cards.render_card(post, actions)
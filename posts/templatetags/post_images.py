@@ -0,0 +1,30 @@
+from django import template
+
+from posts import images
+
+register = template.Library()
+
+SIZES = '(max-width: 960px) 100vw, 960px'
+
+
+@register.filter
+def srcset(post, mime='image/jpeg'):
+    """Значение атрибута srcset для вариантов картинки поста."""
+    variants = images.loads(post.image_variants).get(mime, [])
+    return ', '.join(f'{url} {width}w' for width, url in variants)
+
+
+@register.inclusion_tag('include/post_picture.html')
+def post_picture(post):
+    variants = images.loads(post.image_variants)
+    sources = [
+        {'type': mime, 'srcset': srcset(post, mime)}
+        for _, _, mime in images.FORMATS
+        if mime != 'image/jpeg' and mime in variants
+    ]
+    return {
+        'post': post,
+        'sources': sources,
+        'srcset': srcset(post, 'image/jpeg'),
+        'sizes': SIZES,
+    }
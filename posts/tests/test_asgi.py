@@ -0,0 +1,125 @@
+import asyncio
+import threading
+import time
+
+from django.core.wsgi import get_wsgi_application
+from django.test import SimpleTestCase
+
+from yatube.asgi import WsgiToAsgi
+
+
+def echo(environ, start_response):
+    """WSGI-приложение, которое возвращает тело запроса и поток."""
+    start_response('201 Created', [('Content-Type', 'text/plain'),
+                                   ('X-Thread', threading.current_thread()
+                                    .name)])
+    body = environ['wsgi.input'].read()
+    return [environ['QUERY_STRING'].encode(), b'|',
+            environ.get('HTTP_COOKIE', '').encode(), b'|', body]
+
+
+def request(application, path='/', method='POST', body=(b'', ),
+            headers=(), query_string=b'', client_delay=0):
+    """Выполняет запрос; клиент тратит client_delay секунд на отправку
+    каждой части тела и на чтение ответа."""
+    messages = [{'type': 'http.request', 'body': chunk,
+                 'more_body': number < len(body) - 1}
+                for number, chunk in enumerate(body)]
+    response = {'body': b''}
+
+    async def receive():
+        await asyncio.sleep(client_delay)
+        return messages.pop(0)
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+            response['headers'] = dict(message['headers'])
+            await asyncio.sleep(client_delay)
+        else:
+            response['body'] += message['body']
+
+    scope = {'type': 'http', 'method': method, 'path': path,
+             'query_string': query_string, 'headers': list(headers),
+             'server': ('testserver', 80)}
+    return application(scope, receive, send), response
+
+
+class AsgiAdapterTests(SimpleTestCase):
+    def setUp(self):
+        self.application = WsgiToAsgi(echo, threads=1)
+        self.addCleanup(self.application.executor.shutdown)
+
+    def test_request_and_response(self):
+        call, response = request(
+            self.application, body=(b'part1,', b'part2'),
+            query_string=b'q=1',
+            headers=[(b'cookie', b'a=1'), (b'cookie', b'b=2')],
+        )
+        asyncio.run(call)
+        self.assertEqual(response['status'], 201)
+        self.assertEqual(response['headers'][b'content-type'], b'text/plain')
+        self.assertTrue(response['headers'][b'x-thread'].startswith(b'asgi'))
+        self.assertEqual(response['body'], b'q=1|a=1; b=2|part1,part2')
+
+    def test_slow_clients_do_not_hold_threads(self):
+        """Пока клиенты медленно шлют запрос и читают ответ, единственный
+        поток пула свободен для других запросов."""
+        calls = [request(self.application, client_delay=0.2)[0]
+                 for _ in range(10)]
+
+        async def main():
+            await asyncio.gather(*calls)
+
+        started = time.monotonic()
+        asyncio.run(main())
+        # Синхронный воркер потратил бы на это 10 * 0.4 секунды.
+        self.assertLess(time.monotonic() - started, 2)
+
+    def test_response_is_streamed(self):
+        """Части ответа уходят клиенту по мере создания, а не после
+        всего ответа."""
+        received = threading.Event()
+
+        def stream(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            yield b'first,'
+            yield b'second' if received.wait(5) else b'buffered'
+
+        application = WsgiToAsgi(stream, threads=1)
+        self.addCleanup(application.executor.shutdown)
+        body = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            if message['type'] == 'http.response.body':
+                body.append(message['body'])
+                received.set()
+
+        scope = {'type': 'http', 'method': 'GET', 'path': '/',
+                 'headers': []}
+        asyncio.run(application(scope, receive, send))
+        self.assertEqual(body, [b'first,', b'second', b''])
+
+    def test_application_error_is_raised(self):
+        def broken(environ, start_response):
+            raise RuntimeError('сломалось')
+
+        application = WsgiToAsgi(broken, threads=1)
+        self.addCleanup(application.executor.shutdown)
+        call, response = request(application)
+        with self.assertRaises(RuntimeError):
+            asyncio.run(call)
+        self.assertNotIn('status', response)
+
+    def test_django_page(self):
+        application = WsgiToAsgi(get_wsgi_application(), threads=2)
+        self.addCleanup(application.executor.shutdown)
+        call, response = request(application, '/about/tech/', 'GET')
+        asyncio.run(call)
+        self.assertEqual(response['status'], 200)
+        self.assertEqual(response['headers'][b'content-type'],
+                         b'text/html; charset=utf-8')
+        self.assertIn('</html>', response['body'].decode())
@@ -0,0 +1,189 @@
+import shutil
+import socket
+import tempfile
+import threading
+import time
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, User
+
+from yatube.caching.backends import FakeRedisCache, RedisCache, SQLiteCache
+from yatube.caching.coalesce import get_or_set_coalesced
+from yatube.caching.config import parse_cache_url
+
+
+class CacheUrlTest(SimpleTestCase):
+    def test_parse_cache_url(self):
+        """CACHE_URL превращается в настройки нужного бэкенда."""
+        redis = parse_cache_url('redis://:secret@cache:6380/2')
+        self.assertEqual(redis['BACKEND'],
+                         'yatube.caching.backends.RedisCache')
+        self.assertEqual(redis['LOCATION'], 'cache:6380')
+        self.assertEqual(redis['OPTIONS'], {'DB': 2, 'PASSWORD': 'secret'})
+        memcached = parse_cache_url('memcached://m1:11211,m2:11211')
+        self.assertEqual(memcached['LOCATION'], ['m1:11211', 'm2:11211'])
+        sqlite = parse_cache_url('sqlite:///var/tmp/cache.sqlite3?timeout=60')
+        self.assertEqual(sqlite['LOCATION'], '/var/tmp/cache.sqlite3')
+        self.assertEqual(sqlite['TIMEOUT'], 60)
+        database = parse_cache_url('db://')
+        self.assertEqual(database['BACKEND'],
+                         'django.core.cache.backends.db.DatabaseCache')
+        self.assertEqual(database['LOCATION'], 'django_cache')
+        with self.assertRaises(ValueError):
+            parse_cache_url('mongodb://localhost')
+
+
+class BackendContractMixin:
+    """Общие проверки для всех самописных бэкендов."""
+
+    def test_get_set_delete(self):
+        self.cache.set('key', {'a': 1})
+        self.assertEqual(self.cache.get('key'), {'a': 1})
+        self.assertIsNone(self.cache.get('missing'))
+        self.cache.delete('key')
+        self.assertEqual(self.cache.get('key', 'default'), 'default')
+
+    def test_add_and_incr(self):
+        self.assertTrue(self.cache.add('counter', 1))
+        self.assertFalse(self.cache.add('counter', 5))
+        self.assertEqual(self.cache.incr('counter', 2), 3)
+        self.assertEqual(self.cache.get('counter'), 3)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_many(self):
+        self.cache.set_many({'a': 1, 'b': 'два'})
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']),
+                         {'a': 1, 'b': 'два'})
+        self.cache.delete_many(['a', 'b'])
+        self.assertEqual(self.cache.get_many(['a', 'b']), {})
+
+    def test_expiry(self):
+        self.cache.set('short', 'value', 0.05)
+        self.assertTrue(self.cache.has_key('short'))
+        time.sleep(0.1)
+        self.assertFalse(self.cache.has_key('short'))
+
+    def test_clear(self):
+        self.cache.set('key', 'value')
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('key'))
+
+
+class FakeRedisCacheTest(BackendContractMixin, SimpleTestCase):
+    def setUp(self):
+        self.cache = FakeRedisCache('', {})
+        self.cache.clear()
+
+
+def closed_port():
+    with socket.socket() as listener:
+        listener.bind(('127.0.0.1', 0))
+        return listener.getsockname()[1]
+
+
+class RedisUnavailableTest(SimpleTestCase):
+    def test_commands_do_not_fail_when_server_is_down(self):
+        """Недоступный Redis: чтение — промах, запись пропускается."""
+        down = RedisCache(f'127.0.0.1:{closed_port()}', {})
+        with self.assertLogs('yatube.caching.backends', 'WARNING'):
+            self.assertEqual(down.get('key', 'default'), 'default')
+        self.assertEqual(down.get_many(['a', 'b']), {})
+        down.set('key', 'value')
+        down.set_many({'a': 1})
+        down.delete('key')
+        down.delete_many(['a'])
+        self.assertFalse(down.add('key', 'value'))
+        self.assertFalse(down.has_key('key'))
+        self.assertFalse(down.touch('key'))
+        with self.assertRaises(ValueError):
+            down.incr('key')
+
+
+@override_settings(CACHES={'default': {
+    'BACKEND': 'yatube.caching.backends.RedisCache',
+    'LOCATION': f'127.0.0.1:{closed_port()}',
+}})
+class RedisDownPagesTest(TestCase):
+    def test_pages_render_without_cache(self):
+        user = User.objects.create_user(username='author')
+        Post.objects.create(text='Пост без кэша', author=user)
+        urls = (reverse('index'), reverse('profile', args=('author',)))
+        with self.assertLogs('yatube.caching.backends', 'WARNING'):
+            responses = [self.client.get(url) for url in urls]
+        for response in responses:
+            self.assertContains(response, 'Пост без кэша')
+
+
+class SQLiteCacheTest(BackendContractMixin, SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = SQLiteCache(f'{self.directory}/cache.sqlite3', {})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class CoalescingTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_misses_compute_once(self):
+        """Одновременные промахи по ключу вычисляют значение один раз."""
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.1)
+            return 'value'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                get_or_set_coalesced('hot', compute, 60)
+            ))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 8)
+
+    def test_followers_get_computed_value(self):
+        """Ведомые получают значение таким, каким его вычислил лидер, даже
+        если лидер потом изменил свой объект."""
+        def compute():
+            time.sleep(0.1)
+            return ['value']
+
+        results = []
+
+        def request():
+            value = get_or_set_coalesced('hot', compute, 60)
+            results.append(list(value))
+            value.append('changed')
+
+        threads = [threading.Thread(target=request) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [['value']] * 4)
+
+    def test_early_expiry(self):
+        """Значение у конца срока жизни пересчитывается заранее."""
+        cache.set('hot', ('old', 10.0, time.time() + 0.01), 60)
+        value = get_or_set_coalesced('hot', lambda: 'new', 60)
+        self.assertEqual(value, 'new')
+        cache.set('hot', ('fresh', 0.0001, time.time() + 60), 60)
+        value = get_or_set_coalesced('hot', lambda: 'new', 60)
+        self.assertEqual(value, 'fresh')
+
+    def test_none_is_not_cached(self):
+        self.assertIsNone(get_or_set_coalesced('hot', lambda: None, 60))
+        self.assertIsNone(cache.get('hot'))
@@ -0,0 +1,67 @@
+import threading
+
+from django.test import SimpleTestCase
+
+from yatube import metrics
+from yatube.db import pool
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def make_pool(self, **options):
+        return pool.ConnectionPool(FakeConnection, **options)
+
+    def test_connections_are_reused(self):
+        connections = self.make_pool(max_size=2)
+        first = connections.acquire()
+        connections.release(first)
+        self.assertIs(connections.acquire(), first)
+        self.assertEqual((connections.size, connections.in_use), (1, 1))
+
+    def test_size_limit_and_timeout(self):
+        """Сверх MAX_SIZE соединение ждут не дольше TIMEOUT."""
+        connections = self.make_pool(max_size=1, timeout=0.05)
+        first = connections.acquire()
+        with self.assertRaises(pool.PoolTimeout):
+            connections.acquire()
+        self.assertEqual(connections.timeouts, 1)
+        connections.timeout = 5
+        threading.Timer(0.05, connections.release, (first,)).start()
+        self.assertIs(connections.acquire(), first)
+        self.assertEqual(connections.waits, 2)
+
+    def test_broken_connections_are_replaced(self):
+        """Соединение, которое не удалось сбросить или проверить,
+        закрывается и заменяется новым."""
+        healthy = {'value': False}
+        connections = self.make_pool(
+            reset=lambda connection: not connection.closed,
+            check=lambda connection: healthy['value'],
+            check_after=0,
+        )
+        first = connections.acquire()
+        connections.release(first)
+        second = connections.acquire()
+        self.assertIsNot(second, first)
+        self.assertTrue(first.closed)
+        second.close()
+        connections.release(second)
+        self.assertEqual((connections.size, connections.in_use), (0, 0))
+
+    def test_metrics(self):
+        connections = pool.get_pool('test', lambda: self.make_pool())
+        self.addCleanup(pool._pools.pop, 'test')
+        connections.acquire()
+        connections.release(connections.acquire())
+        _, _, gauges = metrics.collect()
+        self.assertEqual(gauges[metrics._key('yatube_db_pool_in_use',
+                                             None)], 1)
+        self.assertEqual(gauges[metrics._key('yatube_db_pool_idle',
+                                             None)], 1)
@@ -1,17 +1,27 @@
+import io
+import os
 import shutil
 import tempfile
+
+from PIL import Image
 from django.conf import settings
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from posts.models import Group, Post, User, Comment
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from posts import images, thumbnails
+from posts.tests.utils import run_on_commit
 
 
-@override_settings(MEDIA_ROOT=tempfile.mkdtemp(dir=settings.BASE_DIR))
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class FormsTest(TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
+        # После super().tearDownClass() настройка уже вернется к
+        # MEDIA_ROOT проекта, поэтому временный каталог запоминаем здесь.
+        cls.media_root = settings.MEDIA_ROOT
         # Создаем тетсувую группу
         cls.group = Group.objects.create(
             title='test-group',
@@ -28,7 +38,7 @@ class FormsTest(TestCase):
     @classmethod
     def tearDownClass(cls):
         super().tearDownClass()
-        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(cls.media_root, ignore_errors=True)
 
     def test_new_post(self):
         """Тестируем добовление поста."""
@@ -169,3 +179,116 @@ class FormsTest(TestCase):
             response,
             reverse('post', args=(self.user.username, post.id)))
         self.assertEqual(Comment.objects.count(), 0)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = settings.MEDIA_ROOT
+        cls.user = User.objects.create_user(username='test-author')
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x01\x00'
+            b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+            b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+            b'\x00\x00\x01\x00\x01\x00\x00\x02'
+            b'\x02\x4c\x01\x00\x3b'
+        )
+        self.post = Post.objects.create(
+            text='Пост с картинкой',
+            author=self.user,
+            image=SimpleUploadedFile('small.gif', small_gif, 'image/gif')
+        )
+        run_on_commit()
+
+    def test_placeholder_while_pending(self):
+        """Пока миниатюра не готова, в карточке заглушка."""
+        response = self.authorized_client.get(
+            reverse('profile', args=(self.user.username,))
+        )
+        self.assertContains(response, 'placeholder.svg')
+
+    def test_generate_stores_url(self):
+        """Готовая миниатюра сохраняется в посте и попадает в карточку,
+        а закэшированная браузером страница с заглушкой устаревает."""
+        etag = self.authorized_client.get(
+            reverse('profile', args=(self.user.username,))
+        )['ETag']
+        url = thumbnails.generate(self.post.id)
+        run_on_commit()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.thumbnail, url)
+        response = self.authorized_client.get(
+            reverse('profile', args=(self.user.username,)),
+            HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertContains(response, url)
+        self.assertNotContains(response, 'placeholder.svg')
+
+    def test_variants_srcset(self):
+        """Варианты картинки без метаданных попадают в srcset."""
+        buffer = io.BytesIO()
+        exif = Image.Exif()
+        exif[0x010F] = 'Test camera'
+        Image.new('RGB', (1200, 800), 'red').save(buffer, 'JPEG', exif=exif)
+        post = Post.objects.create(
+            text='Большая картинка',
+            author=self.user,
+            image=SimpleUploadedFile('big.jpg', buffer.getvalue(),
+                                     'image/jpeg')
+        )
+        thumbnails.generate(post.id)
+        post.refresh_from_db()
+        variants = images.loads(post.image_variants)
+        self.assertEqual([width for width, _ in variants['image/jpeg']],
+                         [320, 640, 960])
+        if 'image/webp' in variants:
+            self.assertEqual(len(variants['image/webp']), 3)
+        name = variants['image/jpeg'][-1][1][len(settings.MEDIA_URL):]
+        with Image.open(f'{settings.MEDIA_ROOT}/{name}') as variant:
+            self.assertEqual(variant.size, (960, 339))
+            self.assertFalse(variant.getexif())
+        response = self.authorized_client.get(
+            reverse('profile', args=(self.user.username,))
+        )
+        self.assertContains(response, '960w')
+
+    def variant_files(self, post_id):
+        directory = f'{settings.MEDIA_ROOT}/posts/variants/{post_id}'
+        if not os.path.isdir(directory):
+            return []
+        return sorted(os.listdir(directory))
+
+    def test_variants_are_replaced_and_deleted(self):
+        """Имена вариантов постоянны, файлы прежней картинки и удаленного
+        поста не остаются на диске."""
+        thumbnails.generate(self.post.id)
+        first = self.variant_files(self.post.pk)
+        self.assertTrue(first)
+        thumbnails.generate(self.post.id)
+        self.assertEqual(self.variant_files(self.post.pk), first)
+        buffer = io.BytesIO()
+        Image.new('RGB', (400, 200), 'blue').save(buffer, 'PNG')
+        self.post.image = SimpleUploadedFile('blue.png', buffer.getvalue(),
+                                             'image/png')
+        self.post.save()
+        thumbnails.generate(self.post.id)
+        replaced = self.variant_files(self.post.pk)
+        self.assertTrue(replaced)
+        self.assertFalse(set(first) & set(replaced))
+        post_id = self.post.pk
+        self.post.delete()
+        self.assertTrue(self.variant_files(post_id))
+        run_on_commit()
+        self.assertEqual(self.variant_files(post_id), [])
@@ -0,0 +1,157 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, modify_settings, override_settings
+from django.urls import reverse
+
+from posts.models import Group, Post, User
+from yatube import instrumentation, metrics
+
+
+@modify_settings(MIDDLEWARE={
+    'prepend': 'yatube.instrumentation.PerformanceMiddleware'
+})
+class PerformanceMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        Post.objects.create(text='Пост', author=cls.author, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, url):
+        with self.assertLogs('yatube.performance', 'INFO') as logs:
+            response = self.client.get(url)
+        records = [json.loads(line.split(':', 2)[2]) for line in logs.output
+                   if line.startswith('INFO:yatube.performance:')]
+        return response, records[-1], logs.output
+
+    def test_server_timing_and_log(self):
+        """Ответ получает Server-Timing, а лог — JSON со сводкой."""
+        url = reverse('profile', args=(self.author.username,))
+        response, record, _ = self.get(url)
+        timing = response['Server-Timing']
+        for metric in ('total;dur=', 'db;dur=', 'cache;dur=', 'tpl;dur='):
+            self.assertIn(metric, timing)
+        self.assertEqual(record['endpoint'], 'profile')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['sql_count'], 0)
+        self.assertGreater(record['template_ms'], 0)
+        self.assertLessEqual(len(record['slowest_queries']), 3)
+        # Холодный кэш: версии и фрагмент карточки не найдены.
+        self.assertGreater(record['cache_misses'], 0)
+        _, record, _ = self.get(url)
+        self.assertGreater(record['cache_hits'], 0)
+
+    def test_grouped_by_url_name(self):
+        before = instrumentation.endpoint_stats().get('group', {})
+        self.get(reverse('group', args=(self.group.slug,)))
+        self.get(reverse('group', args=(self.group.slug,)))
+        stats = instrumentation.endpoint_stats()['group']
+        self.assertEqual(stats['requests'] - before.get('requests', 0), 2)
+
+    @override_settings(PERFORMANCE_SLOW_REQUEST_MS=0)
+    def test_slow_request_trace(self):
+        """Медленный запрос пишет полную трассу в отдельный логгер."""
+        _, record, output = self.get(reverse('index'))
+        traces = [json.loads(line.split(':', 2)[2]) for line in output
+                  if line.startswith('WARNING:yatube.performance.slow:')]
+        self.assertEqual(len(traces), 1)
+        self.assertEqual(len(traces[0]['queries']), record['sql_count'])
+        self.assertTrue(traces[0]['cache_calls'])
+
+    def test_disabled_outside_middleware(self):
+        cache.get('key')
+        self.assertIsNone(instrumentation.current())
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        settings = override_settings(METRICS_ENABLED=True,
+                                     METRICS_DIR=self.directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def write_worker(self, pid, requests, backlog):
+        """Файл метрик другого воркера."""
+        key = json.dumps(['yatube_http_requests_total',
+                          [['method', 'GET'], ['status', '200'],
+                           ['view', 'worker']]])
+        with open(os.path.join(self.directory, f'{pid}.json'), 'w') as file:
+            json.dump({
+                'counters': {key: requests},
+                'histograms': {},
+                'gauges': {json.dumps(['yatube_thumbnail_backlog', []]):
+                           backlog},
+            }, file)
+
+    @modify_settings(MIDDLEWARE={
+        'prepend': 'yatube.metrics.MetricsMiddleware'
+    })
+    def test_metrics_endpoint(self):
+        """/metrics отдает гистограммы по именам URL в текстовом формате."""
+        self.client.get(reverse('index'))
+        response = self.client.get('/metrics')
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        body = response.content.decode()
+        self.assertIn('# TYPE yatube_http_request_duration_seconds '
+                      'histogram', body)
+        self.assertIn('yatube_http_request_duration_seconds_bucket'
+                      '{view="index",le="+Inf"}', body)
+        self.assertIn('yatube_db_queries_per_request_count{view="index"}',
+                      body)
+        self.assertIn('yatube_cache_requests_total{result="miss"}', body)
+        self.assertIn('yatube_thumbnail_backlog 0', body)
+
+    @modify_settings(MIDDLEWARE={
+        'prepend': 'yatube.metrics.MetricsMiddleware'
+    })
+    @override_settings(METRICS_FLUSH_INTERVAL=0.01)
+    def test_flush_in_background(self):
+        """Файл метрик пишет фоновый поток, а не поток запроса."""
+        flush = metrics.registry.flush
+        threads = []
+
+        def record():
+            threads.append(threading.current_thread())
+            flush()
+
+        with mock.patch.object(metrics.registry, 'flush', record):
+            self.client.get(reverse('index'))
+            deadline = time.monotonic() + 5
+            while not threads and time.monotonic() < deadline:
+                time.sleep(0.01)
+        self.assertTrue(threads)
+        self.assertNotIn(threading.current_thread(), threads)
+        self.assertTrue(os.path.exists(
+            os.path.join(self.directory, f'{os.getpid()}.json')
+        ))
+
+    def test_workers_are_summed(self):
+        """Счетчики складываются по всем воркерам, датчики — по живым."""
+        self.write_worker(os.getpid() + 10 ** 7, 5, 7)
+        self.write_worker(os.getppid(), 3, 2)
+        body = metrics.render()
+        self.assertIn('yatube_http_requests_total{method="GET",'
+                      'status="200",view="worker"} 8', body)
+        self.assertIn('yatube_thumbnail_backlog 2', body)
+
+    def test_access(self):
+        with override_settings(METRICS_ENABLED=False):
+            self.assertEqual(self.client.get('/metrics').status_code, 404)
+        with override_settings(METRICS_TOKEN='secret'):
+            self.assertEqual(self.client.get('/metrics').status_code, 401)
+            response = self.client.get('/metrics',
+                                       HTTP_AUTHORIZATION='Bearer secret')
+            self.assertEqual(response.status_code, 200)
@@ -1,8 +1,11 @@
 import datetime as dt
+from io import StringIO
 
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
-from posts.models import Group, Post, Comment, Follow
+from django.urls import reverse
+from posts.models import Group, Post, Comment, Follow, Like, UserStats
 
 
 class ModelsTest(TestCase):
@@ -168,3 +171,117 @@ class ModelsTest(TestCase):
         comment = ModelsTest.comment
         expected_object_name = comment.text
         self.assertEquals(expected_object_name, str(comment))
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        user = get_user_model()
+        cls.author = user.objects.create(username='test-author')
+        cls.reader = user.objects.create(username='test-reader')
+
+    def setUp(self):
+        self.post = Post.objects.create(text='Тестовый текст',
+                                        author=self.author)
+
+    def test_like_counter(self):
+        """Лайки увеличивают и уменьшают likes_count."""
+        like = Like.objects.create(user=self.reader, post=self.post)
+        Like.objects.create(user=self.author, post=self.post)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 2)
+        like.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+
+    def test_comment_counter(self):
+        """Комментарии увеличивают и уменьшают comments_count."""
+        comment = Comment.objects.create(
+            text='Тестовый комментарий',
+            post=self.post,
+            author=self.reader
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        comment.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+
+    def test_cascade_delete_updates_counters(self):
+        """Удаление пользователя уменьшает счетчики чужих постов."""
+        user = get_user_model()
+        guest = user.objects.create(username='test-guest')
+        Like.objects.create(user=guest, post=self.post)
+        Comment.objects.create(text='Комментарий', post=self.post,
+                               author=guest)
+        guest.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+        self.assertEqual(self.post.comments_count, 0)
+
+    def test_sync_counters_command(self):
+        """Команда sync_counters исправляет разъехавшиеся счетчики, в том
+        числе в закэшированных карточках."""
+        Like.objects.create(user=self.reader, post=self.post)
+        Post.objects.filter(pk=self.post.pk).update(likes_count=10,
+                                                    comments_count=3)
+        url = reverse('profile', args=(self.post.author.username,))
+        comments = '{}&thinsp;<img src="/static/comment.svg"'
+        self.assertContains(self.client.get(url), comments.format(3))
+        call_command('sync_counters', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+        self.assertEqual(self.post.comments_count, 0)
+        self.assertContains(self.client.get(url), comments.format(0))
+
+
+class UserStatsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model()
+        cls.author = user.objects.create_user(username='test-author')
+        cls.reader = user.objects.create_user(username='test-reader')
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_follow_and_posts_update_stats(self):
+        """Подписка, отписка и посты меняют статистику обоих
+        пользователей."""
+        self.client.force_login(self.reader)
+        self.client.get(reverse('profile_follow', args=('test-author',)))
+        Post.objects.create(text='Пост', author=self.author)
+        post = Post.objects.create(text='Еще пост', author=self.author)
+        self.assertEqual(
+            (self.stats(self.author).followers_count,
+             self.stats(self.author).posts_count,
+             self.stats(self.reader).following_count),
+            (1, 2, 1)
+        )
+        post.delete()
+        self.client.get(reverse('profile_unfollow', args=('test-author',)))
+        self.assertEqual(
+            (self.stats(self.author).followers_count,
+             self.stats(self.author).posts_count,
+             self.stats(self.reader).following_count),
+            (0, 1, 0)
+        )
+
+    def test_profile_header_uses_stats(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        UserStats.objects.filter(user=self.author).update(posts_count=7)
+        response = self.client.get(reverse('profile', args=('test-author',)))
+        self.assertContains(response, 'Подписчиков: 1')
+        self.assertContains(response, 'Записей: 7')
+
+    def test_missing_stats_are_rebuilt(self):
+        """Для пользователя без записи статистика считается заново."""
+        Post.objects.create(text='Пост', author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        UserStats.objects.all().delete()
+        response = self.client.get(reverse('profile', args=('test-author',)))
+        self.assertContains(response, 'Подписчиков: 1')
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        call_command('sync_counters', stdout=StringIO())
+        self.assertEqual(self.stats(self.reader).following_count, 1)
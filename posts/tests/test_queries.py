@@ -0,0 +1,126 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Like, Post, User
+
+
+class QueryBudgetMixin:
+    """Проверяет, что число запросов страницы ограничено и не зависит ни
+    от объема данных, ни от размера страницы.
+
+    Страница запрашивается с холодным кэшем (худший случай: все карточки
+    рендерятся заново) при разных POSTS_PER_PAGE, а затем еще раз после
+    досева данных.
+    """
+
+    # Сколько записей досевается между замерами
+    GROWTH = 15
+    PAGE_SIZES = (3, 10)
+
+    def count_queries(self, client, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return len(queries), queries
+
+    def assertQueryBudget(self, client, url, budget, grow):
+        counts = []
+        for per_page in self.PAGE_SIZES:
+            with override_settings(POSTS_PER_PAGE=per_page):
+                counts.append(self.count_queries(client, url))
+        grow(self.GROWTH)
+        with override_settings(POSTS_PER_PAGE=self.PAGE_SIZES[-1]):
+            counts.append(self.count_queries(client, url))
+        numbers = [number for number, _ in counts]
+        self.assertEqual(
+            len(set(numbers)), 1,
+            f'{url}: число запросов зависит от данных: {numbers}\n'
+            + '\n'.join(query['sql'] for query in counts[-1][1])
+        )
+        self.assertLessEqual(
+            numbers[0], budget,
+            f'{url}: {numbers[0]} запросов при бюджете {budget}\n'
+            + '\n'.join(query['sql'] for query in counts[-1][1])
+        )
+
+
+class ViewQueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = cls.seed_posts(12)[0]
+
+    @classmethod
+    def seed_posts(cls, count):
+        """Посты с разными авторами комментариев и лайками."""
+        start = Post.objects.count()
+        posts = []
+        for number in range(start, start + count):
+            commenter = User.objects.create_user(username=f'user{number}')
+            post = Post.objects.create(text=f'Пост {number}',
+                                       author=cls.author, group=cls.group)
+            Comment.objects.create(post=post, author=commenter,
+                                   text=f'Комментарий {number}')
+            Like.objects.create(post=post, user=commenter)
+            if number % 2:
+                Like.objects.create(post=post, user=cls.reader)
+            posts.append(post)
+        return posts
+
+    def seed_comments(self, count):
+        for number in range(count):
+            commenter = User.objects.create_user(username=f'commenter{number}')
+            Comment.objects.create(post=self.post, author=commenter,
+                                   text=f'Еще комментарий {number}')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_index(self):
+        self.assertQueryBudget(self.client, reverse('index'), 4,
+                               self.seed_posts)
+
+    def test_group_posts(self):
+        self.assertQueryBudget(
+            self.client, reverse('group', args=(self.group.slug,)), 4,
+            self.seed_posts
+        )
+
+    def test_profile(self):
+        self.assertQueryBudget(
+            self.client, reverse('profile', args=(self.author.username,)),
+            # +1 — автор для валидатора условного GET
+            6, self.seed_posts
+        )
+
+    def test_hot(self):
+        self.assertQueryBudget(self.client, reverse('hot'), 4,
+                               self.seed_posts)
+
+    def test_follow_index(self):
+        # +1 — ключи страницы из FeedItem отдельно от самих постов
+        self.assertQueryBudget(self.client, reverse('follow_index'), 6,
+                               self.seed_posts)
+
+    @override_settings(COMMENTS_PER_PAGE=5)
+    def test_post_view(self):
+        url = reverse('post', args=(self.author.username, self.post.id))
+        # +1 — автор и группа поста для валидатора условного GET
+        self.assertQueryBudget(self.client, url, 5, self.seed_comments)
+
+    def test_search(self):
+        self.assertQueryBudget(self.client, f'{reverse("search")}?q=пост',
+                               5, self.seed_posts)
+
+    def test_anonymous_index(self):
+        self.assertQueryBudget(Client(), reverse('index'), 2,
+                               self.seed_posts)
@@ -0,0 +1,122 @@
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import router
+from django.http import HttpResponse
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.urls import reverse
+
+from posts.models import Post, User, UserStats
+from yatube.db.replicas import PinPrimaryMiddleware, read_only
+
+PIN = settings.DATABASE_PIN_COOKIE
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.used = []
+
+    def view(self, request, write=False):
+        self.used.append(router.db_for_read(Post))
+        if write:
+            router.db_for_write(Post)
+            self.used.append(router.db_for_read(Post))
+        return HttpResponse()
+
+    def test_reads_go_to_replica(self):
+        read_only(self.view)(self.factory.get('/'))
+        self.assertEqual(self.used, ['replica1'])
+        self.assertEqual(router.db_for_read(Post), 'default')
+        self.assertEqual(router.db_for_write(Post), 'default')
+
+    def test_primary_after_write(self):
+        """Запись в представлении переводит остальные чтения запроса на
+        основную базу."""
+        read_only(self.view)(self.factory.get('/'), write=True)
+        self.assertEqual(self.used, ['replica1', 'default'])
+
+    def test_primary_for_unsafe_and_pinned(self):
+        read_only(self.view)(self.factory.post('/'))
+        pinned = self.factory.get('/')
+        pinned.COOKIES[PIN] = '1'
+        read_only(self.view)(pinned)
+        self.assertEqual(self.used, ['default', 'default'])
+
+    def test_pin_cookie_after_write(self):
+        middleware = PinPrimaryMiddleware(lambda request: HttpResponse())
+        self.assertNotIn(PIN, middleware(self.factory.get('/')).cookies)
+        cookie = middleware(self.factory.post('/')).cookies[PIN]
+        self.assertEqual(cookie['max-age'], settings.DATABASE_PIN_SECONDS)
+
+    def test_pin_cookie_after_get_write(self):
+        """GET, который что-то записал, тоже закрепляет основную базу, а
+        запись сессии — нет."""
+        def view(model):
+            def write(request):
+                router.db_for_write(model)
+                return HttpResponse()
+            return PinPrimaryMiddleware(write)
+
+        self.assertIn(PIN, view(Post)(self.factory.get('/')).cookies)
+        self.assertNotIn(PIN, view(Session)(self.factory.get('/')).cookies)
+
+
+@skipUnless('replica' in settings.DATABASES,
+            'нужны две базы: --settings=yatube.replica_settings')
+class ReplicaRoutingTests(TestCase):
+    """Основная база и реплика не синхронизируются, поэтому по странице
+    видно, откуда она прочитана."""
+
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        User.objects.using('replica').bulk_create([
+            User(pk=self.author.pk, username='author',
+                 password=self.author.password)
+        ])
+        UserStats.objects.using('replica').bulk_create([
+            UserStats(user_id=self.author.pk, posts_count=1)
+        ])
+        Post.objects.using('replica').bulk_create([
+            Post(pk=1000, text='Пост с реплики', author_id=self.author.pk)
+        ])
+        self.client.force_login(self.author)
+
+    def profile(self):
+        return self.client.get(
+            reverse('profile', args=[self.author.username])
+        ).content.decode()
+
+    def test_read_your_writes(self):
+        self.assertIn('Пост с реплики', self.profile())
+        self.client.post(reverse('new_post'), {'text': 'Новый пост'})
+        self.assertTrue(Post.objects.filter(text='Новый пост').exists())
+        self.assertFalse(
+            Post.objects.using('replica').filter(text='Новый пост').exists()
+        )
+        # Сразу после записи читаем из основной базы.
+        self.assertIn(PIN, self.client.cookies)
+        page = self.profile()
+        self.assertIn('Новый пост', page)
+        self.assertNotIn('Пост с реплики', page)
+        del self.client.cookies[PIN]
+        self.assertIn('Пост с реплики', self.profile())
+
+    def test_read_your_writes_after_get(self):
+        """Подписка по GET тоже переводит следующие чтения на основную
+        базу."""
+        other = User.objects.create_user(username='other')
+        User.objects.using('replica').bulk_create([
+            User(pk=other.pk, username='other')
+        ])
+        self.assertIn('Пост с реплики', self.profile())
+        self.client.get(reverse('profile_follow', args=['other']))
+        self.assertIn(PIN, self.client.cookies)
+        self.assertNotIn('Пост с реплики', self.profile())
@@ -0,0 +1,107 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from wsgiref.util import setup_testing_defaults
+
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import SimpleTestCase, override_settings
+
+from yatube.assets import IMMUTABLE, StaticFiles
+
+CSS = 'body { background: url("icon.svg"); }\n' * 50
+
+
+def static_url(name):
+    return Template(
+        '{% load static %}{% static name %}'
+    ).render(Context({'name': name}))
+
+
+class StaticPipelineTests(SimpleTestCase):
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source)
+        self.addCleanup(shutil.rmtree, self.root)
+        with open(os.path.join(self.source, 'app.css'), 'w') as file:
+            file.write(CSS)
+        with open(os.path.join(self.source, 'icon.svg'), 'w') as file:
+            file.write('<svg xmlns="http://www.w3.org/2000/svg"/>')
+        settings = override_settings(
+            STATIC_ROOT=self.root, STATICFILES_DIRS=[self.source],
+            STATICFILES_FINDERS=[
+                'django.contrib.staticfiles.finders.FileSystemFinder'
+            ],
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def collect(self):
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(self.root, 'staticfiles.json')) as file:
+            return json.load(file)['paths']
+
+    def get(self, application, path, **headers):
+        environ = {'PATH_INFO': path, **headers}
+        setup_testing_defaults(environ)
+        response = {}
+
+        def start_response(status, headers):
+            response['status'] = status
+            response['headers'] = dict(headers)
+
+        response['body'] = b''.join(application(environ, start_response))
+        return response
+
+    def test_hashed_names_and_compression(self):
+        """collectstatic добавляет хэш к именам, переписывает ссылки в CSS
+        и кладет сжатую копию рядом."""
+        paths = self.collect()
+        css = paths['app.css']
+        self.assertRegex(css, r'^app\.[0-9a-f]{12}\.css$')
+        self.assertEqual(static_url('app.css'), f'/static/{css}')
+        with gzip.open(os.path.join(self.root, css + '.gz')) as file:
+            self.assertIn(paths['icon.svg'], file.read().decode())
+
+    def test_missing_manifest_entry(self):
+        """Без collectstatic адрес остается прежним."""
+        self.assertEqual(static_url('like.svg'), '/static/like.svg')
+
+    def test_serving(self):
+        """Файлы с хэшем отдаются навсегда и сжатыми, повтор получает
+        304, остальные адреса уходят в приложение."""
+        css = self.collect()['app.css']
+        application = StaticFiles(
+            lambda environ, start_response: [b'django'], self.root,
+            '/static/', max_age=60
+        )
+        response = self.get(application, f'/static/{css}',
+                            HTTP_ACCEPT_ENCODING='gzip, deflate')
+        headers = response['headers']
+        self.assertEqual(response['status'], '200 OK')
+        self.assertEqual(headers['Cache-Control'], IMMUTABLE)
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(headers['Content-Type'], 'text/css')
+        with open(os.path.join(self.root, css), 'rb') as file:
+            self.assertEqual(gzip.decompress(response['body']), file.read())
+        self.assertEqual(int(headers['Content-Length']),
+                         len(response['body']))
+        repeat = self.get(application, f'/static/{css}',
+                          HTTP_IF_NONE_MATCH=headers['ETag'])
+        self.assertEqual(repeat['status'], '304 Not Modified')
+        self.assertEqual(repeat['body'], b'')
+        plain = self.get(application, '/static/app.css')
+        self.assertEqual(plain['headers']['Cache-Control'],
+                         'public, max-age=60')
+        self.assertNotIn('Content-Encoding', plain['headers'])
+        self.assertEqual(plain['body'].decode(), CSS)
+        self.assertEqual(self.get(application, '/static/nope.css')['body'],
+                         b'django')
+        self.assertEqual(
+            self.get(application, f'/static/{css}',
+                     REQUEST_METHOD='POST')['status'],
+            '405 Method Not Allowed'
+        )
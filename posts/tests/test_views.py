@@ -1,11 +1,25 @@
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+from unittest import mock
+
 from django import forms
+from django.core.management import call_command
 from django.contrib.flatpages.models import FlatPage
 from django.contrib.sites.models import Site
-from django.test import Client, TestCase, modify_settings
+from django.db import connection
+from django.test import Client, TestCase, modify_settings, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from posts.models import Group, Post, User, Follow, Comment
+from posts import conditional, hot, like_buffer, search
+from posts.models import (Group, Post, User, Follow, Comment, FeedItem,
+                          HotScore, Like, SearchTerm)
+from posts.tests.utils import run_on_commit
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from yatube.caching.config import parse_cache_url
 
 
 class DataBaseTests(TestCase):
@@ -188,6 +202,55 @@ class PostPagesTests(DataBaseTests, TestCase):
                             'Кеширование неисправно')
 
 
+@override_settings(NUMBERED_PAGINATION_LIMIT=5)
+class CursorPaginationTests(DataBaseTests, TestCase):
+    def setUp(self):
+        cache.clear()
+        for i in range(24):
+            Post.objects.create(text=f'Пост {i}', author=self.author)
+        # Одинаковая дата у всех постов: порядок держится на id
+        Post.objects.update(pub_date=self.post.pub_date)
+        self.expected = list(
+            Post.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True)
+        )
+
+    def test_cursor_pages_cover_feed(self):
+        """Ссылки «Старее» проходят всю ленту без повторов и пропусков."""
+        seen = []
+        query = {}
+        while True:
+            response = self.authorized_author.get(reverse('index'), query)
+            page = response.context['page']
+            self.assertTrue(response.context['paginator'].is_cursor)
+            self.assertLessEqual(len(page), 10)
+            seen.extend(post.id for post in page)
+            if not page.has_next():
+                break
+            query = {'after': page.next_cursor()}
+        self.assertEqual(seen, self.expected)
+
+    def test_cursor_newer_link(self):
+        """Ссылка «Новее» возвращает предыдущую страницу."""
+        first = self.authorized_author.get(reverse('index')).context['page']
+        second = self.authorized_author.get(
+            reverse('index'), {'after': first.next_cursor()}
+        ).context['page']
+        back = self.authorized_author.get(
+            reverse('index'), {'before': second.previous_cursor()}
+        ).context['page']
+        self.assertEqual([post.id for post in back],
+                         [post.id for post in first])
+        self.assertFalse(back.has_previous())
+
+    def test_broken_cursor_returns_first_page(self):
+        """Испорченный курсор открывает первую страницу."""
+        response = self.authorized_author.get(reverse('index'),
+                                              {'after': 'not-a-cursor'})
+        self.assertEqual([post.id for post in response.context['page']],
+                         self.expected[:10])
+
+
 class FollowCaseTests(DataBaseTests, TestCase):
     def test_follow(self):
         """Авторизованный пользователь может подписываться на других
@@ -225,3 +288,642 @@ class FollowCaseTests(DataBaseTests, TestCase):
             response.context['page'][0], self.post,
             'Шаблон follow_index сформирован с неправильным контекстом'
         )
+
+
+class FeedTests(DataBaseTests, TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def follow_feed(self):
+        response = self.authorized_follower.get(reverse('follow_index'))
+        return [post.id for post in response.context['page']]
+
+    def test_new_post_fans_out(self):
+        """Новый пост попадает в материализованную ленту подписчика."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.authorized_author.post(reverse('new_post'),
+                                    {'text': 'Новый пост'})
+        post = Post.objects.get(text='Новый пост')
+        self.assertTrue(FeedItem.objects.filter(user=self.follower,
+                                                post=post).exists())
+        self.assertFalse(FeedItem.objects.filter(user=self.not_follower,
+                                                 post=post).exists())
+        self.assertEqual(self.follow_feed(), [post.id, self.post.id])
+
+    def test_unfollow_cleans_feed(self):
+        """После отписки посты автора убираются из ленты."""
+        self.authorized_follower.get(reverse('profile_follow',
+                                             kwargs={'username': self.author}))
+        self.assertEqual(self.follow_feed(), [self.post.id])
+        self.authorized_follower.get(reverse('profile_unfollow',
+                                             kwargs={'username': self.author}))
+        self.assertFalse(FeedItem.objects.filter(user=self.follower).exists())
+        self.assertEqual(self.follow_feed(), [])
+
+    def test_deleted_post_leaves_feed(self):
+        """Удаленный пост пропадает из лент."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        post = Post.objects.create(text='Временный пост', author=self.author)
+        self.authorized_author.get(
+            reverse('post_delete', args=(self.author.username, post.id))
+        )
+        self.assertEqual(self.follow_feed(), [self.post.id])
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_popular_author_read_on_pull(self):
+        """Посты популярных авторов подмешиваются при чтении ленты."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        post = Post.objects.create(text='Пост для всех', author=self.author)
+        self.assertFalse(FeedItem.objects.exists())
+        self.assertEqual(self.follow_feed(), [post.id, self.post.id])
+
+    @override_settings(FEED_FANOUT_LIMIT=1, NUMBERED_PAGINATION_LIMIT=0,
+                       POSTS_PER_PAGE=3)
+    def test_cursor_pages_merge_pulled_authors(self):
+        """Курсор проходит ленту, где разложенные посты перемешаны с
+        постами популярного автора."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=self.not_follower, author=self.author)
+        Follow.objects.create(user=self.follower, author=self.not_follower)
+        for i in range(4):
+            Post.objects.create(text=f'Популярный {i}', author=self.author)
+            Post.objects.create(text=f'Обычный {i}', author=self.not_follower)
+        # Одинаковая дата у всех постов: порядок держится на id
+        Post.objects.update(pub_date=self.post.pub_date)
+        FeedItem.objects.update(pub_date=self.post.pub_date)
+        expected = list(Post.objects.filter(
+            author__in=[self.author, self.not_follower]
+        ).order_by('-pub_date', '-id').values_list('id', flat=True))
+        seen = []
+        query = {}
+        while True:
+            page = self.authorized_follower.get(
+                reverse('follow_index'), query
+            ).context['page']
+            seen.extend(post.id for post in page)
+            if not page.has_next():
+                break
+            query = {'after': page.next_cursor()}
+        self.assertEqual(seen, expected)
+        self.assertFalse(FeedItem.objects.filter(
+            post__text__startswith='Популярный'
+        ).exists())
+
+
+class PostCardCacheTests(DataBaseTests, TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def profile_page(self, client):
+        return client.get(reverse('profile', args=(self.author.username,)))
+
+    def test_like_state_is_per_viewer(self):
+        """Закэшированная карточка не показывает чужой лайк."""
+        self.profile_page(self.authorized_author)
+        Like.objects.create(user=self.follower, post=self.post)
+        follower_page = self.profile_page(self.authorized_follower)
+        other_page = self.profile_page(self.authorized_not_follower)
+        self.assertContains(follower_page, '<img src="/static/dislike.svg"')
+        self.assertNotContains(other_page, '<img src="/static/dislike.svg"')
+        self.assertNotContains(other_page, 'edit.svg')
+        self.assertContains(self.profile_page(self.authorized_author),
+                            'edit.svg')
+
+    def test_card_is_cached(self):
+        """Карточка берется из кэша, пока пост не изменился."""
+        self.profile_page(self.authorized_author)
+        Post.objects.filter(pk=self.post.pk).update(text='Тихая правка')
+        response = self.profile_page(self.authorized_author)
+        self.assertContains(response, 'Тестовый текст')
+
+    def test_post_edit_invalidates_card(self):
+        """Редактирование поста обновляет карточку."""
+        self.profile_page(self.authorized_author)
+        self.authorized_author.post(
+            reverse('post_edit', args=(self.author.username, self.post.id)),
+            {'text': 'Новый текст', 'group': self.group.id}
+        )
+        response = self.profile_page(self.authorized_author)
+        self.assertContains(response, 'Новый текст')
+
+    def test_comment_invalidates_card(self):
+        """Новый комментарий обновляет счетчик в карточке."""
+        self.profile_page(self.authorized_author)
+        Comment.objects.create(text='Комментарий', post=self.post,
+                               author=self.follower)
+        response = self.profile_page(self.authorized_author)
+        self.assertEqual(response.context['page'][0].comments_count, 1)
+        self.assertContains(response, '>1&thinsp;<img src="/static/comment')
+
+
+class ExplainViewsTests(DataBaseTests, TestCase):
+    def test_explain_views_finds_no_full_scans(self):
+        """Запросы основных страниц не проходят таблицы целиком."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        out = StringIO()
+        call_command('explain_views', '--fail', stdout=out)
+        for name in ('index', 'group', 'profile', 'post', 'follow_index'):
+            self.assertIn(f'{name}: ', out.getvalue())
+
+
+class SearchTests(DataBaseTests, TestCase):
+    def search(self, query):
+        response = self.client.get(reverse('search'), {'q': query})
+        return [post.id for post in response.context['page']]
+
+    def test_word_forms_match(self):
+        """Поиск находит пост по другой форме слова."""
+        post = Post.objects.create(text='Читаем интересные книги',
+                                   author=self.author)
+        self.assertEqual(self.search('интересная книга'), [post.id])
+        self.assertEqual(self.search('книга про космос'), [])
+
+    def test_rank_prefers_post_text(self):
+        """Совпадение в тексте поста важнее совпадения в комментарии."""
+        commented = Post.objects.create(text='Обычный день',
+                                        author=self.author)
+        Comment.objects.create(text='Отличные котики', post=commented,
+                               author=self.follower)
+        titled = Post.objects.create(text='Котики спят', author=self.author)
+        self.assertEqual(self.search('котик'), [titled.id, commented.id])
+
+    def test_group_title_is_indexed(self):
+        """Пост находится по названию группы, которая может измениться."""
+        self.assertEqual(self.search('test-group'), [self.post.id])
+        self.group.title = 'Путешествия'
+        self.group.save()
+        self.assertEqual(self.search('путешествие'), [self.post.id])
+        response = self.client.get(reverse('search'), {'q': 'путешествия'})
+        self.assertEqual(list(response.context['groups']), [self.group])
+
+    def test_deleted_comment_is_unindexed(self):
+        comment = Comment.objects.create(text='Редкое слово', post=self.post,
+                                         author=self.follower)
+        self.assertEqual(self.search('редкое'), [self.post.id])
+        comment.delete()
+        self.assertEqual(self.search('редкое'), [])
+
+    def test_comment_index_matches_rebuild(self):
+        """Комментарий дописывается к индексу без перечитывания
+        остальных, и результат совпадает с полной пересборкой."""
+        def weights():
+            return dict(SearchTerm.objects.filter(
+                post=self.post
+            ).values_list('term', 'weight'))
+
+        def assert_rebuilt():
+            incremental = weights()
+            search.index_post(self.post.pk)
+            rebuilt = weights()
+            self.assertEqual(incremental.keys(), rebuilt.keys())
+            for term, weight in rebuilt.items():
+                self.assertAlmostEqual(incremental[term], weight)
+
+        Comment.objects.create(text='Котики и собаки', post=self.post,
+                               author=self.follower)
+        with CaptureQueriesContext(connection) as queries:
+            second = Comment.objects.create(
+                text='Котики спят', post=self.post, author=self.author
+            )
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'FROM "posts_comment"' in query['sql']])
+        assert_rebuilt()
+        second.delete()
+        assert_rebuilt()
+
+    def test_post_queries_defer_search_vector(self):
+        self.assertIn('search_vector',
+                      Post.objects.get(pk=self.post.pk).get_deferred_fields())
+
+    def test_rebuild_search_index(self):
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertEqual(self.search('сигнал'), [self.post.id])
+        self.assertIn('Проиндексировано постов: 1', out.getvalue())
+
+
+class BenchmarkCommandsTests(TestCase):
+    def test_generate_dataset_and_benchmark(self):
+        """Генератор заполняет базу, а бенчмарк сохраняет результаты."""
+        call_command('generate_dataset', users=30, groups=3, posts=200,
+                     follows=5, heavy_follower=20, likes=300, comments=100,
+                     seed=1, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 200)
+        heavy = User.objects.get(username='bench_heavy')
+        self.assertEqual(heavy.follower.count(), 20)
+        # Счетчики и ленты пересчитаны после загрузки в обход сигналов.
+        post = Post.objects.order_by('-likes_count').first()
+        self.assertEqual(post.likes_count, post.likes.count())
+        self.assertTrue(FeedItem.objects.filter(user=heavy).exists())
+        # Степенной закон: самый активный автор пишет заметно больше
+        # среднего.
+        top = max(author.posts.count() for author in User.objects.all())
+        self.assertGreater(top, 200 / 31 * 3)
+        with tempfile.TemporaryDirectory() as directory:
+            out = StringIO()
+            call_command('benchmark', requests=40, warmup=5, seed=1,
+                         output=directory, stdout=out)
+            files = os.listdir(directory)
+            self.assertEqual(len(files), 1)
+            with open(os.path.join(directory, files[0])) as file:
+                result = json.load(file)
+        self.assertIn('index', result['views'])
+        self.assertIn('p99_ms', result['views']['index'])
+        self.assertIn('follow_index', out.getvalue())
+
+
+class LikesApiTests(DataBaseTests, TestCase):
+    def toggle(self, client, *toggles):
+        return client.post(
+            reverse('likes_api'),
+            json.dumps({'toggles': [{'post': post.id, 'like': like}
+                                    for post, like in toggles]}),
+            content_type='application/json'
+        )
+
+    def test_batch_toggle(self):
+        """Пачка лайков применяется одним запросом и возвращает счетчики."""
+        other = Post.objects.create(text='Второй пост', author=self.author)
+        Like.objects.create(user=self.not_follower, post=other)
+        response = self.toggle(self.authorized_follower,
+                               (self.post, True), (other, True))
+        self.assertEqual(response.json(), {'posts': {
+            str(self.post.id): {'liked': True, 'likes_count': 1},
+            str(other.id): {'liked': True, 'likes_count': 2},
+        }})
+        response = self.toggle(self.authorized_follower,
+                               (other, True), (other, False))
+        self.assertEqual(response.json()['posts'][str(other.id)],
+                         {'liked': False, 'likes_count': 1})
+        self.assertEqual(Post.objects.get(pk=other.pk).likes_count, 1)
+
+    def test_idempotent(self):
+        for _ in range(2):
+            self.toggle(self.authorized_follower, (self.post, True))
+        self.assertEqual(self.post.likes.count(), 1)
+        for _ in range(2):
+            response = self.toggle(self.authorized_follower,
+                                   (self.post, False))
+        self.assertEqual(response.json()['posts'][str(self.post.id)],
+                         {'liked': False, 'likes_count': 0})
+
+    def test_counter_shifts_by_changed_rows(self):
+        """Счетчик сдвигается на число измененных строк, а не
+        пересчитывается по всем лайкам поста."""
+        Post.objects.filter(pk=self.post.pk).update(likes_count=10)
+        self.toggle(self.authorized_follower, (self.post, True))
+        self.toggle(self.authorized_follower, (self.post, True))
+        self.toggle(self.authorized_not_follower, (self.post, False))
+        self.assertEqual(Post.objects.get(pk=self.post.pk).likes_count, 11)
+        call_command('sync_counters', stdout=StringIO())
+        self.assertEqual(Post.objects.get(pk=self.post.pk).likes_count, 1)
+
+    def test_query_count(self):
+        """Переключение не перечитывает пост с автором и не редиректит."""
+        posts = [Post.objects.create(text=f'Пост {i}', author=self.author)
+                 for i in range(5)]
+        # сессия, пользователь, посты с блокировкой, вставка, сдвиг
+        # счетчиков, оценка горячей ленты, состояния (+ savepoint в тестовой
+        # транзакции)
+        with self.assertNumQueries(9):
+            response = self.toggle(self.authorized_follower,
+                                   *[(post, True) for post in posts])
+        self.assertEqual(response.status_code, 200)
+
+    def test_state_and_errors(self):
+        Like.objects.create(user=self.follower, post=self.post)
+        response = self.authorized_follower.get(
+            reverse('likes_api'), {'posts': f'{self.post.id},999'}
+        )
+        self.assertEqual(response.json(), {'posts': {
+            str(self.post.id): {'liked': True, 'likes_count': 1},
+        }})
+        self.assertIn('csrftoken', response.cookies)
+        self.assertEqual(self.toggle(self.client, (self.post, True))
+                         .status_code, 401)
+        response = self.authorized_follower.post(
+            reverse('likes_api'), 'not json', content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(LIKES_WRITE_BEHIND=True, LIKES_FLUSH_INTERVAL=0)
+class LikeBufferTests(DataBaseTests, TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def toggle(self, client, like):
+        response = client.post(
+            reverse('likes_api'),
+            json.dumps({'toggles': [{'post': self.post.id, 'like': like}]}),
+            content_type='application/json'
+        )
+        return response.json()['posts'][str(self.post.id)]
+
+    def post_page(self, client):
+        response = client.get(
+            reverse('post', args=(self.author.username, self.post.id))
+        )
+        return response.context['post']
+
+    def test_reads_merge_buffer(self):
+        """Лайк виден сразу, хотя в базу попадет только после сброса."""
+        self.assertEqual(self.toggle(self.authorized_follower, True),
+                         {'liked': True, 'likes_count': 1})
+        self.toggle(self.authorized_not_follower, True)
+        self.assertFalse(Like.objects.exists())
+        post = self.post_page(self.authorized_follower)
+        self.assertEqual((post.liked, post.likes_count), (True, 2))
+        post = self.post_page(self.authorized_author)
+        self.assertEqual((post.liked, post.likes_count), (False, 2))
+
+    def test_flush_writes_batch(self):
+        self.toggle(self.authorized_follower, True)
+        self.toggle(self.authorized_not_follower, True)
+        self.toggle(self.authorized_not_follower, False)
+        self.toggle(self.authorized_not_follower, True)
+        self.toggle(self.authorized_follower, True)
+        out = StringIO()
+        call_command('flush_likes', stdout=out)
+        self.assertIn('Записано операций: 5', out.getvalue())
+        self.assertEqual(self.post.likes.count(), 2)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).likes_count, 2)
+        post = self.post_page(self.authorized_follower)
+        self.assertEqual((post.liked, post.likes_count), (True, 2))
+        self.assertEqual(self.toggle(self.authorized_follower, False),
+                         {'liked': False, 'likes_count': 1})
+        call_command('flush_likes', stdout=out)
+        self.assertEqual(self.post.likes.count(), 1)
+        post = self.post_page(self.authorized_not_follower)
+        self.assertEqual((post.liked, post.likes_count), (True, 1))
+
+    def test_lost_op_does_not_stall_flush(self):
+        """Пропавшая из кэша операция задерживает сброс только на
+        GAP_TIMEOUT, а не навсегда."""
+        self.toggle(self.authorized_follower, True)
+        self.toggle(self.authorized_not_follower, True)
+        cache.delete(like_buffer._op_key(1))
+        self.assertEqual(like_buffer.flush(), 0)
+        with mock.patch.object(like_buffer, 'GAP_TIMEOUT', 0), \
+                self.assertLogs('posts.like_buffer', 'WARNING'):
+            self.assertEqual(like_buffer.flush(), 1)
+        self.assertEqual(list(self.post.likes.values_list('user', flat=True)),
+                         [self.not_follower.pk])
+
+
+@override_settings(COMMENTS_PER_PAGE=3)
+class CommentPaginationTests(DataBaseTests, TestCase):
+    def test_comments_keyset_pages(self):
+        """Комментарии листаются курсором без пропусков и повторов."""
+        comments = [Comment.objects.create(text=f'Комментарий {i}',
+                                           post=self.post,
+                                           author=self.follower)
+                    for i in range(7)]
+        url = reverse('post', args=(self.author.username, self.post.id))
+        seen = []
+        response = self.client.get(url)
+        self.assertContains(response, 'Комментарии: 7')
+        while True:
+            page = response.context['comments']
+            seen += [comment.id for comment in page]
+            if not page.has_next():
+                break
+            response = self.client.get(url, {'after': page.next_cursor()})
+        self.assertEqual(seen, [comment.id for comment in
+                                reversed(comments)])
+        response = self.client.get(
+            url, {'before': response.context['comments'].previous_cursor()}
+        )
+        self.assertEqual(len(response.context['comments']), 3)
+
+
+class GroupDirectoryTests(DataBaseTests, TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def group_count(self, group):
+        return Group.objects.get(pk=group.pk).posts_count
+
+    def test_posts_count_follows_post_group(self):
+        """Счетчик записей группы меняется при создании, переносе и
+        удалении поста."""
+        self.assertEqual(self.group_count(self.group), 1)
+        self.authorized_author.post(
+            reverse('post_edit', args=(self.author.username, self.post.id)),
+            {'text': 'Перенесенный пост', 'group': self.group_no_post.id}
+        )
+        self.assertEqual(self.group_count(self.group), 0)
+        self.assertEqual(self.group_count(self.group_no_post), 1)
+        Post.objects.get(pk=self.post.pk).delete()
+        self.assertEqual(self.group_count(self.group_no_post), 0)
+
+    def test_group_page_uses_cached_count(self):
+        url = reverse('group', args=(self.group.slug,))
+        self.assertContains(self.client.get(url),
+                            'Количество записей: 1')
+        Post.objects.create(text='Новый пост', author=self.author,
+                            group=self.group)
+        self.assertContains(self.client.get(url),
+                            'Количество записей: 2')
+
+    def test_slug_cache_invalidated(self):
+        """Смена slug и удаление группы сбрасывают кэш поиска по slug."""
+        group = Group.objects.get(pk=self.group_no_post.pk)
+        old_url = reverse('group', args=(group.slug,))
+        self.assertEqual(self.client.get(old_url).status_code, 200)
+        group.slug = 'renamed'
+        group.save()
+        self.assertEqual(self.client.get(old_url).status_code, 404)
+        new_url = reverse('group', args=('renamed',))
+        self.assertEqual(self.client.get(new_url).status_code, 200)
+        group.delete()
+        self.assertEqual(self.client.get(new_url).status_code, 404)
+
+    def test_directory(self):
+        """Каталог групп показывает сохраненные счетчики, крупные группы
+        первыми."""
+        response = self.client.get(reverse('groups'))
+        self.assertEqual(list(response.context['page']),
+                         [self.group, self.group_no_post])
+        self.assertContains(response, 'Записей: 1')
+
+
+@override_settings(HOT_WEIGHTS={'like': 1.0, 'comment': 2.0},
+                   HOT_HALF_LIFE=100, HOT_MIN_SCORE=0.5)
+class HotFeedTests(DataBaseTests, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.other = Post.objects.create(text='Второй пост',
+                                         author=self.author)
+
+    def hot_posts(self):
+        cache.delete(hot.TOP_KEY)
+        response = self.client.get(reverse('hot'))
+        return [post.id for post in response.context['page']]
+
+    def scores(self):
+        return dict(HotScore.objects.values_list('post_id', 'score'))
+
+    def test_engagement_ranks_posts(self):
+        """Лайки и комментарии, в том числе пачкой через API, поднимают
+        пост в горячей ленте."""
+        self.assertEqual(self.hot_posts(), [])
+        Comment.objects.create(text='Комментарий', post=self.post,
+                               author=self.follower)
+        Like.objects.create(user=self.follower, post=self.other)
+        self.assertEqual(self.hot_posts(), [self.post.id, self.other.id])
+        for client in (self.authorized_author, self.authorized_not_follower):
+            client.post(reverse('likes_api'),
+                        json.dumps({'toggles': [{'post': self.other.id,
+                                                 'like': True}]}),
+                        content_type='application/json')
+        self.assertEqual(self.scores(), {self.post.id: 2.0,
+                                         self.other.id: 3.0})
+        self.assertEqual(self.hot_posts(), [self.other.id, self.post.id])
+        self.authorized_author.get(
+            reverse('delete_like', args=(self.author.username,
+                                         self.other.id))
+        )
+        self.assertEqual(self.scores()[self.other.id], 2.0)
+
+    def test_scores_age(self):
+        """Оценки затухают с периодом полураспада, остывшие удаляются."""
+        Comment.objects.create(text='Комментарий', post=self.post,
+                               author=self.follower)
+        Like.objects.create(user=self.follower, post=self.other)
+        self.assertEqual(hot.age(now=1000), (1.0, 0))
+        # Время прошлого запуска хранится в базе, а не в кэше процесса.
+        cache.clear()
+        self.assertEqual(hot.age(now=1100), (0.5, 0))
+        self.assertEqual(self.scores(), {self.post.id: 1.0,
+                                         self.other.id: 0.5})
+        out = StringIO()
+        call_command('age_hot_scores', stdout=out)
+        self.assertIn('удалено: 2', out.getvalue())
+        self.assertEqual(self.hot_posts(), [])
+
+    def test_unlike_removes_aged_weight(self):
+        """Снятый лайк вычитает столько, сколько от него осталось после
+        состаривания, а не полный вес."""
+        for user in (self.follower, self.not_follower):
+            Like.objects.create(user=user, post=self.other)
+        Like.objects.update(
+            created=datetime.fromtimestamp(1000, timezone.utc)
+        )
+        hot.age(now=1000)
+        hot.age(now=1100)
+        self.assertEqual(self.scores(), {self.other.id: 1.0})
+        Like.objects.get(user=self.follower).delete()
+        self.assertEqual(self.scores(), {self.other.id: 0.5})
+        self.authorized_not_follower.get(
+            reverse('delete_like', args=(self.author.username,
+                                         self.other.id))
+        )
+        self.assertEqual(self.scores(), {self.other.id: 0.0})
+
+
+class ConditionalGetTests(DataBaseTests, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.post_url = reverse('post', args=(self.author.username,
+                                              self.post.id))
+        self.profile_url = reverse('profile', args=(self.author.username,))
+        self.group_url = reverse('group', args=(self.group.slug,))
+
+    def revalidate(self, client, url):
+        etag = client.get(url)['ETag']
+        return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_not_modified(self):
+        """Неизменившаяся страница отдается как 304 ценой сессии,
+        пользователя и одного запроса валидатора."""
+        for url in (reverse('index'), self.group_url, self.profile_url):
+            response = self.revalidate(self.authorized_follower, url)
+            self.assertEqual(response.status_code, 304, url)
+        etag = self.authorized_follower.get(self.post_url)['ETag']
+        with self.assertNumQueries(3):
+            response = self.authorized_follower.get(
+                self.post_url, HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('Last-Modified', response)
+
+    def test_etag_depends_on_viewer(self):
+        etag = self.authorized_follower.get(self.post_url)['ETag']
+        response = self.authorized_not_follower.get(self.post_url,
+                                                    HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_changes_update_validators(self):
+        """Комментарий, лайк, подписка и правка группы меняют ETag
+        затронутых страниц."""
+        changes = (
+            (self.post_url, lambda: Comment.objects.create(
+                text='Комментарий', post=self.post, author=self.follower
+            )),
+            (self.group_url, lambda: self.authorized_not_follower.get(
+                reverse('add_like', args=(self.author.username,
+                                          self.post.id))
+            )),
+            (self.profile_url, lambda: self.authorized_not_follower.get(
+                reverse('profile_follow', args=(self.author.username,))
+            )),
+            (reverse('index'), lambda: Group.objects.filter(
+                pk=self.group.pk
+            ).get().save()),
+        )
+        for url, change in changes:
+            etag = self.authorized_follower.get(url)['ETag']
+            change()
+            run_on_commit()
+            response = self.authorized_follower.get(url,
+                                                    HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertNotEqual(response['ETag'], etag, url)
+
+    def test_versions_change_after_commit(self):
+        """До коммита записи страница остается прежней версии."""
+        etag = self.authorized_follower.get(self.post_url)['ETag']
+        Comment.objects.create(text='Комментарий', post=self.post,
+                               author=self.follower)
+        response = self.authorized_follower.get(self.post_url,
+                                                HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        run_on_commit()
+        response = self.authorized_follower.get(self.post_url,
+                                                HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(CACHES={
+    'default': parse_cache_url('db://', key_prefix='yatube')
+})
+class DatabaseCacheConditionalGetTests(DataBaseTests, TestCase):
+    """Цена условного GET на кэше по умолчанию — таблице django_cache."""
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('createcachetable', verbosity=0)
+
+    def test_not_modified_cost(self):
+        """304 — сессия, пользователь, запрос области и один SELECT из
+        django_cache."""
+        url = reverse('post', args=(self.author.username, self.post.id))
+        # Первый ответ ставит cookie CSRF, а она входит в ETag.
+        self.authorized_follower.get(url)
+        etag = self.authorized_follower.get(url)['ETag']
+        with self.assertNumQueries(4):
+            response = self.authorized_follower.get(url,
+                                                    HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_version_cost(self):
+        """Пропавшая версия записывается заново: COUNT для вытеснения,
+        затем точка сохранения с SELECT и INSERT на каждый ключ."""
+        conditional.versions([conditional.SITE, conditional.INDEX])
+        cache.delete(conditional.SITE)
+        with self.assertNumQueries(6):
+            conditional.versions([conditional.SITE, conditional.INDEX])
+        with self.assertNumQueries(1):
+            conditional.versions([conditional.SITE, conditional.INDEX])
@@ -0,0 +1,9 @@
+from django.db import connection
+
+
+def run_on_commit():
+    """Выполняет действия, отложенные до коммита: TestCase транзакцию не
+    коммитит, и сами они не запустятся."""
+    callbacks, connection.run_on_commit = connection.run_on_commit, []
+    for _, callback in callbacks:
+        callback()
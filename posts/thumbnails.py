@@ -0,0 +1,96 @@
+"""Фоновая генерация миниатюр.
+
+Миниатюра и адаптивные варианты картинки (см. images.py) строятся не во
+время рендера ленты, а в пуле потоков после коммита транзакции,
+сохранившей пост. Пока она не готова, карточка
+показывает заглушку. Посты, миниатюры которых потерялись (например, при
+перезапуске процесса), добирает команда generate_thumbnails.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from sorl.thumbnail import get_thumbnail
+
+from . import cards, conditional, images
+from .models import Post
+
+GEOMETRY = '960x339'
+OPTIONS = {'crop': 'center', 'upscale': True}
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails'
+            )
+        return _executor
+
+
+def backlog():
+    """Сколько миниатюр ждет генерации в этом процессе."""
+    with _pending_lock:
+        return len(_pending)
+
+
+def generate(post_id):
+    post = Post.objects.filter(pk=post_id).only(
+        'id', 'image', 'author_id', 'group_id'
+    ).first()
+    if post is None or not post.image:
+        return None
+    thumbnail = get_thumbnail(post.image, GEOMETRY, **OPTIONS)
+    digest, variants = images.build_variants(post)
+    # Картинку могли заменить, пока строилась миниатюра.
+    updated = Post.objects.filter(
+        pk=post_id, image=post.image.name
+    ).update(thumbnail=thumbnail.url, image_variants=images.dumps(variants))
+    if updated:
+        images.delete_variants(post_id, keep=digest)
+        cards.invalidate_post(post_id)
+        conditional.touch_posts([(post_id, post.author_id, post.group_id)])
+    return thumbnail.url
+
+
+def _run(post_id):
+    close_old_connections()
+    try:
+        generate(post_id)
+    except Exception:
+        logger.exception('Не удалось построить миниатюру поста %s', post_id)
+    finally:
+        with _pending_lock:
+            _pending.discard(post_id)
+        connection.close()
+
+
+def _submit(post_id):
+    with _pending_lock:
+        if post_id in _pending:
+            return
+        _pending.add(post_id)
+    _pool().submit(_run, post_id)
+
+
+def enqueue(post):
+    """Ставит пост в очередь на генерацию миниатюры после коммита."""
+    if not post.image:
+        # Картинку убрали: ее варианты больше не нужны.
+        transaction.on_commit(lambda: images.delete_variants(post.pk))
+        return
+    if settings.THUMBNAIL_ASYNC:
+        transaction.on_commit(lambda: _submit(post.pk))
+    else:
+        transaction.on_commit(lambda: generate(post.pk))
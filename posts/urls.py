@@ -4,9 +4,13 @@ from . import views
 urlpatterns = [
     path('', views.index, name='index'),
     path('group/<slug:slug>/', views.group_posts, name='group'),
+    path('groups/', views.group_index, name='groups'),
+    path('hot/', views.hot_index, name='hot'),
     path('new/', views.new_post, name='new_post'),
     path('new_group/', views.new_group, name='new_group'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search_view, name='search'),
+    path('api/likes/', views.likes_api, name='likes_api'),
     path('<str:username>/', views.profile, name='profile'),
     path(
         "<str:username>/profile_edit", views.profile_edit, name="profile_edit"
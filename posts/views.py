@@ -1,48 +1,107 @@
-from django.core.paginator import Paginator
+import json
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
 from django.shortcuts import redirect, render, get_object_or_404
+from . import (cards, conditional, feed, groups, hot, likes, search, stats,
+               thumbnails)
 from .forms import PostForm, CommentForm, GroupForm, UserEditForm
-from .models import Group, Post, Comment, Follow, User, Like
+from .models import Group, Post, Comment, Follow, User
+from .pagination import CursorPaginator, paginate
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
+from django.core.paginator import Paginator
+from yatube.caching.coalesce import cache_page_coalesced
+from yatube.db.replicas import read_only
+from django.http import Http404, JsonResponse
 from django.http.response import HttpResponseRedirect
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import require_http_methods
 
 
-@cache_page(1, key_prefix='index_page')
+@read_only
+@conditional.conditional(conditional.index_scopes)
+@cache_page_coalesced(1, key_prefix='index_page')
 def index(request):
-    post_list = Post.objects.annotate_liked(request.user).all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = Post.objects.annotate_liked(request.user).select_related(
+        'author', 'group'
+    )
+    page = paginate(request, post_list)
+    cards.prefetch(page)
+    likes.overlay(request.user, page)
     context = {'page': page,
-               'paginator': paginator}
+               'paginator': page.paginator}
     return render(request, 'index.html', context)
 
 
+@read_only
+def hot_index(request):
+    paginator = Paginator(hot.top_ids(), settings.POSTS_PER_PAGE)
+    page = paginator.get_page(request.GET.get('page'))
+    posts = Post.objects.annotate_liked(request.user).select_related(
+        'author', 'group'
+    ).in_bulk(page.object_list)
+    # Порядок задает рейтинг; удаленные с момента кэширования посты
+    # пропускаются.
+    page.object_list = [posts[pk] for pk in page.object_list if pk in posts]
+    cards.prefetch(page)
+    likes.overlay(request.user, page)
+    context = {'page': page,
+               'paginator': paginator}
+    return render(request, 'hot.html', context)
+
+
+@read_only
+@conditional.conditional(conditional.group_scopes)
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    group_list = group.posts.annotate_liked(request.user).all()
-    paginator = Paginator(group_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    group = groups.get_by_slug(slug)
+    if group is None:
+        raise Http404
+    group_list = group.posts.annotate_liked(request.user).select_related(
+        'author', 'group'
+    )
+    page = paginate(request, group_list, count=group.posts_count)
+    cards.prefetch(page)
+    likes.overlay(request.user, page)
     context = {'group': group,
                'page': page,
-               'paginator': paginator}
+               'paginator': page.paginator}
     return render(request, 'group.html', context)
 
 
+@read_only
+def group_index(request):
+    group_list = Group.objects.order_by('-posts_count', 'title')
+    paginator = Paginator(group_list, settings.GROUPS_PER_PAGE)
+    page = paginator.get_page(request.GET.get('page'))
+    context = {'page': page,
+               'paginator': paginator}
+    return render(request, 'groups.html', context)
+
+
+@read_only
+@conditional.conditional(conditional.profile_scopes)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.annotate_liked(request.user).all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    following = False
-    if request.user.is_authenticated:
-        following = request.user.follower.filter(author=author).exists()
+    # Автор, его счетчики и подписка читателя — одним запросом.
+    author = get_object_or_404(
+        User.objects.select_related('stats').annotate(
+            is_followed=Exists(Follow.objects.filter(
+                user=request.user.id, author=OuterRef('pk')
+            ))
+        ),
+        username=username
+    )
+    post_list = author.posts.annotate_liked(request.user).select_related(
+        'author', 'group'
+    )
+    page = paginate(request, post_list)
+    cards.prefetch(page)
+    likes.overlay(request.user, page)
     context = {'page': page,
-               'paginator': paginator,
+               'paginator': page.paginator,
                'author': author,
-               'following': following}
+               'stats': stats.for_user(author),
+               'following': author.is_followed}
     return render(request, 'profile.html', context)
 
 
@@ -58,16 +117,29 @@ def profile_edit(request, username):
     return render(request, 'profile_edit.html', {'form': form})
 
 
+@read_only
+@conditional.conditional(conditional.post_scopes)
 def post_view(request, username, post_id):
     post = get_object_or_404(
-        Post.objects.annotate_liked(request.user),
+        Post.objects.annotate_liked(request.user).select_related(
+            'author__stats', 'group'
+        ),
         id=post_id,
         author__username=username
     )
+    likes.overlay(request.user, [post])
     form = CommentForm()
-    comments = post.comments.filter(post=post).all()
+    # Комментарии листаются курсором по индексу (post, -created): цена
+    # страницы не зависит от их общего числа, а всего их —
+    # post.comments_count.
+    comments = CursorPaginator(
+        post.comments.select_related('author'),
+        settings.COMMENTS_PER_PAGE,
+        ordering=('-created', '-id')
+    ).get_page(request.GET.get('after'), request.GET.get('before'))
     context = {'post': post,
                'author': post.author,
+               'stats': stats.for_user(post.author),
                'form': form,
                'comments': comments}
     return render(request, 'post.html', context)
@@ -82,7 +154,9 @@ def new_post(request):
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        with transaction.atomic():
+            post.save()
+            thumbnails.enqueue(post)
         return redirect('index')
     return render(request, 'post_new.html', {'form': form})
 
@@ -109,7 +183,14 @@ def post_edit(request, username, post_id):
         instance=post
     )
     if form.is_valid():
-        form.save()
+        image_changed = 'image' in form.changed_data
+        if image_changed:
+            post.thumbnail = ''
+            post.image_variants = ''
+        with transaction.atomic():
+            form.save()
+            if image_changed:
+                thumbnails.enqueue(post)
         return redirect('post',
                         username=post.author,
                         post_id=post_id
@@ -134,7 +215,8 @@ def add_comment(request, username, post_id):
         new_comment = form.save(commit=False)
         new_comment.author = request.user
         new_comment.post = post
-        new_comment.save()
+        with transaction.atomic():
+            new_comment.save()
     return redirect('post', username=username, post_id=post_id)
 
 
@@ -146,26 +228,56 @@ def delete_comment(request, username, post_id, comment_id):
     return redirect('post', username=username, post_id=post_id)
 
 
+@read_only
 @login_required
 def follow_index(request):
-    post_list = Post.objects.annotate_liked(request.user).filter(
-        author__following__user=request.user
+    post_list = Post.objects.annotate_liked(request.user).select_related(
+        'author', 'group'
     )
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
+    page = paginate(request, feed.feed_keys(request.user),
+                    ordering=feed.ORDERING,
+                    load=lambda rows: feed.load_posts(rows, post_list))
+    cards.prefetch(page)
+    likes.overlay(request.user, page)
     context = {'page': page,
-               'paginator': paginator}
+               'paginator': page.paginator}
     return render(request, 'follow.html', context)
 
 
+@read_only
+def search_view(request):
+    query = request.GET.get('q', '').strip()
+    found_groups = []
+    post_list = Post.objects.none()
+    if query:
+        found_groups = search.search_groups(query)[:5]
+        post_list = search.search_posts(
+            query,
+            Post.objects.annotate_liked(request.user).select_related(
+                'author', 'group'
+            )
+        )
+    # Результаты упорядочены по релевантности, поэтому курсор по дате не
+    # подходит: листаем пронумерованными страницами.
+    paginator = Paginator(post_list, settings.POSTS_PER_PAGE)
+    page = paginator.get_page(request.GET.get('page'))
+    cards.prefetch(page)
+    likes.overlay(request.user, page)
+    context = {'query': query,
+               'groups': found_groups,
+               'page': page,
+               'paginator': paginator}
+    return render(request, 'search.html', context)
+
+
 @login_required
 def profile_follow(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
     follow_check = Follow.objects.filter(user=user, author=author).exists()
     if not follow_check and author != user:
-        Follow.objects.create(user=request.user, author=author)
+        with transaction.atomic():
+            Follow.objects.create(user=request.user, author=author)
     return redirect('profile', username=username)
 
 
@@ -191,17 +303,54 @@ def page_not_found(request, exception):
 
 @login_required
 def add_like(request, username, post_id):
-    post = get_object_or_404(Post, id=post_id, author__username=username)
-    Like.objects.get_or_create(post=post, user=request.user)
+    likes.apply(request.user, {post_id: True})
     return HttpResponseRedirect(request.META.get('HTTP_REFERER', '/'))
 
 
 @login_required
 def delete_like(request, username, post_id):
-    post = get_object_or_404(Post, id=post_id, author__username=username)
-    post.likes.filter(user=request.user).delete()
+    likes.apply(request.user, {post_id: False})
     return HttpResponseRedirect(request.META.get('HTTP_REFERER', '/'))
 
 
+def _like_states(states):
+    return {
+        'posts': {
+            str(pk): {'liked': liked, 'likes_count': count}
+            for pk, (liked, count) in states.items()
+        }
+    }
+
+
+@ensure_csrf_cookie
+@require_http_methods(['GET', 'POST'])
+def likes_api(request):
+    """GET ?posts=1,2 — состояние лайков; POST {"toggles": [{"post": 1,
+    "like": true}, ...]} — лайки и отмены пачкой."""
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Нужно войти'}, status=401)
+    try:
+        if request.method == 'GET':
+            post_ids = {int(pk) for pk in
+                        request.GET.get('posts', '').split(',') if pk}
+            changes = None
+        else:
+            toggles = json.loads(request.body)['toggles']
+            changes = {int(toggle['post']): bool(toggle['like'])
+                       for toggle in toggles}
+            post_ids = set(changes)
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Неверный запрос'}, status=400)
+    if len(post_ids) > settings.LIKES_BATCH_LIMIT:
+        return JsonResponse(
+            {'error': f'Не больше {settings.LIKES_BATCH_LIMIT} постов'},
+            status=400
+        )
+    if changes is None:
+        return JsonResponse(_like_states(likes.states(request.user,
+                                                      post_ids)))
+    return JsonResponse(_like_states(likes.apply(request.user, changes)))
+
+
 def server_error(request):
     return render(request, 'misc/500.html', status=500)
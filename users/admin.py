@@ -1,3 +1,14 @@
 from django.contrib import admin
+from .models import OutboundEmail
 
-# Register your models here.
+
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'subject', 'recipients', 'status', 'attempts',
+                    'next_attempt', 'sent')
+    search_fields = ('subject', 'recipients')
+    list_filter = ('status',)
+    exclude = ('message',)
+    empty_value_display = '-пусто-'
+
+
+admin.site.register(OutboundEmail, OutboundEmailAdmin)
@@ -3,3 +3,10 @@ from django.apps import AppConfig
 
 class UsersConfig(AppConfig):
     name = 'users'
+
+    def ready(self):
+        from . import mail
+        from yatube.metrics import registry
+        registry.gauge('yatube_mail_queue_depth',
+                       'Письма, ожидающие отправки', mail.depth,
+                       scope='scrape')
@@ -0,0 +1,214 @@
+"""Очередь исходящей почты.
+
+QueuedEmailBackend (EMAIL_BACKEND) не ходит в SMTP во время запроса: он
+сохраняет готовые письма в OutboundEmail и будит фоновый поток. Поток
+(раз в MAIL_QUEUE_INTERVAL секунд или сразу после постановки письма) и
+команда send_queued_mail отправляют накопившиеся письма пачками по
+MAIL_QUEUE_BATCH_SIZE через одно соединение MAIL_DELIVERY_BACKEND
+(SMTP, а для отладки console или filebased), не быстрее MAIL_RATE_LIMIT
+писем в минуту. Лимит действует в каждом процессе отдельно: при нескольких
+воркерах общая скорость во столько же раз выше. Неудачная отправка
+повторяется с экспоненциальной задержкой, после MAIL_MAX_ATTEMPTS попыток
+письмо помечается неотправленным. Если соединение не открывается заново
+после ошибки, остаток пачки тоже откладывается. Отправлять могут
+несколько процессов сразу: каждое письмо перед отправкой захватывается
+условным UPDATE в базе, а письмо упавшего отправителя возвращается в
+работу через CLAIM_TIMEOUT.
+"""
+import email.message
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.mail.message import MIMEMixin
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+# Дольше отправки целой пачки с учетом MAIL_RATE_LIMIT
+CLAIM_TIMEOUT = timedelta(minutes=5)
+PENDING = (OutboundEmail.QUEUED, OutboundEmail.SENDING)
+
+logger = logging.getLogger(__name__)
+
+_wakeup = threading.Event()
+_sender = None
+_sender_lock = threading.Lock()
+_last_sent = 0.0
+
+
+class StoredMIME(MIMEMixin, email.message.Message):
+    """Разобранное письмо из очереди; as_bytes принимает linesep, как
+    того ждет SMTP-бэкенд Django."""
+
+
+class StoredMessage:
+    """Письмо из очереди с тем интерфейсом EmailMessage, который нужен
+    бэкендам Django для отправки."""
+
+    encoding = None
+
+    def __init__(self, outbound):
+        self.outbound = outbound
+        self.from_email = outbound.from_email
+
+    def recipients(self):
+        return [address for address in self.outbound.recipients.split('\n')
+                if address]
+
+    def message(self):
+        return email.message_from_bytes(bytes(self.outbound.message),
+                                        _class=StoredMIME)
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        now = timezone.now()
+        queued = [
+            OutboundEmail(
+                from_email=message.from_email or '',
+                recipients='\n'.join(message.recipients()),
+                subject=str(message.subject)[:255],
+                message=message.message().as_bytes(),
+                next_attempt=now,
+            )
+            for message in email_messages if message.recipients()
+        ]
+        if queued:
+            OutboundEmail.objects.bulk_create(queued)
+            transaction.on_commit(wake)
+        return len(queued)
+
+
+def backoff(attempts):
+    delay = settings.MAIL_RETRY_BACKOFF * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, settings.MAIL_RETRY_MAX_DELAY))
+
+
+def depth():
+    """Сколько писем ждет отправки."""
+    return OutboundEmail.objects.filter(status__in=PENDING).count()
+
+
+def _throttle():
+    """Выдерживает паузу между письмами этого процесса по
+    MAIL_RATE_LIMIT."""
+    global _last_sent
+    spacing = 60 / settings.MAIL_RATE_LIMIT
+    delay = _last_sent + spacing - time.monotonic()
+    if delay > 0:
+        time.sleep(delay)
+    _last_sent = time.monotonic()
+
+
+def _deliver(connection, outbound):
+    _throttle()
+    if not connection.send_messages([StoredMessage(outbound)]):
+        raise RuntimeError('бэкенд не отправил письмо')
+
+
+def _claim(limit):
+    """Захватывает письма, срок которых подошел. Письмо в статусе SENDING
+    со сроком в прошлом осталось от упавшего отправителя."""
+    now = timezone.now()
+    due = OutboundEmail.objects.filter(status__in=PENDING,
+                                       next_attempt__lte=now)
+    claimed = [
+        pk for pk in due.values_list('pk', flat=True)[:limit]
+        if due.filter(pk=pk).update(status=OutboundEmail.SENDING,
+                                    next_attempt=now + CLAIM_TIMEOUT)
+    ]
+    return list(OutboundEmail.objects.filter(pk__in=claimed))
+
+
+def _open(connection, pending):
+    """Открывает соединение. Если сервер недоступен, письма pending ждут
+    следующей попытки, и возвращается False."""
+    try:
+        connection.open()
+    except Exception as error:
+        for outbound in pending:
+            _failed(outbound, error)
+        return False
+    return True
+
+
+def send_queued(limit=None):
+    """Отправляет письма, срок которых подошел; возвращает
+    (отправлено, ошибок)."""
+    due = _claim(limit or settings.MAIL_QUEUE_BATCH_SIZE)
+    if not due:
+        return 0, 0
+    sent = failed = 0
+    connection = get_connection(settings.MAIL_DELIVERY_BACKEND,
+                                fail_silently=False)
+    if not _open(connection, due):
+        return 0, len(due)
+    try:
+        for index, outbound in enumerate(due):
+            try:
+                _deliver(connection, outbound)
+            except Exception as error:
+                _failed(outbound, error)
+                failed += 1
+                # После ошибки SMTP соединение может быть разорвано.
+                connection.close()
+                rest = due[index + 1:]
+                if not _open(connection, rest):
+                    return sent, failed + len(rest)
+                continue
+            outbound.status = OutboundEmail.SENT
+            outbound.sent = timezone.now()
+            outbound.attempts += 1
+            outbound.last_error = ''
+            outbound.save(update_fields=['status', 'sent', 'attempts',
+                                         'last_error'])
+            sent += 1
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def _failed(outbound, error):
+    outbound.attempts += 1
+    outbound.last_error = f'{type(error).__name__}: {error}'
+    if outbound.attempts >= settings.MAIL_MAX_ATTEMPTS:
+        outbound.status = OutboundEmail.FAILED
+        logger.error('Письмо %s не отправлено: %s', outbound.pk,
+                     outbound.last_error)
+    else:
+        outbound.status = OutboundEmail.QUEUED
+        outbound.next_attempt = timezone.now() + backoff(outbound.attempts)
+    outbound.save(update_fields=['attempts', 'last_error', 'status',
+                                 'next_attempt'])
+
+
+def _run_sender():
+    while True:
+        _wakeup.wait(settings.MAIL_QUEUE_INTERVAL)
+        _wakeup.clear()
+        try:
+            while send_queued()[0]:
+                pass
+        except Exception:
+            logger.exception('Не удалось отправить письма из очереди')
+        finally:
+            close_old_connections()
+
+
+def wake():
+    """Запускает фоновую отправку в этом процессе (один раз) и будит ее."""
+    global _sender
+    if not settings.MAIL_QUEUE_INTERVAL:
+        return
+    with _sender_lock:
+        if _sender is None:
+            _sender = threading.Thread(target=_run_sender, name='mail-queue',
+                                       daemon=True)
+            _sender.start()
+    _wakeup.set()
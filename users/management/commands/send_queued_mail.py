@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from users import mail
+
+
+class Command(BaseCommand):
+    help = 'Отправляет письма из очереди исходящей почты'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=None,
+            help='Повторять отправку с этим интервалом в секундах'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            total_sent = total_failed = 0
+            sent = True
+            while sent:
+                sent, failed = mail.send_queued()
+                total_sent += sent
+                total_failed += failed
+            self.stdout.write(f'Отправлено: {total_sent}, '
+                              f'ошибок: {total_failed}')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
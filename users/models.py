@@ -1 +1,72 @@
 from django.db import models
+
+
+class OutboundEmail(models.Model):
+    QUEUED = 'queued'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'В очереди'),
+        (SENDING, 'Отправляется'),
+        (SENT, 'Отправлено'),
+        (FAILED, 'Не отправлено'),
+    )
+
+    from_email = models.CharField(
+        max_length=254,
+        blank=True,
+        verbose_name='Отправитель'
+    )
+    recipients = models.TextField(
+        verbose_name='Получатели',
+        help_text='Адреса через перевод строки, включая копии'
+    )
+    subject = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name='Тема'
+    )
+    message = models.BinaryField(
+        verbose_name='Письмо',
+        help_text='Готовое MIME-сообщение'
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=QUEUED,
+        verbose_name='Статус'
+    )
+    attempts = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Попыток отправки'
+    )
+    next_attempt = models.DateTimeField(
+        verbose_name='Следующая попытка'
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name='Последняя ошибка'
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Поставлено в очередь'
+    )
+    sent = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Отправлено'
+    )
+
+    class Meta:
+        verbose_name = 'Исходящее письмо'
+        verbose_name_plural = 'Исходящие письма'
+        ordering = ('id', )
+        indexes = [
+            models.Index(fields=['status', 'next_attempt'],
+                         name='outbound_email_due_idx'),
+        ]
+
+    def __str__(self):
+        recipient = self.recipients.partition('\n')[0]
+        return f'{self.subject} → {recipient}'
@@ -0,0 +1,174 @@
+import socketserver
+import threading
+from datetime import timedelta
+from io import StringIO
+from smtplib import SMTPException
+
+from django.contrib.auth import get_user_model
+from django.core import mail as outbox
+from django.core.cache import cache
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from users import mail
+from users.models import OutboundEmail
+
+
+class FailingBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise SMTPException('сервер недоступен')
+
+
+class DroppingBackend(BaseEmailBackend):
+    """Теряет соединение на первом письме и не может открыть его снова."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.opened = False
+
+    def open(self):
+        if self.opened:
+            raise ConnectionRefusedError('сервер недоступен')
+        self.opened = True
+
+    def send_messages(self, email_messages):
+        raise SMTPException('соединение разорвано')
+
+
+class SMTPStub(socketserver.StreamRequestHandler):
+    """Минимальный SMTP-сервер: принимает письма и складывает их тела
+    в server.messages."""
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        self.reply('220 stub')
+        for line in self.rfile:
+            command = line[:4].upper()
+            if command == b'DATA':
+                self.reply('354 go on')
+                data = b''
+                for line in self.rfile:
+                    if line == b'.\r\n':
+                        break
+                    data += line
+                self.server.messages.append(data)
+                self.reply('250 queued')
+            elif command == b'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('250 ok')
+
+
+@override_settings(
+    EMAIL_BACKEND='users.mail.QueuedEmailBackend',
+    DEFAULT_FROM_EMAIL='yatube@example.com',
+    MAIL_DELIVERY_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    MAIL_QUEUE_INTERVAL=0, MAIL_RATE_LIMIT=60000, MAIL_MAX_ATTEMPTS=3,
+    MAIL_RETRY_BACKOFF=30, MAIL_RETRY_MAX_DELAY=60,
+)
+class MailQueueTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        get_user_model().objects.create_user(username='reader',
+                                             email='reader@example.com',
+                                             password='password')
+
+    def reset_password(self):
+        response = self.client.post(reverse('password_reset'),
+                                    {'email': 'reader@example.com'})
+        self.assertEqual(response.status_code, 302)
+
+    def test_password_reset_is_queued(self):
+        """Сброс пароля ставит письмо в очередь, а отправляет его
+        send_queued_mail."""
+        self.reset_password()
+        self.assertEqual(len(outbox.outbox), 0)
+        self.assertEqual(mail.depth(), 1)
+        out = StringIO()
+        call_command('send_queued_mail', stdout=out)
+        self.assertIn('Отправлено: 1, ошибок: 0', out.getvalue())
+        self.assertEqual(len(outbox.outbox), 1)
+        self.assertEqual(outbox.outbox[0].recipients(),
+                         ['reader@example.com'])
+        self.assertIn('reset', outbox.outbox[0].message().as_string())
+        self.assertEqual(OutboundEmail.objects.get().status,
+                         OutboundEmail.SENT)
+        self.assertEqual(mail.depth(), 0)
+
+    @override_settings(MAIL_DELIVERY_BACKEND='users.tests.test_mail.'
+                                             'FailingBackend')
+    def test_retry_with_backoff(self):
+        """Ошибка откладывает письмо с растущей задержкой, а после
+        MAIL_MAX_ATTEMPTS попыток оно помечается неотправленным."""
+        self.reset_password()
+        delays = []
+        with self.assertLogs('users.mail', 'ERROR'):
+            for _ in range(3):
+                started = timezone.now()
+                self.assertEqual(mail.send_queued(), (0, 1))
+                queued = OutboundEmail.objects.get()
+                delays.append(round((queued.next_attempt - started)
+                                    .total_seconds()))
+                # Письмо еще не созрело для повтора.
+                self.assertEqual(mail.send_queued(), (0, 0))
+                OutboundEmail.objects.update(
+                    next_attempt=timezone.now() - timedelta(seconds=1)
+                )
+        self.assertEqual(delays[:2], [30, 60])
+        self.assertEqual(queued.status, OutboundEmail.FAILED)
+        self.assertIn('SMTPException', queued.last_error)
+
+    @override_settings(MAIL_DELIVERY_BACKEND='users.tests.test_mail.'
+                                             'DroppingBackend')
+    def test_reconnect_failure_requeues_rest(self):
+        """Если соединение не открывается после ошибки, остаток пачки
+        возвращается в очередь, а не остается захваченным."""
+        self.reset_password()
+        self.reset_password()
+        self.assertEqual(mail.send_queued(), (0, 2))
+        self.assertEqual(
+            list(OutboundEmail.objects.values_list('status', 'attempts')),
+            [(OutboundEmail.QUEUED, 1)] * 2
+        )
+        self.assertIn('ConnectionRefusedError',
+                      OutboundEmail.objects.order_by('pk').last().last_error)
+
+    def test_delivery_over_smtp(self):
+        """Письмо из очереди уходит через настоящий SMTP-бэкенд."""
+        server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), SMTPStub)
+        server.messages = []
+        self.addCleanup(server.server_close)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.shutdown)
+        self.reset_password()
+        with self.settings(
+            MAIL_DELIVERY_BACKEND='django.core.mail.backends.smtp.'
+                                  'EmailBackend',
+            EMAIL_HOST='127.0.0.1', EMAIL_PORT=server.server_address[1],
+            EMAIL_USE_TLS=False, EMAIL_HOST_USER='',
+        ):
+            self.assertEqual(mail.send_queued(), (1, 0))
+        self.assertEqual(OutboundEmail.objects.get().status,
+                         OutboundEmail.SENT)
+        self.assertEqual(len(server.messages), 1)
+        self.assertIn(b'To: reader@example.com\r\n', server.messages[0])
+
+    def test_claimed_mail_is_sent_once(self):
+        """Письмо, захваченное другим отправителем, не отправляется
+        повторно, пока не истечет CLAIM_TIMEOUT."""
+        self.reset_password()
+        self.assertEqual(len(mail._claim(10)), 1)
+        self.assertEqual(mail._claim(10), [])
+        self.assertEqual(mail.send_queued(), (0, 0))
+        self.assertEqual(mail.depth(), 1)
+        OutboundEmail.objects.update(
+            next_attempt=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual(mail.send_queued(), (1, 0))
+        self.assertEqual(len(outbox.outbox), 1)
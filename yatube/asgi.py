@@ -0,0 +1,172 @@
+"""ASGI-вход для uvicorn (gunicorn -k uvicorn.workers.UvicornH11Worker).
+
+В Django 2.2 нет ни ASGI, ни асинхронных представлений, поэтому
+WsgiToAsgi запускает обычное WSGI-приложение так: тело запроса
+дочитывается в цикле событий, затем Django обрабатывает запрос в пуле из
+ASGI_THREADS потоков, а части ответа по мере создания передаются через
+очередь в цикл событий и отдаются клиенту оттуда. Медленный клиент
+занимает только корутину, а поток с соединением к базе освобождается
+сразу после рендеринга; ждать клиента поток будет, только если потоковый
+ответ обгонит его больше чем на STREAM_BUFFER частей. Запросы сверх
+размера пула ждут в очереди, не открывая новых соединений с базой.
+"""
+import asyncio
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from yatube.wsgi import application as wsgi_application
+
+# Частей ответа в очереди между потоком пула и циклом событий
+STREAM_BUFFER = 16
+
+
+class WsgiToAsgi:
+    def __init__(self, wsgi_application, threads):
+        self.wsgi_application = wsgi_application
+        self.executor = ThreadPoolExecutor(threads,
+                                           thread_name_prefix='asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+        else:
+            raise ValueError(f'Неподдерживаемый тип ASGI: {scope["type"]}')
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read_body(self, receive):
+        """Тело запроса или None, если клиент отключился."""
+        body = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body'):
+                body.seek(0)
+                return body
+
+    async def http(self, scope, receive, send):
+        body = await self.read_body(receive)
+        if body is None:
+            return
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(STREAM_BUFFER)
+
+        def emit(message):
+            asyncio.run_coroutine_threadsafe(queue.put(message), loop).result()
+
+        done = loop.run_in_executor(
+            self.executor, self.run_wsgi, environ(scope, body), emit
+        )
+        finished = False
+        try:
+            while not finished:
+                message = await queue.get()
+                finished = message is None
+                if not finished:
+                    await send(message)
+        finally:
+            # Если отправка оборвалась, дочитываем очередь, чтобы поток не
+            # ждал в ней места вечно.
+            while not finished:
+                finished = await queue.get() is None
+            try:
+                await done
+            finally:
+                body.close()
+
+    def run_wsgi(self, environ, emit):
+        """Выполняет запрос в потоке пула и передает сообщения ASGI через
+        emit, а в конце — None. close() ответа шлет request_finished, и
+        соединение с базой закрывается или возвращается в пул здесь же."""
+        response = {}
+        started = False
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = status
+            response['headers'] = headers
+
+        def start():
+            # Заголовки уходят перед первой частью тела: приложение-генератор
+            # может вызвать start_response только на первой итерации.
+            nonlocal started
+            if not started:
+                started = True
+                emit({
+                    'type': 'http.response.start',
+                    'status': int(response['status'].split(' ', 1)[0]),
+                    'headers': [(name.lower().encode('latin-1'),
+                                 value.encode('latin-1'))
+                                for name, value in response['headers']],
+                })
+
+        try:
+            result = self.wsgi_application(environ, start_response)
+            try:
+                for chunk in result:
+                    if chunk:
+                        start()
+                        emit({'type': 'http.response.body', 'body': chunk,
+                              'more_body': True})
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+            start()
+            emit({'type': 'http.response.body', 'body': b''})
+        finally:
+            emit(None)
+
+
+def environ(scope, body):
+    """WSGI-окружение для ASGI-запроса."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    result = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        # WSGI передает путь байтами, упакованными в latin-1.
+        'PATH_INFO': scope['path'].encode().decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f'HTTP_{name}'
+        value = value.decode('latin-1')
+        if name in result:
+            separator = '; ' if name == 'HTTP_COOKIE' else ','
+            value = f'{result[name]}{separator}{value}'
+        result[name] = value
+    return result
+
+
+application = WsgiToAsgi(wsgi_application, settings.ASGI_THREADS)
@@ -0,0 +1,166 @@
+"""Статика: имена с хэшем содержимого, сжатые копии и раздача из WSGI.
+
+CompressedManifestStorage (STATICFILES_STORAGE) при collectstatic
+кладет рядом с каждым файлом копию с хэшем в имени, а для текстовых
+файлов еще .gz и, если установлен brotli, .br. Тег {% static %} отдает
+имя с хэшем, поэтому такой адрес никогда не меняет содержимое и может
+кэшироваться браузером навсегда. Файлы, которых нет в манифесте
+(collectstatic еще не запускали), отдаются под исходным именем.
+
+StaticFiles — WSGI-обертка для запуска без фронтового прокси
+(STATIC_SERVE): один раз при старте читает STATIC_ROOT и отдает файлы
+до Django, выбирая сжатую копию по Accept-Encoding. Адреса с хэшем
+отдаются с Cache-Control immutable на год, остальные — на
+STATIC_MAX_AGE секунд; повторные запросы с ETag или If-Modified-Since
+получают 304.
+"""
+import gzip
+import json
+import mimetypes
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from wsgiref.util import FileWrapper
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = ('.css', '.js', '.svg', '.map', '.json', '.txt', '.xml',
+                '.html', '.ttf', '.otf', '.eot', '.ico')
+# Сжатая копия сохраняется, только если она заметно меньше исходной
+MIN_RATIO = 0.95
+IMMUTABLE = 'public, max-age=31536000, immutable'
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+class CompressedManifestStorage(ManifestStaticFilesStorage):
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # Файла нет в манифесте: без collectstatic в STATIC_ROOT может
+            # лежать устаревшая копия, поэтому хэш по ней не считается.
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        # CSS обрабатывается в несколько проходов, и каждый проход
+        # возвращает файл заново.
+        compressed = set()
+        for name, hashed_name, processed in super().post_process(
+            paths, dry_run, **options
+        ):
+            if (hashed_name and not dry_run and hashed_name not in compressed
+                    and not isinstance(processed, Exception)):
+                self.compress(hashed_name)
+                compressed.add(hashed_name)
+            yield name, hashed_name, processed
+
+    def compress(self, name):
+        if not name.endswith(COMPRESSIBLE):
+            return
+        with self.open(name) as file:
+            content = file.read()
+        variants = [('.gz', gzip.compress(content, 9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(content)))
+        for suffix, compressed in variants:
+            if len(compressed) < len(content) * MIN_RATIO:
+                with open(self.path(name + suffix), 'wb') as file:
+                    file.write(compressed)
+
+
+class StaticFile:
+    def __init__(self, path, immutable, max_age):
+        stat = os.stat(path)
+        content_type, _ = mimetypes.guess_type(path)
+        self.variants = {None: (path, stat.st_size)}
+        for encoding, suffix in ENCODINGS:
+            if os.path.exists(path + suffix):
+                self.variants[encoding] = (path + suffix,
+                                           os.path.getsize(path + suffix))
+        self.modified = int(stat.st_mtime)
+        self.etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+        self.headers = [
+            ('Content-Type', content_type or 'application/octet-stream'),
+            ('Cache-Control', IMMUTABLE if immutable
+             else f'public, max-age={max_age}'),
+            ('ETag', self.etag),
+            ('Last-Modified', formatdate(self.modified, usegmt=True)),
+        ]
+        if len(self.variants) > 1:
+            self.headers.append(('Vary', 'Accept-Encoding'))
+
+    def not_modified(self, environ):
+        etags = environ.get('HTTP_IF_NONE_MATCH')
+        if etags is not None:
+            return etags.strip() == '*' or self.etag in (
+                tag.strip() for tag in etags.split(',')
+            )
+        since = environ.get('HTTP_IF_MODIFIED_SINCE')
+        if since:
+            try:
+                return parsedate_to_datetime(since).timestamp() \
+                    >= self.modified
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def variant(self, environ):
+        accepted = {}
+        for item in environ.get('HTTP_ACCEPT_ENCODING', '').split(','):
+            encoding, _, params = item.strip().partition(';')
+            accepted[encoding.strip()] = params.replace(' ', '') != 'q=0'
+        for encoding, _ in ENCODINGS:
+            if encoding in self.variants and accepted.get(encoding):
+                return encoding
+        return None
+
+
+class StaticFiles:
+    def __init__(self, application, root, prefix, max_age=60):
+        self.application = application
+        self.prefix = prefix
+        self.files = {}
+        if root and os.path.isdir(root):
+            self.scan(root, max_age)
+
+    def scan(self, root, max_age):
+        hashed = set()
+        manifest = os.path.join(root, 'staticfiles.json')
+        if os.path.exists(manifest):
+            with open(manifest) as file:
+                hashed = set(json.load(file).get('paths', {}).values())
+        for directory, _, names in os.walk(root):
+            for name in names:
+                if name.endswith(('.gz', '.br')):
+                    continue
+                path = os.path.join(directory, name)
+                relative = os.path.relpath(path, root).replace(os.sep, '/')
+                self.files[self.prefix + relative] = StaticFile(
+                    path, relative in hashed, max_age
+                )
+
+    def __call__(self, environ, start_response):
+        static = self.files.get(environ.get('PATH_INFO', ''))
+        if static is None:
+            return self.application(environ, start_response)
+        if environ['REQUEST_METHOD'] not in ('GET', 'HEAD'):
+            start_response('405 Method Not Allowed',
+                           [('Allow', 'GET, HEAD')])
+            return []
+        if static.not_modified(environ):
+            start_response('304 Not Modified', static.headers[1:])
+            return []
+        encoding = static.variant(environ)
+        path, size = static.variants[encoding]
+        headers = static.headers + [('Content-Length', str(size))]
+        if encoding:
+            headers.append(('Content-Encoding', encoding))
+        start_response('200 OK', headers)
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return []
+        wrapper = environ.get('wsgi.file_wrapper', FileWrapper)
+        return wrapper(open(path, 'rb'), 64 * 1024)
@@ -0,0 +1,405 @@
+import logging
+import os
+import pickle
+import socket
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+logger = logging.getLogger(__name__)
+# Сколько секунд после ошибки соединения не обращаться к серверу
+RETRY_AFTER = 5
+# INCRBY создал бы отсутствующий ключ, а Django ждет ValueError; проверка
+# и увеличение в одном скрипте атомарны.
+INCR_SCRIPT = ("if redis.call('EXISTS', KEYS[1]) == 1 then "
+               "return redis.call('INCRBY', KEYS[1], ARGV[1]) end")
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisConnection:
+    """Минимальный клиент протокола RESP (Redis, KeyDB, Dragonfly)."""
+
+    def __init__(self, host, port, db=0, password=None, timeout=1.0):
+        self.address = (host, int(port))
+        self.db = int(db)
+        self.password = password
+        self.timeout = float(timeout)
+        self.sock = None
+        self.reader = None
+
+    def connect(self):
+        self.sock = socket.create_connection(self.address, self.timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile('rb')
+        if self.password:
+            self._call(('AUTH', self.password))
+        if self.db:
+            self._call(('SELECT', self.db))
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.reader.close()
+                self.sock.close()
+            except OSError:
+                pass
+        self.sock = None
+        self.reader = None
+
+    @staticmethod
+    def _encode(args):
+        chunks = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            if isinstance(arg, bytes):
+                data = arg
+            else:
+                data = str(arg).encode()
+            chunks.append(b'$%d\r\n%s\r\n' % (len(data), data))
+        return b''.join(chunks)
+
+    def _read_reply(self):
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError('Соединение с кэшем закрыто')
+        kind, payload = line[:1], line[1:-2]
+        if kind == b'+':
+            return payload.decode()
+        if kind == b'-':
+            raise RedisError(payload.decode())
+        if kind == b':':
+            return int(payload)
+        if kind == b'$':
+            length = int(payload)
+            if length == -1:
+                return None
+            data = self.reader.read(length + 2)
+            return data[:-2]
+        if kind == b'*':
+            length = int(payload)
+            if length == -1:
+                return None
+            return [self._read_reply() for _ in range(length)]
+        raise RedisError(f'Непонятный ответ: {line!r}')
+
+    def _call(self, *commands):
+        self.sock.sendall(b''.join(self._encode(args) for args in commands))
+        return [self._read_reply() for _ in commands]
+
+    def pipeline(self, *commands):
+        if self.sock is None:
+            self.connect()
+        try:
+            return self._call(*commands)
+        except (ConnectionError, OSError):
+            # Одна попытка переподключения: сервер мог закрыть простаивающее
+            # соединение.
+            self.close()
+            self.connect()
+            return self._call(*commands)
+
+    def execute(self, *args):
+        return self.pipeline(args)[0]
+
+
+class RedisCache(BaseCache):
+    def __init__(self, server, params):
+        super().__init__(params)
+        host, _, port = server.partition(':')
+        options = params.get('OPTIONS', {})
+        self._connection_args = {
+            'host': host or '127.0.0.1',
+            'port': port or 6379,
+            'db': options.get('DB', 0),
+            'password': options.get('PASSWORD'),
+            'timeout': options.get('SOCKET_TIMEOUT', 1.0),
+        }
+        self._local = threading.local()
+        self._down_until = 0
+
+    @property
+    def connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = RedisConnection(**self._connection_args)
+            self._local.connection = connection
+        return connection
+
+    def _call(self, *commands):
+        """Ответы на команды, отправленные одним обменом, или None, если
+        сервер недоступен: кэш не должен ронять запрос, поэтому чтение
+        становится промахом, а запись пропускается. Следующие RETRY_AFTER
+        секунд сервер не ждем."""
+        if time.monotonic() < self._down_until:
+            return None
+        try:
+            return self.connection.pipeline(*commands)
+        except (ConnectionError, OSError) as error:
+            # Недочитанные ответы сбили бы следующий обмен.
+            self.connection.close()
+            self._down_until = time.monotonic() + RETRY_AFTER
+            logger.warning('Кэш недоступен, команды пропускаются: %s',
+                           error)
+            return None
+
+    def _execute(self, *args):
+        replies = self._call(args)
+        return None if replies is None else replies[0]
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    @staticmethod
+    def _dumps(value):
+        # Целые числа храним строкой, чтобы работал атомарный INCRBY.
+        if isinstance(value, int) and not isinstance(value, bool):
+            return str(value).encode()
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _loads(data):
+        if data.startswith(b'\x80'):
+            return pickle.loads(data)
+        return int(data)
+
+    def _expiry_args(self, timeout):
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return ()
+        return ('PX', max(int(timeout * 1000), 1))
+
+    def _set_command(self, key, value, timeout, *flags):
+        return ('SET', key, self._dumps(value),
+                *self._expiry_args(timeout), *flags)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        return self._execute(
+            *self._set_command(key, value, timeout, 'NX')
+        ) is not None
+
+    def get(self, key, default=None, version=None):
+        data = self._execute('GET', self._key(key, version))
+        return default if data is None else self._loads(data)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        self._execute(*self._set_command(key, value, timeout))
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        expiry = self._expiry_args(timeout)
+        if expiry:
+            return bool(self._execute('PEXPIRE', key, expiry[1]))
+        replies = self._call(('PERSIST', key), ('EXISTS', key))
+        return bool(replies and replies[1])
+
+    def delete(self, key, version=None):
+        self._execute('DEL', self._key(key, version))
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        if not keys:
+            return {}
+        made = [self._key(key, version) for key in keys]
+        values = self._execute('MGET', *made)
+        if values is None:
+            return {}
+        return {
+            key: self._loads(data)
+            for key, data in zip(keys, values)
+            if data is not None
+        }
+
+    def has_key(self, key, version=None):
+        return bool(self._execute('EXISTS', self._key(key, version)))
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        value = self._execute('EVAL', INCR_SCRIPT, 1, key, delta)
+        if value is None:
+            raise ValueError(f"Key '{key}' not found")
+        return value
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        if data:
+            self._call(*(
+                self._set_command(self._key(key, version), value, timeout)
+                for key, value in data.items()
+            ))
+        return []
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            self._execute('DEL', *keys)
+
+    def clear(self):
+        self._execute('FLUSHDB')
+
+    def close(self, **kwargs):
+        # Соединение живет в потоке и переиспользуется между запросами.
+        pass
+
+
+class FakeRedisCache(RedisCache):
+    """RedisCache, подключенный к встроенному серверу из fake.py."""
+
+    def __init__(self, server, params):
+        from .fake import shared_server
+        host, port = shared_server().server_address
+        super().__init__(f'{host}:{port}', params)
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в файле SQLite: общий для всех воркеров одного сервера."""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = location or 'yatube_cache.sqlite3'
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        with self.connection as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)'
+            )
+
+    @property
+    def connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5,
+                                         isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _expires(self, timeout):
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        return None if timeout is None else time.time() + timeout
+
+    def _write(self, sql, key, value, timeout):
+        expires = self._expires(timeout)
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            if expires is not None and expires <= time.time():
+                connection.execute('DELETE FROM cache WHERE key = ?', (key,))
+                changed = False
+            else:
+                connection.execute(
+                    'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                    (key, time.time())
+                )
+                changed = connection.execute(sql, (
+                    key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                    expires
+                )).rowcount > 0
+            self._cull(connection)
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        return changed
+
+    def _cull(self, connection):
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        connection.execute('DELETE FROM cache WHERE expires <= ?',
+                           (time.time(),))
+        if self._cull_frequency:
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY expires LIMIT ?)',
+                (count // self._cull_frequency,)
+            )
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._write(
+            'INSERT OR IGNORE INTO cache (key, value, expires) '
+            'VALUES (?, ?, ?)',
+            self._key(key, version), value, timeout
+        )
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._write(
+            'INSERT OR REPLACE INTO cache (key, value, expires) '
+            'VALUES (?, ?, ?)',
+            self._key(key, version), value, timeout
+        )
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        placeholders = ', '.join('?' * len(keys))
+        rows = self.connection.execute(
+            f'SELECT key, value FROM cache WHERE key IN ({placeholders}) '
+            f'AND (expires IS NULL OR expires > ?)',
+            (*keys, time.time())
+        )
+        return {keys[key]: pickle.loads(value) for key, value in rows}
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.connection.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self._expires(timeout), self._key(key, version), time.time())
+        ).rowcount > 0
+
+    def delete(self, key, version=None):
+        self.connection.execute('DELETE FROM cache WHERE key = ?',
+                                (self._key(key, version),))
+
+    def has_key(self, key, version=None):
+        return key in self.get_many([key], version=version)
+
+    def incr(self, key, delta=1, version=None):
+        made = self._key(key, version)
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT value FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (made, time.time())
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (pickle.dumps(value, pickle.HIGHEST_PROTOCOL), made)
+            )
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        return value
+
+    def clear(self):
+        self.connection.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        pass
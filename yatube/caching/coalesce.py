@@ -0,0 +1,161 @@
+"""Защита горячих ключей кэша от лавинной перегенерации.
+
+get_or_set_coalesced объединяет одновременные промахи по одному ключу
+(single-flight): внутри процесса ждут одного вычисления, между процессами
+договариваются через блокировку cache.add. Кроме того, значение
+пересчитывается заранее с вероятностью, растущей к концу срока жизни
+(XFetch), поэтому ключ обычно обновляется до того, как истечет.
+"""
+import hashlib
+import math
+import pickle
+import random
+import threading
+import time
+from functools import wraps
+
+from django.core.cache import caches
+from django.utils.cache import patch_response_headers
+
+LOCK_SUFFIX = ':lock'
+POLL_INTERVAL = 0.05
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.followers = 0
+        self.value = None
+        self.error = None
+
+
+def _single_flight(key, func):
+    with _inflight_lock:
+        flight = _inflight.get(key)
+        leader = flight is None
+        if leader:
+            flight = _inflight[key] = _Flight()
+        else:
+            flight.followers += 1
+    if not leader:
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return pickle.loads(flight.value)
+    value = None
+    try:
+        value = func()
+    except Exception as error:
+        flight.error = error
+        raise
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+        # Ведомые получают копию, снятую до того, как лидер вернет объект
+        # своему запросу: дальше его меняют (WSGIHandler добавляет ответу
+        # wsgi_request, который не сериализуется).
+        try:
+            if flight.followers and flight.error is None:
+                flight.value = pickle.dumps(value)
+        except Exception as error:
+            flight.error = error
+        finally:
+            flight.done.set()
+    return value
+
+
+def _expired_early(delta, expires, beta):
+    return time.time() - delta * beta * math.log(1 - random.random()) \
+        >= expires
+
+
+def _compute(cache, key, compute, timeout):
+    started = time.time()
+    value = compute()
+    if value is not None:
+        finished = time.time()
+        cache.set(key, (value, finished - started, finished + timeout),
+                  timeout)
+    return value
+
+
+def get_or_set_coalesced(key, compute, timeout, beta=1.0,
+                         lock_timeout=10, cache_alias='default'):
+    """Возвращает значение ключа, вычисляя его не более одного раза на
+    кластер. Если compute вернул None, значение не кэшируется."""
+    cache = caches[cache_alias]
+    lock_key = key + LOCK_SUFFIX
+    entry = cache.get(key)
+    if entry is not None:
+        value, delta, expires = entry
+        if not _expired_early(delta, expires, beta):
+            return value
+        # Ранний пересчет делает один процесс, остальные отдают старое.
+        if not cache.add(lock_key, 1, lock_timeout):
+            return value
+        try:
+            return _single_flight(
+                key, lambda: _compute(cache, key, compute, timeout)
+            )
+        finally:
+            cache.delete(lock_key)
+
+    def fill():
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+        if cache.add(lock_key, 1, lock_timeout):
+            try:
+                return _compute(cache, key, compute, timeout)
+            finally:
+                cache.delete(lock_key)
+        deadline = time.monotonic() + lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[0]
+            if cache.add(lock_key, 1, lock_timeout):
+                try:
+                    return _compute(cache, key, compute, timeout)
+                finally:
+                    cache.delete(lock_key)
+        return _compute(cache, key, compute, timeout)
+
+    return _single_flight(key, fill)
+
+
+def cache_page_coalesced(timeout, key_prefix='', beta=1.0):
+    """Аналог cache_page: кэширует страницу отдельно для каждого
+    пользователя и не дает истекшему ключу перегенерироваться лавиной."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            viewer = request.user.pk if request.user.is_authenticated \
+                else 'anonymous'
+            path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            key = f'page:{key_prefix}:{viewer}:{path}'
+            rendered = []
+
+            def render():
+                response = view(request, *args, **kwargs)
+                rendered.append(response)
+                if response.status_code != 200 or response.streaming \
+                        or response.cookies:
+                    return None
+                patch_response_headers(response, timeout)
+                return response
+
+            response = get_or_set_coalesced(key, render, timeout, beta)
+            if response is None:
+                response = rendered[0] if rendered else view(
+                    request, *args, **kwargs
+                )
+            return response
+        return wrapper
+    return decorator
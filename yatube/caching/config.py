@@ -0,0 +1,50 @@
+"""Выбор кэш-бэкенда по CACHE_URL.
+
+    db://[table]                 таблица в базе (по умолчанию django_cache,
+                                 создается командой createcachetable)
+    redis://[:password@]host:port/db
+    memcached://host:port[,host:port...]
+    file:///var/tmp/yatube_cache
+    sqlite:///var/tmp/yatube_cache.sqlite3
+    fake://                      встроенный Redis-совместимый сервер для тестов
+    locmem://                    локальный кэш процесса, не общий для воркеров
+"""
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+BACKENDS = {
+    'db': 'django.core.cache.backends.db.DatabaseCache',
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'redis': 'yatube.caching.backends.RedisCache',
+    'memcached': 'django.core.cache.backends.memcached.MemcachedCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'sqlite': 'yatube.caching.backends.SQLiteCache',
+    'fake': 'yatube.caching.backends.FakeRedisCache',
+}
+
+
+def parse_cache_url(url, key_prefix=''):
+    parts = urlsplit(url)
+    scheme = parts.scheme
+    if scheme not in BACKENDS:
+        raise ValueError(f'Неизвестная схема CACHE_URL: {url}')
+    config = {'BACKEND': BACKENDS[scheme], 'KEY_PREFIX': key_prefix}
+    options = dict(parse_qsl(parts.query))
+    if 'timeout' in options:
+        config['TIMEOUT'] = int(options.pop('timeout'))
+    if scheme == 'redis':
+        config['LOCATION'] = f'{parts.hostname or "127.0.0.1"}:' \
+                             f'{parts.port or 6379}'
+        options['DB'] = int(parts.path.strip('/') or 0)
+        if parts.password:
+            options['PASSWORD'] = unquote(parts.password)
+    elif scheme == 'memcached':
+        config['LOCATION'] = parts.netloc.split(',')
+    elif scheme in ('file', 'sqlite'):
+        config['LOCATION'] = unquote(parts.path)
+    elif scheme == 'db':
+        config['LOCATION'] = parts.netloc or 'django_cache'
+    elif scheme == 'locmem':
+        config['LOCATION'] = parts.netloc or 'yatube'
+    if options:
+        config['OPTIONS'] = options
+    return config
@@ -0,0 +1,175 @@
+"""Встроенный Redis-совместимый сервер для тестов и локального запуска.
+
+Поддерживает только команды, которыми пользуется RedisCache. Данные
+живут в памяти процесса, который поднял сервер.
+"""
+import socketserver
+import threading
+import time
+
+_server = None
+_server_lock = threading.Lock()
+
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=('127.0.0.1', 0)):
+        super().__init__(address, FakeRedisHandler)
+        self.data = {}
+        self.expires = {}
+        self.lock = threading.Lock()
+
+    def alive(self, key):
+        expires = self.expires.get(key)
+        if expires is not None and expires <= time.time():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        count = int(line[1:-2])
+        args = []
+        for _ in range(count):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def reply(self, value):
+        if value is None:
+            self.wfile.write(b'$-1\r\n')
+        elif isinstance(value, bool):
+            self.wfile.write(b':%d\r\n' % value)
+        elif isinstance(value, int):
+            self.wfile.write(b':%d\r\n' % value)
+        elif isinstance(value, bytes):
+            self.wfile.write(b'$%d\r\n%s\r\n' % (len(value), value))
+        elif isinstance(value, list):
+            self.wfile.write(b'*%d\r\n' % len(value))
+            for item in value:
+                self.reply(item)
+        elif isinstance(value, Exception):
+            self.wfile.write(b'-ERR %s\r\n' % str(value).encode())
+        else:
+            self.wfile.write(b'+%s\r\n' % str(value).encode())
+
+    def handle(self):
+        while True:
+            try:
+                args = self.read_command()
+            except (ConnectionError, ValueError):
+                return
+            if args is None:
+                return
+            name = args[0].decode().upper()
+            handler = getattr(self, f'cmd_{name.lower()}', None)
+            with self.server.lock:
+                if handler is None:
+                    result = ValueError(f"unknown command '{name}'")
+                else:
+                    try:
+                        result = handler(*args[1:])
+                    except Exception as error:
+                        result = error
+            self.reply(result)
+
+    def cmd_ping(self, *args):
+        return 'PONG'
+
+    def cmd_select(self, db):
+        return 'OK'
+
+    def cmd_auth(self, password):
+        return 'OK'
+
+    def cmd_get(self, key):
+        server = self.server
+        return server.data[key] if server.alive(key) else None
+
+    def cmd_mget(self, *keys):
+        return [self.cmd_get(key) for key in keys]
+
+    def cmd_set(self, key, value, *options):
+        server = self.server
+        options = [option.upper() for option in options]
+        expires = None
+        if b'PX' in options:
+            expires = int(options[options.index(b'PX') + 1]) / 1000
+        elif b'EX' in options:
+            expires = int(options[options.index(b'EX') + 1])
+        exists = server.alive(key)
+        if b'NX' in options and exists or b'XX' in options and not exists:
+            return None
+        server.data[key] = value
+        server.expires.pop(key, None)
+        if expires is not None:
+            server.expires[key] = time.time() + expires
+        return 'OK'
+
+    def cmd_del(self, *keys):
+        server = self.server
+        removed = 0
+        for key in keys:
+            if server.alive(key):
+                removed += 1
+            server.data.pop(key, None)
+            server.expires.pop(key, None)
+        return removed
+
+    def cmd_exists(self, *keys):
+        return sum(self.server.alive(key) for key in keys)
+
+    def cmd_incrby(self, key, delta):
+        server = self.server
+        value = int(server.data[key]) if server.alive(key) else 0
+        value += int(delta)
+        server.data[key] = str(value).encode()
+        return value
+
+    def cmd_eval(self, script, numkeys, *args):
+        # Lua здесь нет: поддержан только скрипт RedisCache.incr.
+        from .backends import INCR_SCRIPT
+        if script.decode() != INCR_SCRIPT:
+            raise ValueError('unknown script')
+        key, delta = args
+        if not self.server.alive(key):
+            return None
+        return self.cmd_incrby(key, delta)
+
+    def cmd_pexpire(self, key, milliseconds):
+        server = self.server
+        if not server.alive(key):
+            return 0
+        server.expires[key] = time.time() + int(milliseconds) / 1000
+        return 1
+
+    def cmd_persist(self, key):
+        server = self.server
+        if not server.alive(key):
+            return 0
+        return int(server.expires.pop(key, None) is not None)
+
+    def cmd_flushdb(self, *args):
+        self.server.data.clear()
+        self.server.expires.clear()
+        return 'OK'
+
+
+def shared_server():
+    """Один сервер на процесс, поднимается при первом обращении."""
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = FakeRedisServer().start()
+        return _server
@@ -0,0 +1,152 @@
+"""Пул соединений с базой внутри процесса.
+
+Соединения, которые Django закрывает в конце запроса, возвращаются в пул
+и выдаются следующему запросу (или потоку) без нового TCP-подключения и
+аутентификации. Размер пула ограничен MAX_SIZE: когда все соединения
+заняты, поток ждет освобождения не дольше TIMEOUT секунд, а затем
+получает PoolTimeout. Соединение, пролежавшее без дела дольше
+CHECK_AFTER секунд, перед выдачей проверяется, а прожившее дольше
+MAX_LIFETIME — заменяется новым.
+"""
+import threading
+import time
+
+from yatube.metrics import registry
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, connect, reset=None, check=None, max_size=10,
+                 timeout=5.0, check_after=30.0, max_lifetime=3600.0):
+        self.connect = connect
+        self.reset = reset
+        self.check = check
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_after = check_after
+        self.max_lifetime = max_lifetime
+        self.condition = threading.Condition()
+        # Свободные соединения: (соединение, когда освобождено)
+        self.idle = []
+        # id соединения -> когда создано
+        self.born = {}
+        self.size = 0
+        self.in_use = 0
+        self.waits = 0
+        self.timeouts = 0
+
+    @property
+    def available(self):
+        return len(self.idle)
+
+    def _take(self, deadline):
+        """Свободное соединение или None, если можно создать новое."""
+        with self.condition:
+            while True:
+                if self.idle:
+                    self.in_use += 1
+                    return self.idle.pop()
+                if self.size < self.max_size:
+                    self.size += 1
+                    self.in_use += 1
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    registry.inc('yatube_db_pool_timeouts_total')
+                    raise PoolTimeout(
+                        f'Нет свободного соединения за {self.timeout} с'
+                    )
+                self.waits += 1
+                registry.inc('yatube_db_pool_waits_total')
+                self.condition.wait(remaining)
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            taken = self._take(deadline)
+            if taken is None:
+                try:
+                    connection = self.connect()
+                except BaseException:
+                    self._forget(None)
+                    raise
+                self.born[id(connection)] = time.monotonic()
+                return connection
+            connection, released = taken
+            if self._healthy(connection, released):
+                return connection
+            self._forget(connection)
+
+    def _healthy(self, connection, released):
+        now = time.monotonic()
+        if now - self.born.get(id(connection), now) > self.max_lifetime:
+            return False
+        if self.check and now - released > self.check_after:
+            return self.check(connection)
+        return True
+
+    def release(self, connection, broken=False):
+        if not broken and self.reset:
+            try:
+                broken = not self.reset(connection)
+            except Exception:
+                broken = True
+        if broken:
+            self._forget(connection)
+            return
+        with self.condition:
+            self.in_use -= 1
+            self.idle.append((connection, time.monotonic()))
+            self.condition.notify()
+
+    def _forget(self, connection):
+        """Закрывает соединение и освобождает его место в пуле."""
+        if connection is not None:
+            self.born.pop(id(connection), None)
+            try:
+                connection.close()
+            except Exception:
+                pass
+        with self.condition:
+            self.size -= 1
+            self.in_use -= 1
+            self.condition.notify()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(key, factory):
+    """Пул по ключу; factory() создает его при первом обращении."""
+    with _pools_lock:
+        if key not in _pools:
+            if not _pools:
+                _register_metrics()
+            _pools[key] = factory()
+        return _pools[key]
+
+
+def _total(name):
+    def value():
+        with _pools_lock:
+            pools = list(_pools.values())
+        return sum(getattr(pool, name) for pool in pools)
+    return value
+
+
+def _register_metrics():
+    registry.describe('yatube_db_pool_waits_total', 'counter',
+                      'Сколько раз запрос ждал свободного соединения')
+    registry.describe('yatube_db_pool_timeouts_total', 'counter',
+                      'Сколько раз соединение не дождались')
+    registry.gauge('yatube_db_pool_size', 'Открытые соединения пула',
+                   _total('size'))
+    registry.gauge('yatube_db_pool_in_use', 'Выданные соединения пула',
+                   _total('in_use'))
+    registry.gauge('yatube_db_pool_idle', 'Свободные соединения пула',
+                   _total('available'))
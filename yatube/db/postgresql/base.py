@@ -0,0 +1,101 @@
+"""PostgreSQL с проверкой постоянных соединений и необязательным пулом.
+
+CONN_HEALTH_CHECKS: соединение, оставшееся с прошлого запроса
+(CONN_MAX_AGE > 0), перед первым запросом к базе проверяется SELECT 1 и
+при обрыве открывается заново, а не роняет запрос ошибкой.
+
+POOL: {'MAX_SIZE': ..., 'TIMEOUT': ..., 'CHECK_AFTER': ...,
+'MAX_LIFETIME': ...} — соединения берутся из пула процесса
+(yatube/db/pool.py) и возвращаются в него вместо закрытия.
+"""
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+from yatube.db.pool import ConnectionPool, get_pool
+
+Database = base.Database
+
+
+def _reset(connection):
+    """Откатывает незавершенную транзакцию; False — соединение
+    непригодно."""
+    if connection.closed:
+        return False
+    status = connection.get_transaction_status()
+    if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+        return False
+    if status != extensions.TRANSACTION_STATUS_IDLE:
+        connection.rollback()
+    return True
+
+
+def _check(connection):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except Database.Error:
+        return False
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    health_check_done = False
+    # Пул, из которого взято текущее соединение
+    connection_pool = None
+
+    def get_pool(self, conn_params):
+        config = self.settings_dict.get('POOL')
+        if not config:
+            return None
+        # Тестовый раннер меняет NAME на лету: у другой базы — другой пул.
+        key = (self.alias, repr(sorted(conn_params.items())))
+        return get_pool(key, lambda: ConnectionPool(
+            lambda: Database.connect(**conn_params),
+            reset=_reset,
+            check=_check,
+            max_size=config.get('MAX_SIZE', 10),
+            timeout=config.get('TIMEOUT', 5.0),
+            check_after=config.get('CHECK_AFTER', 30.0),
+            max_lifetime=config.get('MAX_LIFETIME', 3600.0),
+        ))
+
+    def get_new_connection(self, conn_params):
+        self.connection_pool = self.get_pool(conn_params)
+        if self.connection_pool is None:
+            return super().get_new_connection(conn_params)
+        connection = self.connection_pool.acquire()
+        isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level'
+        )
+        if isolation_level is None:
+            self.isolation_level = connection.isolation_level
+        else:
+            self.isolation_level = isolation_level
+            if isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection_pool is None or self.connection is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            self.connection_pool.release(self.connection,
+                                         broken=self.errors_occurred)
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+
+    def close_if_unusable_or_obsolete(self):
+        # Вызывается в начале и в конце каждого запроса.
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def ensure_connection(self):
+        if (self.connection is not None and not self.health_check_done
+                and not self.in_atomic_block
+                and self.settings_dict.get('CONN_HEALTH_CHECKS')):
+            if not self.is_usable():
+                self.close()
+            self.health_check_done = True
+        super().ensure_connection()
@@ -0,0 +1,86 @@
+"""Чтение с реплик базы.
+
+Представления, обернутые в read_only, на GET и HEAD читают со случайной
+реплики из DATABASE_REPLICAS; все остальное, включая любую запись, идет
+в основную базу. Чтобы пользователь видел свои изменения несмотря на
+отставание реплик, PinPrimaryMiddleware после каждого запроса, который
+что-то записал (даже GET, как add_like или profile_follow), или не был
+GET и HEAD, ставит cookie DATABASE_PIN_COOKIE на DATABASE_PIN_SECONDS
+секунд, и пока она есть, запросы этого пользователя читают из основной
+базы. Если представление само что-то записало, оставшиеся чтения этого
+запроса тоже идут в основную базу. Сессии и кэш в базе всегда читаются
+из основной базы и не считаются записью: сессия, не успевшая дойти до
+реплики, выглядела бы пустой, и Django удалил бы cookie, разлогинив
+пользователя.
+"""
+import random
+import threading
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+SAFE_METHODS = ('GET', 'HEAD')
+PRIMARY_APPS = ('sessions', 'django_cache')
+
+_local = threading.local()
+
+
+def current():
+    """База для чтения в текущем потоке."""
+    return getattr(_local, 'alias', None) or DEFAULT_DB_ALIAS
+
+
+def pinned(request):
+    return settings.DATABASE_PIN_COOKIE in request.COOKIES
+
+
+def read_only(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if (not settings.DATABASE_REPLICAS
+                or request.method not in SAFE_METHODS or pinned(request)):
+            return view(request, *args, **kwargs)
+        previous = getattr(_local, 'alias', None)
+        _local.alias = random.choice(settings.DATABASE_REPLICAS)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _local.alias = previous
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_APPS:
+            return DEFAULT_DB_ALIAS
+        return current()
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label not in PRIMARY_APPS:
+            _local.wrote = True
+            if getattr(_local, 'alias', None):
+                _local.alias = DEFAULT_DB_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} - {None} <= aliases:
+            return True
+        return None
+
+
+class PinPrimaryMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _local.wrote = False
+        response = self.get_response(request)
+        if settings.DATABASE_REPLICAS and (
+            _local.wrote or request.method not in SAFE_METHODS
+        ):
+            response.set_cookie(settings.DATABASE_PIN_COOKIE, '1',
+                                max_age=settings.DATABASE_PIN_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
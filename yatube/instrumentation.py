@@ -0,0 +1,272 @@
+"""Профиль каждого запроса: SQL, кэш и шаблоны.
+
+PerformanceMiddleware включается переменной окружения
+PERFORMANCE_INSTRUMENTATION. Для каждого запроса она считает общее время,
+число и время SQL-запросов, самые медленные из них, попадания и промахи
+кэша и время рендеринга шаблонов. Итог уходит в заголовок Server-Timing и
+JSON-строкой в логгер yatube.performance, а для медленных запросов
+(с вероятностью PERFORMANCE_TRACE_SAMPLE_RATE) в yatube.performance.slow
+пишется полный список запросов и обращений к кэшу. Запросы группируются
+по имени URL (index, post, profile, ...).
+"""
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import Template
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger('yatube.performance')
+slow_logger = logging.getLogger('yatube.performance.slow')
+
+_local = threading.local()
+_MISSING = object()
+_patched = set()
+_patch_lock = threading.Lock()
+_endpoints = {}
+_endpoints_lock = threading.Lock()
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []
+        self.sql_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_calls = []
+        self.cache_time = 0.0
+        self.template_time = 0.0
+        self.template_renders = 0
+        self.depth = {'cache': 0, 'template': 0}
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def slowest_queries(self, count):
+        return sorted(self.queries, key=lambda query: query[1],
+                      reverse=True)[:count]
+
+
+def current():
+    """Профиль текущего запроса или None, если инструментирование
+    выключено."""
+    return getattr(_local, 'profile', None)
+
+
+def _measure(kind):
+    """Учитывает только внешний вызов: get у части бэкендов сам вызывает
+    get_many, а шаблон карточки рендерится внутри шаблона страницы."""
+    profile = current()
+    if profile is None or profile.depth[kind]:
+        return None
+    profile.depth[kind] += 1
+    return time.perf_counter()
+
+
+def _done(kind, started):
+    profile = current()
+    profile.depth[kind] -= 1
+    return time.perf_counter() - started
+
+
+def _wrap_cache_method(cls, name):
+    original = getattr(cls, name)
+
+    @wraps(original)
+    def wrapper(self, *args, **kwargs):
+        started = _measure('cache')
+        if started is None:
+            return original(self, *args, **kwargs)
+        hits = misses = 0
+        try:
+            if name == 'get':
+                args = list(args)
+                key = args.pop(0) if args else kwargs.pop('key')
+                default = args.pop(0) if args else kwargs.pop('default',
+                                                              None)
+                value = original(self, key, _MISSING, *args, **kwargs)
+                if value is _MISSING:
+                    misses = 1
+                    value = default
+                else:
+                    hits = 1
+                result = value
+            elif name == 'get_many':
+                args = list(args)
+                keys = set(args.pop(0) if args else kwargs.pop('keys'))
+                result = original(self, keys, *args, **kwargs)
+                hits = len(result)
+                misses = len(keys) - hits
+            else:
+                result = original(self, *args, **kwargs)
+        finally:
+            elapsed = _done('cache', started)
+            profile = current()
+            profile.cache_time += elapsed
+            profile.cache_hits += hits
+            profile.cache_misses += misses
+            profile.cache_calls.append((name, hits, misses, elapsed))
+        return result
+
+    setattr(cls, name, wrapper)
+
+
+def _patch_caches():
+    """Оборачивает методы классов кэш-бэкендов из settings.CACHES."""
+    with _patch_lock:
+        for params in settings.CACHES.values():
+            cls = import_string(params['BACKEND'])
+            if cls in _patched:
+                continue
+            for name in ('get', 'get_many', 'set', 'set_many', 'add',
+                         'delete', 'delete_many', 'incr'):
+                _wrap_cache_method(cls, name)
+            _patched.add(cls)
+        if Template not in _patched:
+            original = Template.render
+
+            @wraps(original)
+            def render(self, *args, **kwargs):
+                started = _measure('template')
+                if started is None:
+                    return original(self, *args, **kwargs)
+                try:
+                    return original(self, *args, **kwargs)
+                finally:
+                    profile = current()
+                    profile.template_time += _done('template', started)
+                    profile.template_renders += 1
+
+            Template.render = render
+            _patched.add(Template)
+
+
+def _record_query(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        profile = current()
+        if profile is not None:
+            profile.sql_time += elapsed
+            profile.queries.append((sql, elapsed))
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+def _aggregate(record):
+    with _endpoints_lock:
+        stats = _endpoints.setdefault(record['endpoint'], {
+            'requests': 0, 'duration_ms': 0.0, 'max_ms': 0.0,
+            'sql_count': 0, 'sql_ms': 0.0, 'cache_hits': 0,
+            'cache_misses': 0, 'template_ms': 0.0,
+        })
+        stats['requests'] += 1
+        stats['max_ms'] = max(stats['max_ms'], record['duration_ms'])
+        for key in ('duration_ms', 'sql_count', 'sql_ms', 'cache_hits',
+                    'cache_misses', 'template_ms'):
+            stats[key] += record[key]
+
+
+def endpoint_stats():
+    """Накопленные в этом процессе суммы по именам URL."""
+    with _endpoints_lock:
+        return {name: dict(stats) for name, stats in _endpoints.items()}
+
+
+@contextmanager
+def profile_request():
+    """Собирает профиль запроса; вложенные вызовы (метрики и
+    PerformanceMiddleware вместе) получают один и тот же профиль."""
+    profile = current()
+    if profile is not None:
+        yield profile
+        return
+    _patch_caches()
+    profile = _local.profile = RequestProfile()
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(_record_query)
+                )
+            yield profile
+    finally:
+        _local.profile = None
+
+
+def endpoint_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name or match.url_name or 'unnamed'
+
+
+class PerformanceMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'PERFORMANCE_SLOW_REQUEST_MS', 500)
+        self.sample_rate = getattr(settings, 'PERFORMANCE_TRACE_SAMPLE_RATE',
+                                   1.0)
+        self.slowest = getattr(settings, 'PERFORMANCE_SLOWEST_QUERIES', 3)
+
+    def __call__(self, request):
+        with profile_request() as profile:
+            response = self.get_response(request)
+            self.finish(request, response, profile)
+        return response
+
+    def finish(self, request, response, profile):
+        total = profile.elapsed
+        response['Server-Timing'] = ', '.join((
+            f'total;dur={_ms(total)}',
+            f'db;dur={_ms(profile.sql_time)};'
+            f'desc="{len(profile.queries)} queries"',
+            f'cache;dur={_ms(profile.cache_time)};'
+            f'desc="{profile.cache_hits} hits, '
+            f'{profile.cache_misses} misses"',
+            f'tpl;dur={_ms(profile.template_time)}',
+        ))
+        endpoint = endpoint_name(request)
+        record = {
+            'endpoint': endpoint,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': _ms(total),
+            'sql_count': len(profile.queries),
+            'sql_ms': _ms(profile.sql_time),
+            'cache_hits': profile.cache_hits,
+            'cache_misses': profile.cache_misses,
+            'cache_ms': _ms(profile.cache_time),
+            'template_ms': _ms(profile.template_time),
+            'slowest_queries': [
+                {'sql': sql[:300], 'ms': _ms(elapsed)}
+                for sql, elapsed in profile.slowest_queries(self.slowest)
+            ],
+        }
+        request.performance = record
+        _aggregate(record)
+        logger.info(json.dumps(record, ensure_ascii=False))
+        if (record['duration_ms'] >= self.slow_ms
+                and random.random() < self.sample_rate):
+            trace = dict(record)
+            trace['queries'] = [{'sql': sql, 'ms': _ms(elapsed)}
+                                for sql, elapsed in profile.queries]
+            trace['cache_calls'] = [
+                {'op': op, 'hits': hits, 'misses': misses,
+                 'ms': _ms(elapsed)}
+                for op, hits, misses, elapsed in profile.cache_calls
+            ]
+            slow_logger.warning(json.dumps(trace, ensure_ascii=False))
@@ -0,0 +1,279 @@
+"""Метрики в формате Prometheus, общие для всех воркеров gunicorn.
+
+Каждый процесс копит счетчики и гистограммы в памяти. Фоновый поток раз в
+METRICS_FLUSH_INTERVAL секунд, если что-то изменилось, и при выходе
+процесса сбрасывает их вместе с датчиками в файл METRICS_DIR/<pid>.json
+(атомарной заменой), поэтому запрос не ждет записи на диск. /metrics
+складывает файлы всех процессов: счетчики и гистограммы суммируются, в том
+числе от завершившихся воркеров, а процессные датчики (gauge) берутся
+только у живых. Датчики, которые
+читаются из базы, вычисляются при каждом запросе /metrics.
+"""
+import atexit
+import bisect
+import glob
+import json
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+from .instrumentation import endpoint_name, profile_request
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+logger = logging.getLogger(__name__)
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.meta = {}
+        self.counters = {}
+        self.histograms = {}
+        # name -> (callback, multiprocess): 'process' — значение процесса,
+        # суммируется по живым воркерам; 'scrape' — вычисляется в /metrics
+        self.gauges = {}
+        self.changed = False
+        # pid процесса, в котором запущен фоновый сброс
+        self.flusher = None
+        self.flusher_lock = threading.Lock()
+
+    def describe(self, name, kind, help_text, buckets=None):
+        self.meta[name] = {'type': kind, 'help': help_text,
+                           'buckets': buckets}
+
+    def inc(self, name, labels=None, value=1):
+        key = _key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+            self.changed = True
+
+    def observe(self, name, value, labels=None):
+        buckets = self.meta[name]['buckets']
+        key = _key(name, labels)
+        with self.lock:
+            data = self.histograms.get(key)
+            if data is None:
+                data = self.histograms[key] = {
+                    'buckets': [0] * len(buckets), 'sum': 0.0, 'count': 0,
+                }
+            position = bisect.bisect_left(buckets, value)
+            if position < len(buckets):
+                data['buckets'][position] += 1
+            data['sum'] += value
+            data['count'] += 1
+            self.changed = True
+
+    def gauge(self, name, help_text, callback, scope='process'):
+        self.describe(name, 'gauge', help_text)
+        self.gauges[name] = (callback, scope)
+
+    def snapshot(self):
+        with self.lock:
+            self.changed = False
+            data = {
+                'counters': dict(self.counters),
+                'histograms': {key: {'buckets': list(value['buckets']),
+                                     'sum': value['sum'],
+                                     'count': value['count']}
+                               for key, value in self.histograms.items()},
+            }
+        data['gauges'] = {
+            _key(name, None): _call(callback)
+            for name, (callback, scope) in self.gauges.items()
+            if scope == 'process'
+        }
+        return data
+
+    def flush(self):
+        directory = settings.METRICS_DIR
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{os.getpid()}.json')
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump(self.snapshot(), file)
+        os.replace(temporary, path)
+
+    def flush_changed(self):
+        if self.changed and settings.METRICS_ENABLED:
+            self.flush()
+
+    def start_flusher(self):
+        """Запускает сброс в фоне и при выходе процесса; после fork —
+        заново в дочернем процессе."""
+        pid = os.getpid()
+        if self.flusher == pid:
+            return
+        with self.flusher_lock:
+            if self.flusher == pid:
+                return
+            self.flusher = pid
+            threading.Thread(target=self._run_flusher, name='metrics-flush',
+                             daemon=True).start()
+            atexit.register(self.flush_changed)
+
+    def _run_flusher(self):
+        while True:
+            time.sleep(getattr(settings, 'METRICS_FLUSH_INTERVAL', 1))
+            try:
+                self.flush_changed()
+            except Exception:
+                logger.exception('Не удалось сохранить метрики')
+
+
+registry = Registry()
+registry.describe('yatube_http_requests_total', 'counter',
+                  'Обработанные запросы по имени URL, методу и статусу')
+registry.describe('yatube_http_request_duration_seconds', 'histogram',
+                  'Время обработки запроса', LATENCY_BUCKETS)
+registry.describe('yatube_db_queries_per_request', 'histogram',
+                  'Число SQL-запросов на один HTTP-запрос', QUERY_BUCKETS)
+registry.describe('yatube_cache_requests_total', 'counter',
+                  'Обращения к кэшу на чтение: hit или miss')
+
+
+def _key(name, labels):
+    return json.dumps([name, sorted((labels or {}).items())])
+
+
+def _call(callback):
+    try:
+        return float(callback())
+    except Exception:
+        return float('nan')
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect():
+    """Складывает файлы всех процессов и датчики текущего процесса."""
+    registry.flush()
+    counters, histograms, gauges = {}, {}, {}
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, '*.json')):
+        try:
+            with open(path) as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            continue
+        for key, value in data['counters'].items():
+            counters[key] = counters.get(key, 0) + value
+        for key, value in data['histograms'].items():
+            total = histograms.setdefault(key, {
+                'buckets': [0] * len(value['buckets']), 'sum': 0.0,
+                'count': 0,
+            })
+            total['buckets'] = [a + b for a, b in zip(total['buckets'],
+                                                      value['buckets'])]
+            total['sum'] += value['sum']
+            total['count'] += value['count']
+        pid = os.path.basename(path).split('.')[0]
+        if pid.isdigit() and _alive(int(pid)):
+            for key, value in data['gauges'].items():
+                gauges[key] = gauges.get(key, 0) + value
+    for name, (callback, scope) in registry.gauges.items():
+        if scope == 'scrape':
+            gauges[_key(name, None)] = _call(callback)
+    return counters, histograms, gauges
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace(
+        '\n', r'\n')
+
+
+def _labels(pairs, extra=()):
+    pairs = list(pairs) + list(extra)
+    if not pairs:
+        return ''
+    body = ','.join(f'{name}="{_escape(value)}"' for name, value in pairs)
+    return f'{{{body}}}'
+
+
+def _number(value):
+    if value != value:
+        return 'NaN'
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def render():
+    counters, histograms, gauges = collect()
+    series = {}
+    for source in (counters, histograms, gauges):
+        for key, value in source.items():
+            name, labels = json.loads(key)
+            series.setdefault(name, []).append((labels, value))
+    lines = []
+    for name in sorted(series):
+        meta = registry.meta.get(name, {'type': 'untyped', 'help': ''})
+        lines.append(f'# HELP {name} {meta["help"]}')
+        lines.append(f'# TYPE {name} {meta["type"]}')
+        for labels, value in sorted(series[name], key=str):
+            if meta['type'] != 'histogram':
+                lines.append(f'{name}{_labels(labels)} {_number(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip(meta['buckets'], value['buckets']):
+                cumulative += count
+                lines.append(f'{name}_bucket'
+                             f'{_labels(labels, [("le", _number(bound))])} '
+                             f'{cumulative}')
+            lines.append(f'{name}_bucket{_labels(labels, [("le", "+Inf")])} '
+                         f'{value["count"]}')
+            lines.append(f'{name}_sum{_labels(labels)} '
+                         f'{_number(value["sum"])}')
+            lines.append(f'{name}_count{_labels(labels)} {value["count"]}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    token = settings.METRICS_TOKEN
+    if token and request.META.get('HTTP_AUTHORIZATION') != f'Bearer {token}':
+        return HttpResponse(status=401)
+    return HttpResponse(render(), content_type=CONTENT_TYPE)
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with profile_request() as profile:
+            response = self.get_response(request)
+            elapsed = profile.elapsed
+        view = endpoint_name(request)
+        registry.inc('yatube_http_requests_total', {
+            'view': view, 'method': request.method,
+            'status': str(response.status_code),
+        })
+        registry.observe('yatube_http_request_duration_seconds', elapsed,
+                         {'view': view})
+        registry.observe('yatube_db_queries_per_request',
+                         len(profile.queries), {'view': view})
+        if profile.cache_hits:
+            registry.inc('yatube_cache_requests_total', {'result': 'hit'},
+                         profile.cache_hits)
+        if profile.cache_misses:
+            registry.inc('yatube_cache_requests_total', {'result': 'miss'},
+                         profile.cache_misses)
+        registry.start_flusher()
+        return response
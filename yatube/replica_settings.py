@@ -0,0 +1,23 @@
+"""Основная база и реплика — два файла SQLite — для проверки маршрутизации
+чтения без PostgreSQL:
+
+    python manage.py test posts.tests.test_replicas \\
+        --settings=yatube.replica_settings
+
+Файлы не реплицируются, поэтому по содержимому страницы видно, из какой
+базы она прочитана. Каждую базу нужно мигрировать отдельно:
+migrate --database=default и migrate --database=replica.
+"""
+import os
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+
+DATABASES = {
+    alias: {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(tempfile.gettempdir(), f'yatube-{alias}.sqlite3'),
+    }
+    for alias in ('default', 'replica')
+}
+DATABASE_REPLICAS = ['replica']
@@ -1,6 +1,9 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
+from yatube.caching.config import parse_cache_url
+
 load_dotenv()
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -36,8 +39,52 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'yatube.db.replicas.PinPrimaryMiddleware',
 ]
 
+# Профилирование запросов (SQL, кэш, шаблоны, Server-Timing), см.
+# yatube/instrumentation.py. Включается PERFORMANCE_INSTRUMENTATION=1.
+PERFORMANCE_INSTRUMENTATION = os.getenv(
+    'PERFORMANCE_INSTRUMENTATION', ''
+).lower() in ('1', 'true', 'yes')
+if PERFORMANCE_INSTRUMENTATION:
+    MIDDLEWARE.insert(0, 'yatube.instrumentation.PerformanceMiddleware')
+PERFORMANCE_SLOW_REQUEST_MS = int(
+    os.getenv('PERFORMANCE_SLOW_REQUEST_MS', 500)
+)
+PERFORMANCE_TRACE_SAMPLE_RATE = float(
+    os.getenv('PERFORMANCE_TRACE_SAMPLE_RATE', 1.0)
+)
+PERFORMANCE_SLOWEST_QUERIES = 3
+
+# Метрики Prometheus на /metrics, общие для всех воркеров (yatube/metrics.py).
+# METRICS_DIR нужно очищать перед запуском gunicorn.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '').lower() in (
+    '1', 'true', 'yes'
+)
+if METRICS_ENABLED:
+    MIDDLEWARE.insert(0, 'yatube.metrics.MetricsMiddleware')
+METRICS_DIR = os.getenv(
+    'METRICS_DIR', os.path.join(tempfile.gettempdir(), 'yatube-metrics')
+)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+METRICS_FLUSH_INTERVAL = 1
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'yatube.performance': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
 MISC_DIR = os.path.join(BASE_DIR, "templates", "misc")
@@ -61,19 +108,52 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
+# Потоки, в которых yatube/asgi.py выполняет запросы; у каждого свое
+# соединение с базой, поэтому при пуле ASGI_THREADS <= DB_POOL_SIZE
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', 10))
 
 
+# yatube.db.postgresql — штатный бэкенд с проверкой постоянных соединений
+# и пулом (yatube/db/). Соединение живет DB_CONN_MAX_AGE секунд и
+# переиспользуется запросами потока; при DB_POOL_SIZE > 0 соединения
+# после каждого запроса возвращаются в общий пул процесса, а запрос ждет
+# свободного не дольше DB_POOL_TIMEOUT секунд.
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 0))
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'ENGINE': 'yatube.db.postgresql',
         'NAME': os.getenv('DB_NAME'),
         'USER': os.getenv('POSTGRES_USER'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': '127.0.0.1',
-        'PORT': '5432'
+        'PORT': '5432',
+        'CONN_MAX_AGE': 0 if DB_POOL_SIZE else int(
+            os.getenv('DB_CONN_MAX_AGE', 60)
+        ),
+        'CONN_HEALTH_CHECKS': True,
+        'POOL': {
+            'MAX_SIZE': DB_POOL_SIZE,
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', 5)),
+        } if DB_POOL_SIZE else None,
     }
 }
 
+# Реплики только для чтения, через запятую: DB_REPLICA_HOSTS=10.0.0.2,...
+# С них читают представления, обернутые в yatube.db.replicas.read_only;
+# после записи пользователь DATABASE_PIN_SECONDS секунд читает из основной
+# базы. В тестах реплики — зеркала основной базы.
+DATABASE_REPLICAS = []
+for number, host in enumerate(
+    filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), 1
+):
+    DATABASES[f'replica{number}'] = dict(
+        DATABASES['default'], HOST=host.strip(), TEST={'MIRROR': 'default'}
+    )
+    DATABASE_REPLICAS.append(f'replica{number}')
+DATABASE_ROUTERS = ['yatube.db.replicas.ReplicaRouter']
+DATABASE_PIN_COOKIE = 'db_primary'
+DATABASE_PIN_SECONDS = 10
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -108,6 +188,13 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, "static")
+# collectstatic добавляет к именам хэш содержимого и сжимает файлы в .gz и
+# .br (yatube/assets.py). Без фронтового прокси STATIC_SERVE=1 включает
+# раздачу статики самим WSGI-процессом: файлы с хэшем кэшируются
+# браузером навсегда, остальные — на STATIC_MAX_AGE секунд.
+STATICFILES_STORAGE = 'yatube.assets.CompressedManifestStorage'
+STATIC_SERVE = os.getenv('STATIC_SERVE', '').lower() in ('1', 'true', 'yes')
+STATIC_MAX_AGE = 60
 
 
 MEDIA_URL = '/media/'
@@ -116,7 +203,71 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 LOGIN_URL = "/auth/login/"
 LOGIN_REDIRECT_URL = "index"
 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+GROUPS_PER_PAGE = 20
+# Ленты длиннее этого числа постов листаются курсором, а не номерами страниц
+NUMBERED_PAGINATION_LIMIT = 100
+
+# Посты авторов с большим числом подписчиков не раскладываются по лентам,
+# а подмешиваются в follow_index при чтении
+FEED_FANOUT_LIMIT = 1000
+FEED_BACKFILL_LIMIT = 500
+FEED_BATCH_SIZE = 1000
+
+POST_CARD_TIMEOUT = 60 * 60 * 24
+# Карточки, отрисованные по данным с реплики, могут отставать от записи,
+# поэтому живут в кэше недолго
+POST_CARD_REPLICA_TIMEOUT = 60 * 5
+
+# Сколько постов можно лайкнуть или разлайкнуть одним запросом к API
+LIKES_BATCH_LIMIT = 100
+# Отложенная запись лайков через кэш (posts/like_buffer.py): буфер
+# сбрасывается в базу раз в LIKES_FLUSH_INTERVAL секунд (0 — только
+# командой flush_likes)
+LIKES_WRITE_BEHIND = os.getenv('LIKES_WRITE_BEHIND', '').lower() in (
+    '1', 'true', 'yes'
+)
+LIKES_FLUSH_INTERVAL = 5
+
+# Горячая лента (posts/hot.py): вклад событий в оценку поста, период
+# полураспада оценки в секундах, сколько постов в ленте и сколько секунд
+# держать ее в кэше. Оценки ниже HOT_MIN_SCORE удаляются при старении.
+HOT_WEIGHTS = {'like': 1.0, 'comment': 2.0}
+HOT_HALF_LIFE = 60 * 60 * 6
+HOT_FEED_SIZE = 100
+HOT_CACHE_TIMEOUT = 60
+HOT_MIN_SCORE = 0.05
+
+# Миниатюры строятся в фоновом пуле потоков; False — сразу после коммита
+THUMBNAIL_ASYNC = True
+THUMBNAIL_WORKERS = 2
+IMAGE_VARIANT_WIDTHS = (320, 640, 960)
+IMAGE_VARIANT_MAX_BYTES = 150 * 1024
+
+# Письма ставятся в очередь (users/mail.py) и отправляются в фоне через
+# MAIL_DELIVERY_BACKEND: EMAIL_DELIVERY=smtp, console или file (в
+# EMAIL_FILE_PATH)
+EMAIL_BACKEND = 'users.mail.QueuedEmailBackend'
+MAIL_DELIVERY_BACKEND = {
+    'smtp': 'django.core.mail.backends.smtp.EmailBackend',
+    'console': 'django.core.mail.backends.console.EmailBackend',
+    'file': 'django.core.mail.backends.filebased.EmailBackend',
+}[os.getenv('EMAIL_DELIVERY', 'smtp')]
+EMAIL_FILE_PATH = os.getenv('EMAIL_FILE_PATH',
+                            os.path.join(BASE_DIR, 'sent_emails'))
+# Фоновая отправка раз в MAIL_QUEUE_INTERVAL секунд (0 — только командой
+# send_queued_mail), не больше MAIL_RATE_LIMIT писем в минуту; повтор
+# через MAIL_RETRY_BACKOFF * 2 ** (попытка - 1) секунд. MAIL_RATE_LIMIT
+# считается в каждом процессе отдельно (воркере или send_queued_mail):
+# при квоте почтового сервера делите ее на число отправляющих процессов
+# или ставьте MAIL_QUEUE_INTERVAL = 0 и отправляйте одной командой.
+MAIL_QUEUE_INTERVAL = 10
+MAIL_QUEUE_BATCH_SIZE = 50
+MAIL_RATE_LIMIT = 60
+MAIL_MAX_ATTEMPTS = 6
+MAIL_RETRY_BACKOFF = 30
+MAIL_RETRY_MAX_DELAY = 60 * 60
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
@@ -127,8 +278,13 @@ EMAIL_USE_TLS = True
 
 SITE_ID = 1
 
+# Версии карточек и ETag должны быть общими для всех воркеров, поэтому
+# кэш по умолчанию — таблица в базе (python manage.py createcachetable);
+# быстрее redis://, также memcached://, file://, sqlite:// (см.
+# yatube/caching/config.py). fake:// поднимает встроенный
+# Redis-совместимый сервер для тестов, locmem:// — кэш одного процесса.
 CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    'default': parse_cache_url(
+        os.getenv('CACHE_URL', 'db://'), key_prefix='yatube'
+    )
 }
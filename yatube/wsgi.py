@@ -1,7 +1,13 @@
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
+from yatube.assets import StaticFiles
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+if settings.STATIC_SERVE:
+    application = StaticFiles(application, settings.STATIC_ROOT,
+                              settings.STATIC_URL, settings.STATIC_MAX_AGE)